@@ -0,0 +1,80 @@
+# pylint: skip-file
+"""逐个解析和批量解析变量值的耗时对比.
+
+运行: python benchmarks/parse_values_benchmark.py [行数] [重复次数]
+"""
+import random
+import sys
+import time
+from typing import Callable
+
+from passive_equipment.common_func import parse_value, parse_values
+
+# 数据类型, 数据库里的值字符串和子元素数据类型
+ROW_KINDS = [
+    ("U4", "12", None), ("F4", "1.5", None), ("BOOL", "true", None), ("ASCII", "abc", None),
+    ("I4", "-3", None), ("ARRAY", "[1,2,3]", "U4"), ("BINARY", "1", None), ("U1", "", None)
+]
+
+
+def get_rows(count: int, with_array: bool = True) -> list[tuple[str, str, str]]:
+    """生成随机的变量行.
+
+    Args:
+        count: 行数.
+        with_array: 是否包含 ARRAY 类型.
+
+    Returns:
+        list[tuple[str, str, str]]: (值, 数据类型, 子元素数据类型) 列表.
+    """
+    kinds = ROW_KINDS if with_array else [kind for kind in ROW_KINDS if kind[0] != "ARRAY"]
+    random.seed(1)
+    return [
+        (value, value_type, base_value_type) for value_type, value, base_value_type in random.choices(kinds, k=count)
+    ]
+
+
+def best_time(func: Callable, repeat: int) -> float:
+    """多次执行取最短耗时.
+
+    Args:
+        func: 要计时的函数.
+        repeat: 重复次数.
+
+    Returns:
+        float: 最短耗时, 单位毫秒.
+    """
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start_time)
+    return min(times) * 1000
+
+
+def main(count: int = 10000, repeat: int = 40):
+    """输出每种数据组合逐个解析和批量解析的耗时.
+
+    Args:
+        count: 行数.
+        repeat: 重复次数.
+    """
+    cases = {"混合类型": get_rows(count), "只有标量类型": get_rows(count, with_array=False)}
+    malformed_rows = get_rows(count)
+    malformed_rows.append(("[1,2],[3]", "ARRAY", "U4"))  # 有一行格式不对, 批量解析退回逐行解析
+    malformed_rows.append(("[4]", "ARRAY", "U4"))
+    for name, rows in cases.items():
+        values, value_types, base_value_types = (list(_) for _ in zip(*rows))
+        per_value = best_time(lambda: [parse_value(*row) for row in rows], repeat)
+        bulk = best_time(lambda: parse_values(values, value_types, base_value_types), repeat)
+        print(f"{name} {count} 行: 逐个解析 {per_value:.2f} ms, 批量解析 {bulk:.2f} ms")
+
+    values, value_types, base_value_types = (list(_) for _ in zip(*malformed_rows))
+    try:
+        parse_values(values, value_types, base_value_types)
+    except ValueError as e:
+        print(f"格式不对的行单独报错: {e}")
+
+
+if __name__ == "__main__":
+    main(*(int(_) for _ in sys.argv[1:3]))
@@ -0,0 +1,123 @@
+# pylint: skip-file
+"""直接访问驱动和通过 PlcIoLane 访问驱动的轮询吞吐量和交互延迟对比.
+
+使用模拟驱动, 每次读写耗时固定, 同一时间只能执行一个请求, 不需要 plc.
+多个轮询线程反复读取几个地址, 一个交互线程定时写入, 另一个交互线程定时读取正在被轮询的地址.
+
+运行: python benchmarks/plc_io_lane_benchmark.py [运行秒数] [轮询线程数]
+"""
+import sys
+import threading
+import time
+from typing import Callable
+
+from passive_equipment.metrics import RollingStats
+from passive_equipment.plc_io_lane import PlcIoLane, PRIORITY_HANDSHAKE, PRIORITY_POLL
+
+SERVICE_TIME = 0.002  # 模拟驱动每次读写的耗时, 单位秒
+POLL_ADDRESS_COUNT = 4  # 轮询的地址个数
+HANDSHAKE_GAP = 0.05  # 交互读写的间隔, 单位秒
+
+
+class SimulatedDriver:
+    """模拟 plc 驱动, 用锁保证同一时间只执行一个请求."""
+
+    def __init__(self):
+        """SimulatedDriver 构造函数."""
+        self.plc_lock = threading.RLock()
+        self.call_count = 0
+
+    def execute_read(self, **address_info) -> int:
+        """模拟读取.
+
+        Args:
+            **address_info: 地址信息.
+
+        Returns:
+            int: 固定返回 1.
+        """
+        with self.plc_lock:
+            time.sleep(SERVICE_TIME)
+            self.call_count += 1
+            return 1
+
+    def execute_write(self, **address_info):
+        """模拟写入.
+
+        Args:
+            **address_info: 地址信息.
+        """
+        with self.plc_lock:
+            time.sleep(SERVICE_TIME)
+            self.call_count += 1
+
+
+def run(use_lane: bool, duration: float, poller_count: int) -> dict:
+    """运行一次压测.
+
+    Args:
+        use_lane: 是否通过 PlcIoLane 访问驱动.
+        duration: 运行秒数.
+        poller_count: 轮询线程数.
+
+    Returns:
+        dict: 轮询读取次数, 驱动调用次数, 交互写入和交互读取的耗时统计.
+    """
+    driver = SimulatedDriver()
+    plc = PlcIoLane(driver) if use_lane else driver
+    poll_kwargs = {"priority": PRIORITY_POLL} if use_lane else {}
+    handshake_kwargs = {"priority": PRIORITY_HANDSHAKE} if use_lane else {}
+    stop_time = time.monotonic() + duration
+    poll_reads = [0] * poller_count
+    handshake_write, handshake_read = RollingStats(), RollingStats()
+
+    def poll(index: int):
+        while time.monotonic() < stop_time:
+            plc.execute_read(address=index % POLL_ADDRESS_COUNT, data_type="int", db_num=1, **poll_kwargs)
+            poll_reads[index] += 1
+            time.sleep(0.005)
+
+    def handshake(stats: RollingStats, request: Callable):
+        while time.monotonic() < stop_time:
+            start_time = time.monotonic()
+            request()
+            stats.record(time.monotonic() - start_time)
+            time.sleep(HANDSHAKE_GAP)
+
+    threads = [threading.Thread(target=poll, args=(index,)) for index in range(poller_count)]
+    threads.append(threading.Thread(target=handshake, args=(handshake_write, lambda: plc.execute_write(
+        address=100, data_type="int", db_num=1, value=1, **handshake_kwargs
+    ))))
+    threads.append(threading.Thread(target=handshake, args=(handshake_read, lambda: plc.execute_read(
+        address=0, data_type="int", db_num=1, **handshake_kwargs
+    ))))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "poll_reads": sum(poll_reads), "driver_calls": driver.call_count,
+        "handshake_write": handshake_write.get_state(), "handshake_read": handshake_read.get_state()
+    }
+
+
+def main(duration: float = 3, poller_count: int = 24):
+    """输出直接访问和通过读写通道访问的结果.
+
+    Args:
+        duration: 运行秒数.
+        poller_count: 轮询线程数.
+    """
+    for name, use_lane in (("直接访问", False), ("读写通道", True)):
+        result = run(use_lane, duration, poller_count)
+        write_state, read_state = result["handshake_write"], result["handshake_read"]
+        print(
+            f"{name}: 轮询读取 {result['poll_reads'] / duration:.0f} 次/s, "
+            f"驱动调用 {result['driver_calls'] / duration:.0f} 次/s, "
+            f"交互写入 p50 {write_state['p50'] * 1000:.1f} ms p99 {write_state['p99'] * 1000:.1f} ms, "
+            f"交互读取轮询地址 p50 {read_state['p50'] * 1000:.1f} ms p99 {read_state['p99'] * 1000:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*(float(_) for _ in sys.argv[1:2]), *(int(_) for _ in sys.argv[2:3]))
@@ -0,0 +1,110 @@
+# pylint: skip-file
+"""按角色查找地址和按描述信息查找地址的耗时对比.
+
+在 plc_address_list 里写入大量地址, role 列有索引, description 列没有索引.
+默认使用临时的 sqlite 数据库, 也可以传入 mysql 的连接地址, 会清空其中的 plc_address_list 表.
+
+运行: python benchmarks/role_lookup_benchmark.py [地址行数] [重复次数] [数据库连接地址]
+"""
+import os
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+from mysql_api.mysql_database import MySQLDatabase
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from passive_equipment import models_class, plc_address_operation
+
+
+def get_mysql(url: str) -> MySQLDatabase:
+    """创建连接到指定数据库的 MySQLDatabase 实例.
+
+    Args:
+        url: 数据库连接地址.
+
+    Returns:
+        MySQLDatabase: 数据库实例.
+    """
+    mysql = MySQLDatabase.__new__(MySQLDatabase)
+    mysql.engine = create_engine(url)
+    mysql.session = scoped_session(sessionmaker(bind=mysql.engine))
+    return mysql
+
+
+def seed_addresses(mysql: MySQLDatabase, count: int):
+    """重建 plc_address_list 并写入地址.
+
+    运行状态地址填写了角色, 报警 id 地址只有描述信息, 查找时走按描述信息查找的兼容路径.
+
+    Args:
+        mysql: 数据库实例.
+        count: 地址行数.
+    """
+    table = models_class.PlcAddressList.__table__
+    table.drop(mysql.engine, checkfirst=True)
+    table.create(mysql.engine)
+    rows = [
+        {"address": f"{index * 2}", "data_type": "int", "size": 2, "description": f"地址 {index}", "role": None}
+        for index in range(count)
+    ]
+    rows[-7].update(description=plc_address_operation.ROLE_DESCRIPTIONS[plc_address_operation.ROLE_MACHINE_STATE],
+                    role=plc_address_operation.ROLE_MACHINE_STATE)
+    rows[-3].update(description=plc_address_operation.ROLE_DESCRIPTIONS[plc_address_operation.ROLE_ALARM_ID])
+    with mysql.engine.begin() as connection:
+        connection.execute(insert(table), rows)
+
+
+def best_time(func: Callable, repeat: int) -> float:
+    """多次执行取最短耗时.
+
+    Args:
+        func: 要计时的函数.
+        repeat: 重复次数.
+
+    Returns:
+        float: 最短耗时, 单位毫秒.
+    """
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start_time)
+    return min(times) * 1000
+
+
+def main(count: int = 200000, repeat: int = 30, url: Optional[str] = None):
+    """输出按描述信息查找和按角色查找的耗时.
+
+    Args:
+        count: 地址行数.
+        repeat: 重复次数.
+        url: 数据库连接地址, 默认使用临时的 sqlite 数据库.
+    """
+    temp_dir = None
+    if url is None:
+        temp_dir = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(temp_dir.name, 'role_lookup.db')}"
+    mysql = get_mysql(url)
+    try:
+        seed_addresses(mysql, count)
+        model_class = models_class.PlcAddressList
+        description = plc_address_operation.ROLE_DESCRIPTIONS[plc_address_operation.ROLE_MACHINE_STATE]
+        cases = {
+            "按描述信息查找": lambda: mysql.query_data(model_class, {"description": description}),
+            "按角色查找": lambda: mysql.query_data(model_class, {"role": plc_address_operation.ROLE_MACHINE_STATE}),
+            "get_machine_state, 有角色": lambda: plc_address_operation.get_machine_state("snap7", mysql),
+            "get_alarm_address_info, 没有角色": lambda: plc_address_operation.get_alarm_address_info("snap7", mysql),
+        }
+        for name, func in cases.items():
+            print(f"{name} {count} 行: {best_time(func, repeat):.2f} ms")
+    finally:
+        mysql.engine.dispose()
+        if temp_dir:
+            temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main(*(int(_) for _ in sys.argv[1:3]), *sys.argv[3:4])
@@ -0,0 +1,116 @@
+# pylint: skip-file
+"""S1F3, S1F11, S2F13 从编码快照回复和 secsgem 逐个变量回复的耗时对比.
+
+每次回复都包含解析请求, 生成回复和编码, 不需要 plc 和数据库.
+
+运行: python benchmarks/variable_snapshot_benchmark.py [变量个数] [重复次数]
+"""
+import logging
+import sys
+import time
+from typing import Callable
+
+import secsgem.common
+import secsgem.hsms
+from secsgem.gem import EquipmentConstant, GemEquipmentHandler, StatusVariable
+from secsgem.hsms import HsmsHeader, HsmsMessage
+from secsgem.secs.variables import Boolean, F4, I4, String, U4
+
+from passive_equipment.handler_passive import HandlerPassive
+
+# 变量类型和值, 按顺序轮流使用
+VALUE_KINDS = [(U4, 7), (F4, 1.5), (String, "abc"), (Boolean, True), (I4, -3)]
+
+
+def get_handler(count: int) -> HandlerPassive:
+    """创建只初始化 secsgem 部分的 HandlerPassive, 定义 count 个 sv 和 ec 并生成快照.
+
+    Args:
+        count: sv 和 ec 的个数.
+
+    Returns:
+        HandlerPassive: handler.
+    """
+    settings = secsgem.hsms.HsmsSettings(
+        address="127.0.0.1", port=0, connect_mode=secsgem.hsms.HsmsConnectMode.PASSIVE,
+        device_type=secsgem.common.DeviceType.EQUIPMENT
+    )
+    handler = HandlerPassive.__new__(HandlerPassive)
+    GemEquipmentHandler.__init__(handler, settings=settings)
+    handler.logger = logging.getLogger("benchmark")
+    for index in range(count):
+        value_type, value = VALUE_KINDS[index % len(VALUE_KINDS)]
+        handler.status_variables[10000 + index] = StatusVariable(
+            10000 + index, f"sv_{index}", "", value_type, value=value
+        )
+        handler.equipment_constants[20000 + index] = EquipmentConstant(
+            20000 + index, f"ec_{index}", 0, 100000, 1, "", U4, value=index
+        )
+    handler._initial_variable_snapshot()
+    return handler
+
+
+def get_message(handler: HandlerPassive, stream: int, function: int, ids: list[int]) -> HsmsMessage:
+    """生成请求消息.
+
+    Args:
+        handler: handler.
+        stream: stream.
+        function: function.
+        ids: 请求的 id 列表.
+
+    Returns:
+        HsmsMessage: 请求消息.
+    """
+    data = handler.stream_function(stream, function)(ids).encode()
+    return HsmsMessage(HsmsHeader(1, 0, stream, function, True), data)
+
+
+def best_time(func: Callable, repeat: int) -> float:
+    """多次执行取最短耗时.
+
+    Args:
+        func: 要计时的函数.
+        repeat: 重复次数.
+
+    Returns:
+        float: 最短耗时, 单位毫秒.
+    """
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start_time)
+    return min(times) * 1000
+
+
+def main(count: int = 500, repeat: int = 20):
+    """输出每种请求 secsgem 逐个变量回复和快照回复的耗时, 并确认两种回复的字节相同.
+
+    Args:
+        count: sv 和 ec 的个数.
+        repeat: 重复次数.
+    """
+    handler = get_handler(count)
+    sv_ids = list(range(10000, 10000 + count))
+    ec_ids = list(range(20000, 20000 + count))
+    cases = {
+        "S1F3": ("_on_s01f03", get_message(handler, 1, 3, sv_ids)),
+        "S1F11": ("_on_s01f11", get_message(handler, 1, 11, sv_ids)),
+        "S2F13": ("_on_s02f13", get_message(handler, 2, 13, ec_ids)),
+    }
+    for name, (method_name, message) in cases.items():
+        per_variable_method = getattr(GemEquipmentHandler, method_name)
+        snapshot_method = getattr(HandlerPassive, method_name)
+        expected = per_variable_method(handler, None, message).encode()
+        actual = snapshot_method(handler, None, message).encode()
+        per_variable = best_time(lambda: per_variable_method(handler, None, message).encode(), repeat)
+        snapshot = best_time(lambda: snapshot_method(handler, None, message).encode(), repeat)
+        print(
+            f"{name} {count} 个 id: 逐个变量 {per_variable:.2f} ms ({1000 / per_variable:.0f} 次/s), "
+            f"快照 {snapshot:.2f} ms ({1000 / snapshot:.0f} 次/s), 回复相同: {expected == actual}"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(_) for _ in sys.argv[1:3]))
@@ -0,0 +1,186 @@
+# pylint: skip-file
+"""报警记录的查询, 统计和清理."""
+import datetime
+import logging
+import time
+from typing import Any, Optional, Union
+
+from mysql_api.mysql_database import MySQLDatabase
+from sqlalchemy import delete, insert, select
+
+from passive_equipment import models_class
+
+STATS_COLUMNS = ["alarm_id", "alarm_text", "created_at", "cleared_at"]
+ARCHIVE_COLUMNS = ["id", "alarm_id", "alarm_text", "cleared_at", "created_at"]  # 归档时从报警记录复制的列
+
+
+class AlarmHistory:
+    """报警记录.
+
+    报警发生时新增一行, 解除时给同一个报警最后一条未解除的记录填上 cleared_at.
+    查询都按 created_at 限定时间范围, 使用迁移里添加的 (created_at) 和 (alarm_id, created_at) 索引.
+    """
+
+    def __init__(self, mysql: MySQLDatabase, logger: logging.Logger = None):
+        """AlarmHistory 构造函数.
+
+        Args:
+            mysql: 数据库实例.
+            logger: 日志器, 默认使用本模块的日志器.
+        """
+        self.mysql = mysql
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.archived_count = 0  # 归档的记录数量
+        self.deleted_count = 0  # 删除的记录数量
+
+    def record_set(self, alarm_id: int, alarm_text: str):
+        """保存报警发生记录.
+
+        Args:
+            alarm_id: 报警 id.
+            alarm_text: 报警内容.
+        """
+        self.mysql.add_data(models_class.AlarmRecordList, [{"alarm_id": alarm_id, "alarm_text": alarm_text}])
+
+    def record_clear(self, alarm_id: int):
+        """给报警最后一条未解除的记录填上解除时间.
+
+        Args:
+            alarm_id: 报警 id.
+        """
+        self.mysql.update_data(
+            models_class.AlarmRecordList, {"cleared_at": datetime.datetime.now()},
+            {"alarm_id": alarm_id, "cleared_at": None}, limit=1
+        )
+
+    def query(
+            self, start_time: Union[str, datetime.datetime], end_time: Union[str, datetime.datetime],
+            alarm_id: Optional[int] = None, page: int = 1, per_page: int = 100
+    ) -> dict[str, Any]:
+        """分页查询时间范围内的报警记录.
+
+        Args:
+            start_time: 开始时间.
+            end_time: 结束时间.
+            alarm_id: 报警 id, 默认查询所有报警.
+            page: 页码, 从 1 开始.
+            per_page: 每页条数.
+
+        Returns:
+            dict[str, Any]: 页码, 每页条数和记录, 每条记录带有持续时间, 未解除的报警持续时间是 None.
+        """
+        filter_dict = {"alarm_id": alarm_id} if alarm_id is not None else None
+        records = self.mysql.query_data_by_datetime(
+            models_class.AlarmRecordList, "created_at", start_time, end_time, filter_dict, page=page, per_page=per_page
+        )
+        for record in records:
+            record["duration"] = self._get_duration(record)
+        return {"page": page, "per_page": per_page, "records": records}
+
+    def get_stats(
+            self, start_time: Union[str, datetime.datetime], end_time: Union[str, datetime.datetime]
+    ) -> list[dict[str, Any]]:
+        """统计时间范围内每个报警的次数和持续时间.
+
+        Args:
+            start_time: 开始时间.
+            end_time: 结束时间.
+
+        Returns:
+            list[dict[str, Any]]: 每个报警的统计, 按发生次数从多到少排序.
+        """
+        stats: dict[int, dict[str, Any]] = {}
+        records = self.mysql.query_data_by_datetime(
+            models_class.AlarmRecordList, "created_at", start_time, end_time, columns_return=STATS_COLUMNS
+        )
+        for record in records:
+            alarm_stats = stats.setdefault(record["alarm_id"], {
+                "alarm_id": record["alarm_id"], "alarm_text": record["alarm_text"], "count": 0, "open_count": 0,
+                "total_duration": 0.0, "max_duration": 0.0
+            })
+            alarm_stats["count"] += 1
+            if (duration := self._get_duration(record)) is None:
+                alarm_stats["open_count"] += 1
+                continue
+            alarm_stats["total_duration"] += duration
+            alarm_stats["max_duration"] = max(alarm_stats["max_duration"], duration)
+        for alarm_stats in stats.values():
+            cleared_count = alarm_stats["count"] - alarm_stats["open_count"]
+            alarm_stats["mean_duration"] = alarm_stats["total_duration"] / cleared_count if cleared_count else None
+        return sorted(stats.values(), key=lambda _: _["count"], reverse=True)
+
+    def purge(
+            self, before: datetime.datetime, batch_size: int = 500, archive: bool = True, batch_gap: float = 0.1
+    ) -> int:
+        """按批归档或删除 before 之前的记录, 每批是一个小事务, 批之间休眠让出数据库.
+
+        每批的归档和删除在同一个事务里, 归档使用 INSERT IGNORE, 中途失败重新清理时不会因为已归档的记录报主键冲突.
+
+        Args:
+            before: 早于这个时间的记录会被清理.
+            batch_size: 每批的记录数量.
+            archive: 是否先复制到归档表再删除.
+            batch_gap: 批之间的休眠时间, 单位秒.
+
+        Returns:
+            int: 清理的记录数量.
+        """
+        purged_count = 0
+        while ids := [
+            record["id"] for record in self.mysql.query_data_by_datetime(
+                models_class.AlarmRecordList, "created_at", end_time=before, columns_return=["id"], per_page=batch_size
+            )
+        ]:
+            self._purge_batch(ids, archive)
+            purged_count += len(ids)
+            if len(ids) < batch_size:
+                break
+            time.sleep(batch_gap)
+        if purged_count:
+            self.logger.info("清理 %s 之前的报警记录 %s 条, 归档: %s", before, purged_count, archive)
+        return purged_count
+
+    def get_state(self) -> dict:
+        """获取清理的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {"archived_count": self.archived_count, "deleted_count": self.deleted_count}
+
+    def _purge_batch(self, ids: list[int], archive: bool):
+        """在一个事务里归档并删除一批记录.
+
+        Args:
+            ids: 记录 id.
+            archive: 是否先复制到归档表再删除.
+        """
+        record_table = models_class.AlarmRecordList.__table__
+        archive_table = models_class.AlarmRecordArchiveList.__table__
+        with self.mysql.engine.begin() as connection:
+            if archive:
+                result = connection.execute(
+                    insert(archive_table).prefix_with("IGNORE").from_select(
+                        ARCHIVE_COLUMNS,
+                        select(*(record_table.c[_] for _ in ARCHIVE_COLUMNS)).where(record_table.c.id.in_(ids))
+                    )
+                )
+                archived_count = result.rowcount
+            result = connection.execute(delete(record_table).where(record_table.c.id.in_(ids)))
+        if archive:
+            self.archived_count += archived_count
+        self.deleted_count += result.rowcount
+
+    @staticmethod
+    def _get_duration(record: dict[str, Any]) -> Optional[float]:
+        """计算报警持续时间.
+
+        Args:
+            record: 报警记录.
+
+        Returns:
+            Optional[float]: 持续时间, 单位秒, 未解除返回 None.
+        """
+        if record.get("cleared_at") is None or record.get("created_at") is None:
+            return None
+        return (record["cleared_at"] - record["created_at"]).total_seconds()
@@ -0,0 +1,189 @@
+# pylint: skip-file
+"""NumPy 存储的数组变量."""
+import json
+from typing import Optional, Union
+
+import numpy as np
+from secsgem.secs.variables import Array, Base, Binary, Boolean, F4, F8, I1, I2, I4, I8, U1, U2, U4, U8
+
+SECS_DTYPES = {
+    U1: np.dtype("u1"), U2: np.dtype(">u2"), U4: np.dtype(">u4"), U8: np.dtype(">u8"),
+    I1: np.dtype("i1"), I2: np.dtype(">i2"), I4: np.dtype(">i4"), I8: np.dtype(">i8"),
+    F4: np.dtype(">f4"), F8: np.dtype(">f8"), Boolean: np.dtype("u1"), Binary: np.dtype("u1")
+}  # secs 数值类型对应的大端 dtype
+S7_DTYPES = {
+    "int": np.dtype(">i2"), "dint": np.dtype(">i4"), "real": np.dtype(">f4"), "lreal": np.dtype(">f8"),
+    "bool": np.dtype("u1")
+}  # 西门子 plc 数据类型对应的大端 dtype
+
+
+class NumpyArray(Array):
+    """用 ndarray 保存值的 Array, 编码结果和 Array 相同, 都是 L[n] 里每个元素一个单值 item.
+
+    编码时一次性生成所有元素的 item 头和大端数据, 不会为每个元素创建 secs 变量对象.
+    """
+
+    def __init__(self, data_format: type[Base], value=None, count: int = -1):
+        """NumpyArray 构造函数.
+
+        Args:
+            data_format: 元素的 secs 类型, 必须是 SECS_DTYPES 里的类型.
+            value: 初始值, list 或 ndarray.
+            count: 元素个数, -1 代表不限制.
+        """
+        self._values = np.empty(0, dtype=SECS_DTYPES[data_format].newbyteorder("="))
+        super().__init__(data_format, value, count)
+
+    @property
+    def data(self) -> list[Base]:
+        """兼容 Array 的元素列表, 只在打印和遍历时生成."""
+        return [self.item_decriptor(value) for value in self._values.tolist()]
+
+    @data.setter
+    def data(self, items: list[Base]):
+        self._values = np.array(
+            [item.get()[0] if isinstance(item.get(), list) else item.get() for item in items],
+            dtype=self._values.dtype
+        )
+
+    @property
+    def values(self) -> np.ndarray:
+        """元素值."""
+        return self._values
+
+    def __len__(self):
+        """Get the length."""
+        return len(self._values)
+
+    def set(self, value: Union[list, np.ndarray]):
+        """设置元素值.
+
+        Args:
+            value: list 或 ndarray.
+        """
+        if not isinstance(value, (list, np.ndarray)):
+            raise TypeError(f"Invalid value type {type(value).__name__} for {self.__class__.__name__}")
+        if self.count >= 0 and not len(value) == self.count:
+            raise ValueError(f"Value has invalid field count (expected: {self.count}, actual: {len(value)})")
+        self._values = np.asarray(value, dtype=self._values.dtype)
+
+    def get(self) -> list:
+        """Return the internal value."""
+        return self._values.tolist()
+
+    def append(self, data):
+        """追加一个元素.
+
+        Args:
+            data: 元素值.
+        """
+        self._values = np.append(self._values, np.asarray([data], dtype=self._values.dtype))
+
+    def encode(self) -> bytes:
+        """编码成 secs 数据, 每个元素是 2 字节的 item 头加大端数据.
+
+        Returns:
+            bytes: 编码后的数据.
+        """
+        item_dtype = SECS_DTYPES[self.item_decriptor]
+        items = np.empty(len(self._values), dtype=[("format", "u1"), ("length", "u1"), ("value", item_dtype)])
+        items["format"] = (self.item_decriptor.format_code << 2) | 1
+        items["length"] = item_dtype.itemsize
+        values = self._values != 0 if self.item_decriptor is Boolean else self._values
+        items["value"] = values
+        return self.encode_item_header(len(self._values)) + items.tobytes()
+
+    def decode(self, data: bytes, start: int = 0) -> int:
+        """解码 secs 数据.
+
+        Args:
+            data: 编码后的数据.
+            start: 开始位置.
+
+        Returns:
+            int: 解码结束的位置.
+        """
+        array = Array(self.item_decriptor)
+        position = array.decode(data, start)
+        self.data = array.data
+        return position
+
+
+def is_numpy_type(base_value_type: Optional[type[Base]]) -> bool:
+    """判断元素类型能否用 ndarray 保存.
+
+    Args:
+        base_value_type: 元素的 secs 类型.
+
+    Returns:
+        bool: 能用 ndarray 保存返回 True.
+    """
+    return base_value_type in SECS_DTYPES
+
+
+def to_array_value(value: Union[str, list, np.ndarray, None], base_value_type: Optional[type[Base]]) -> Union[list, np.ndarray]:
+    """把 json 字符串, list 转换成数组变量的值.
+
+    Args:
+        value: json 字符串, list 或 ndarray.
+        base_value_type: 元素的 secs 类型.
+
+    Returns:
+        Union[list, np.ndarray]: 数值类型元素返回 ndarray, 其他返回 list.
+    """
+    if isinstance(value, str):
+        value = json.loads(value) if value else []
+    if value is None:
+        value = []
+    if is_numpy_type(base_value_type):
+        return np.asarray(value, dtype=SECS_DTYPES[base_value_type].newbyteorder("="))
+    return value
+
+
+def to_secs_array(base_value_type: type[Base], value: Union[list, np.ndarray]) -> Array:
+    """把数组变量的值转换成 secs 数组.
+
+    Args:
+        base_value_type: 元素的 secs 类型.
+        value: list 或 ndarray.
+
+    Returns:
+        Array: 数值类型元素返回 NumpyArray, 其他返回 Array.
+    """
+    if is_numpy_type(base_value_type):
+        return NumpyArray(base_value_type, value)
+    return Array(base_value_type, value.tolist() if isinstance(value, np.ndarray) else value)
+
+
+def decode_s7_array(buffer: Union[bytes, bytearray], data_type: str, count: int, gap: int, bit_index: int = 0) -> np.ndarray:
+    """从西门子 plc 读取的连续字节里按间隔解析数组, 不逐个元素解析.
+
+    Args:
+        buffer: 从第一个元素开始的字节.
+        data_type: plc 数据类型.
+        count: 元素个数.
+        gap: 相邻元素的字节间隔.
+        bit_index: bool 类型的 bit 位.
+
+    Returns:
+        np.ndarray: 解析后的数组, 本机字节序.
+    """
+    dtype = S7_DTYPES[data_type]
+    values = np.ndarray(shape=(count,), dtype=dtype, buffer=bytes(buffer), strides=(gap,))
+    if data_type == "bool":
+        return ((values >> bit_index) & 1).astype(bool)
+    return values.astype(dtype.newbyteorder("="))
+
+
+def get_s7_read_size(data_type: str, count: int, gap: int) -> int:
+    """计算按间隔读取数组需要读取的字节数.
+
+    Args:
+        data_type: plc 数据类型.
+        count: 元素个数.
+        gap: 相邻元素的字节间隔.
+
+    Returns:
+        int: 字节数.
+    """
+    return (count - 1) * gap + S7_DTYPES[data_type].itemsize
@@ -0,0 +1,289 @@
+# pylint: skip-file
+"""设备的 asyncio 运行时."""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Coroutine, Optional
+
+from passive_equipment import metrics
+from passive_equipment.exception import EquipmentRuntimeError
+from passive_equipment.scan_scheduler import ScanTask
+
+LOOP_LAG_PERIOD = 0.1  # 检查事件循环调度延迟的周期, 单位秒
+
+
+class AsyncRuntime:
+    """心跳, 状态监控, 信号监控和 socket 服务端都是同一个事件循环上的任务.
+
+    周期任务在事件循环上等待截止时间, 阻塞的 plc 读写放进固定大小的扫描线程池执行.
+    信号流程放进阻塞线程池, 事件发送和报警发送放进单独的事件线程池, 都会等待 host 回复, 不会占满扫描线程池.
+    流程里会发送事件并等待回复, 如果和事件发送共用线程池, 流程占满线程池后事件排在后面发不出去, 流程等不到回复,
+    所以事件发送使用自己的线程池, 流程再多也不会卡住事件发送.
+    线程数量最多是 1 + scan_worker_count + blocking_worker_count + event_worker_count, 和信号数量, 事件数量无关.
+    提供和 ScanScheduler 相同的 add_task, cancel, get_tasks 和 get_state, 可以代替扫描调度器传给设备.
+    """
+
+    def __init__(
+            self, scan_worker_count: int = 4, blocking_worker_count: int = 8, event_worker_count: int = 4,
+            logger: logging.Logger = None
+    ):
+        """AsyncRuntime 构造函数.
+
+        Args:
+            scan_worker_count: 执行扫描任务的线程数量.
+            blocking_worker_count: 执行信号流程等长时间阻塞操作的线程数量, 也是同时执行的流程数量上限.
+            event_worker_count: 发送事件和报警的线程数量, 也是同时等待 host 回复的事件和报警数量上限.
+            logger: 日志器, 默认使用本模块的日志器.
+        """
+        self.scan_worker_count = scan_worker_count
+        self.blocking_worker_count = blocking_worker_count
+        self.event_worker_count = event_worker_count
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.tasks: list[ScanTask] = []
+        self.blocking_count = 0  # 提交到阻塞线程池的次数
+        self.event_count = 0  # 提交到事件线程池的次数
+        self.loop_lag = metrics.RollingStats()  # 事件循环的调度延迟, 单位秒
+
+        self._loop = asyncio.new_event_loop()
+        self._scan_executor = ThreadPoolExecutor(scan_worker_count, thread_name_prefix="scan")
+        self._blocking_executor = ThreadPoolExecutor(blocking_worker_count, thread_name_prefix="blocking")
+        self._event_executor = ThreadPoolExecutor(event_worker_count, thread_name_prefix="event")
+        self._task_futures: dict[ScanTask, Future] = {}  # 扫描任务对应的事件循环任务
+        self._task_wakeups: dict[ScanTask, asyncio.Event] = {}  # 周期变短时提前唤醒等待中的任务
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """运行时的事件循环."""
+        return self._loop
+
+    def start(self):
+        """启动事件循环线程, 添加任务时会自动启动."""
+        with self._lock:
+            if self._closed:
+                raise EquipmentRuntimeError("运行时已经关闭")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_loop, name="async-runtime", daemon=True)
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._monitor_loop_lag(), self._loop)
+
+    def run_coroutine(self, coroutine: Coroutine) -> Future:
+        """在事件循环上运行协程, 可以在任意线程调用.
+
+        Args:
+            coroutine: 协程.
+
+        Returns:
+            Future: 协程的结果, 调用 cancel 会取消协程.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def submit_blocking(self, func: Callable, *args) -> Future:
+        """把会长时间阻塞的函数放进阻塞线程池执行.
+
+        Args:
+            func: 函数.
+            *args: 函数的参数.
+
+        Returns:
+            Future: 函数的结果.
+
+        Raises:
+            EquipmentRuntimeError: 运行时已经关闭.
+        """
+        if self._closed:
+            raise EquipmentRuntimeError("运行时已经关闭")
+        self.blocking_count += 1
+        return self._blocking_executor.submit(func, *args)
+
+    def submit_event(self, func: Callable, *args) -> Future:
+        """把事件发送和报警发送放进事件线程池执行, 不和信号流程抢线程.
+
+        Args:
+            func: 函数.
+            *args: 函数的参数.
+
+        Returns:
+            Future: 函数的结果.
+
+        Raises:
+            EquipmentRuntimeError: 运行时已经关闭.
+        """
+        if self._closed:
+            raise EquipmentRuntimeError("运行时已经关闭")
+        self.event_count += 1
+        return self._event_executor.submit(func, *args)
+
+    def add_task(
+            self, name: str, func: Callable[[], None], period: float, owner: str = "", delay: float = 0
+    ) -> ScanTask:
+        """添加周期任务.
+
+        Args:
+            name: 任务名称.
+            func: 每个周期在扫描线程池里执行一次的函数.
+            period: 周期, 单位秒.
+            owner: 任务所属的设备名称.
+            delay: 第一次执行前等待的时间, 单位秒.
+
+        Returns:
+            ScanTask: 扫描任务.
+        """
+        task = ScanTask(name, func, float(period), owner)
+        task.next_deadline = time.monotonic() + delay
+        self.tasks.append(task)
+        self._task_futures[task] = self.run_coroutine(self._run_task(task))
+        return task
+
+    def cancel(self, task: ScanTask):
+        """取消周期任务, 正在线程池里执行的函数执行完后不再执行.
+
+        Args:
+            task: 扫描任务.
+        """
+        task.cancelled = True
+        if task in self.tasks:
+            self.tasks.remove(task)
+        if future := self._task_futures.pop(task, None):
+            future.cancel()
+
+    def set_period(self, task: ScanTask, period: float):
+        """修改任务的周期, 周期变短时下一次截止时间跟着提前, 可以在任意线程调用.
+
+        Args:
+            task: 扫描任务.
+            period: 新的周期, 单位秒.
+        """
+        if self._thread is None:
+            task.period = period
+        else:
+            self._loop.call_soon_threadsafe(self._set_period, task, period)
+
+    def get_tasks(self, owner: Optional[str] = None) -> list[ScanTask]:
+        """获取周期任务.
+
+        Args:
+            owner: 设备名称, 默认获取所有任务.
+
+        Returns:
+            list[ScanTask]: 扫描任务列表.
+        """
+        return [task for task in list(self.tasks) if owner is None or task.owner == owner]
+
+    def get_state(self, owner: Optional[str] = None) -> dict:
+        """获取运行时的统计信息.
+
+        Args:
+            owner: 设备名称, 默认统计所有任务.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "worker_count": len(self._scan_executor._threads), "task_count": len(self.get_tasks(owner)),
+            "blocking_worker_count": len(self._blocking_executor._threads), "blocking_count": self.blocking_count,
+            "event_worker_count": len(self._event_executor._threads), "event_count": self.event_count,
+            "thread_count": threading.active_count(), "loop_lag": self.loop_lag.get_state(),
+            "tasks": {f"{task.owner}.{task.name}": task.get_state() for task in self.get_tasks(owner)}
+        }
+
+    def shutdown(self, timeout: float = 5):
+        """取消所有任务, 停止事件循环和线程池.
+
+        线程池里还没有开始的函数不再执行, 正在执行的函数执行完后线程退出.
+
+        Args:
+            timeout: 等待事件循环上的任务取消完成的时间.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for task in list(self.tasks):
+            task.cancelled = True
+        self.tasks.clear()
+        self._task_futures.clear()
+        if self._thread is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._cancel_all(), self._loop).result(timeout)
+            except Exception as e:
+                self.logger.warning("取消运行时任务出现异常: %s", str(e))
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout)
+        self._scan_executor.shutdown(wait=False, cancel_futures=True)
+        self._blocking_executor.shutdown(wait=False, cancel_futures=True)
+        self._event_executor.shutdown(wait=False, cancel_futures=True)
+        self.logger.info("运行时已经关闭")
+
+    def _run_loop(self):
+        """事件循环线程, 停止后关闭事件循环."""
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+
+    async def _run_task(self, task: ScanTask):
+        """周期任务, 等到截止时间后在扫描线程池里执行一次.
+
+        Args:
+            task: 扫描任务.
+        """
+        wakeup = self._task_wakeups[task] = asyncio.Event()
+        try:
+            while not task.cancelled:
+                if (wait_time := task.next_deadline - time.monotonic()) > 0:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), wait_time)
+                    except asyncio.TimeoutError:
+                        pass
+                    wakeup.clear()
+                    continue
+                start_time = time.monotonic()
+                task.lateness.record(start_time - task.next_deadline)
+                task.running = True
+                try:
+                    await self._loop.run_in_executor(self._scan_executor, task.func)
+                except Exception as e:
+                    task.error_count += 1
+                    self.logger.warning("扫描任务 %s.%s 出现异常: %s", task.owner, task.name, str(e))
+                task.running = False
+                task.run_count += 1
+                task.duration.record(time.monotonic() - start_time)
+                task.schedule_next()
+        finally:
+            self._task_wakeups.pop(task, None)
+
+    def _set_period(self, task: ScanTask, period: float):
+        """在事件循环上修改任务的周期, 等待中的任务截止时间提前时唤醒它.
+
+        Args:
+            task: 扫描任务.
+            period: 新的周期, 单位秒.
+        """
+        next_deadline = task.next_deadline - task.period + period
+        task.period = period
+        if not task.running and next_deadline < task.next_deadline and (wakeup := self._task_wakeups.get(task)):
+            task.next_deadline = max(next_deadline, time.monotonic())
+            wakeup.set()
+
+    async def _monitor_loop_lag(self):
+        """记录事件循环的调度延迟, 延迟大说明有协程在事件循环上执行了阻塞操作."""
+        while True:
+            start_time = time.monotonic()
+            await asyncio.sleep(LOOP_LAG_PERIOD)
+            self.loop_lag.record(time.monotonic() - start_time - LOOP_LAG_PERIOD)
+
+    @staticmethod
+    async def _cancel_all():
+        """取消事件循环上除自己以外的所有任务, 等待它们结束."""
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,37 @@
+# pylint: skip-file
+"""重连退避策略."""
+import random
+
+
+class ExponentialBackoff:
+    """带抖动的指数退避, 每次失败后等待时间翻倍, 直到上限."""
+
+    def __init__(self, base: float = 1, cap: float = 30, factor: float = 2, jitter: float = 0.5):
+        """ExponentialBackoff 构造函数.
+
+        Args:
+            base: 第一次等待时间, 单位秒.
+            cap: 最长等待时间, 单位秒.
+            factor: 每次失败后等待时间的倍数.
+            jitter: 抖动比例, 0.5 代表实际等待时间在计算值的 50% ~ 100% 之间随机.
+        """
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        """获取下一次重试前的等待时间.
+
+        Returns:
+            float: 等待时间, 单位秒.
+        """
+        delay = min(self.cap, self.base * self.factor ** self.attempts)
+        if delay < self.cap:
+            self.attempts += 1
+        return delay * (1 - self.jitter * random.random())
+
+    def reset(self):
+        """成功后重置退避次数."""
+        self.attempts = 0
@@ -5,41 +5,187 @@ import os
 import pathlib
 import subprocess
 from datetime import datetime
-from typing import Union
+from typing import Callable, Optional, Union
 
+import numpy as np
 
-def parse_value(value: str, value_type: str) -> Union[int, float, str, bool, list]:
+from passive_equipment import array_value
+from passive_equipment.enum_sece_data_type import EnumSecsDataType
+from passive_equipment.exception import EquipmentRuntimeError
+
+
+BOOL_FALSE_VALUES = ("false", "False", "FALSE", 0, "0", "", None)
+
+
+def _parse_int(value: Union[str, int, None], base_value_type: Optional[type] = None) -> int:
+    """解析整数, 空值解析成 0."""
+    return int(value) if value else 0
+
+
+def _parse_float(value: Union[str, float, None], base_value_type: Optional[type] = None) -> float:
+    """解析浮点数, 空值解析成 0.0."""
+    return float(value) if value else 0.0
+
+
+def _parse_bool(value: Union[str, int, bool, None], base_value_type: Optional[type] = None) -> bool:
+    """解析布尔值."""
+    return value not in BOOL_FALSE_VALUES
+
+
+def _parse_text(value: Optional[str], base_value_type: Optional[type] = None) -> Optional[str]:
+    """文本和 LIST 类型不解析, 原样返回."""
+    return value
+
+
+def _parse_array(value: Union[str, list, None], base_value_type: Optional[type] = None) -> Union[list, np.ndarray]:
+    """解析数组, 数值类型的子元素解析成 ndarray."""
+    return array_value.to_array_value(value, base_value_type)
+
+
+VALUE_PARSERS = {
+    EnumSecsDataType.U1.name: _parse_int, EnumSecsDataType.U4.name: _parse_int, EnumSecsDataType.I4.name: _parse_int,
+    EnumSecsDataType.BINARY.name: _parse_int, EnumSecsDataType.F4.name: _parse_float,
+    EnumSecsDataType.BOOL.name: _parse_bool, EnumSecsDataType.ASCII.name: _parse_text,
+    EnumSecsDataType.LIST.name: _parse_text, EnumSecsDataType.ARRAY.name: _parse_array
+}  # 数据类型名称对应的解析函数, 覆盖 EnumSecsDataType 的所有成员
+if _missing_types := set(EnumSecsDataType.__members__) - set(VALUE_PARSERS):
+    raise EquipmentRuntimeError(f"以下数据类型没有解析函数: {_missing_types}")
+SECS_TYPES = {member.name: member.value for member in EnumSecsDataType}  # 数据类型名称对应的 secs 类型
+
+
+def _get_value_parser(value_type: str) -> Callable:
+    """根据数据类型名称获取解析函数.
+
+    Args:
+        value_type: 数据类型名称.
+
+    Returns:
+        Callable: 解析函数.
+
+    Raises:
+        EquipmentRuntimeError: 不支持的数据类型.
+    """
+    if (parser := VALUE_PARSERS.get(value_type)) is None:
+        raise EquipmentRuntimeError(f"不支持的数据类型: {value_type}, 支持的类型: {list(VALUE_PARSERS)}")
+    return parser
+
+
+def _get_base_type(base_value_type: Optional[str]) -> Optional[type]:
+    """根据子元素数据类型名称获取 secs 类型.
+
+    Args:
+        base_value_type: 子元素数据类型名称.
+
+    Returns:
+        Optional[type]: secs 类型, 没有子元素类型返回 None.
+
+    Raises:
+        EquipmentRuntimeError: 不支持的数据类型.
+    """
+    if not base_value_type:
+        return None
+    if (base_type := SECS_TYPES.get(base_value_type)) is None:
+        raise EquipmentRuntimeError(f"不支持的子元素数据类型: {base_value_type}")
+    return base_type
+
+
+def parse_value(
+        value: str, value_type: str, base_value_type: Optional[str] = None
+) -> Union[int, float, str, bool, list, np.ndarray]:
     """解析数值.
 
     Args:
         value: 解析的数据
-        value_type: 数据类型.
+        value_type: 数据类型, 必须是 EnumSecsDataType 的成员名称.
+        base_value_type: 数据类型是 ARRAY 时子元素的数据类型, 数值类型的子元素解析成 ndarray.
 
     Returns:
-        Union[int, float, str, bool, list]: 解析后的数据.
+        Union[int, float, str, bool, list, np.ndarray]: 解析后的数据.
+
+    Raises:
+        EquipmentRuntimeError: 不支持的数据类型.
     """
-    int_type_flag = "U1,U4,I4"
-    float_type_flag = "F4"
-    bool_type_flag = "BOOL"
-    list_type_flag = "ARRAY"
-    binary_type_flag = "BINARY"
-
-    if value_type in int_type_flag:
-        return int(value) if value else 0
-    elif value_type in float_type_flag:
-        return float(value) if value else 0.0
-    elif value_type in bool_type_flag:
-        if value in ["false", "False", "FALSE", 0, "0", "", None]:
-            return False
-        return True
-    elif value_type in list_type_flag:
-        if isinstance(value, str):
-            return json.loads(value) if value else []
-        return value
-    elif value_type in binary_type_flag:
-        return int(value) if value else 0
-    else:
-        return value
+    if (parser := VALUE_PARSERS.get(value_type)) is None:
+        parser = _get_value_parser(value_type)
+    return parser(value, _get_base_type(base_value_type) if base_value_type else None)
+
+
+def parse_values(
+        values: list, value_types: Union[str, list[str]], base_value_types: Optional[list[Optional[str]]] = None
+) -> list[Union[int, float, str, bool, list, np.ndarray]]:
+    """批量解析一列数值.
+
+    每种数据类型只查找一次解析函数, 所有 ARRAY 类型的 json 字符串拼接后只调用一次 json.loads.
+    拼接后解析失败, 解析出的数量和行数不一致或者有元素不是数组时, 说明有的行格式不对, 改为逐行解析,
+    格式不对的行单独报错, 不会让后面的值错位.
+
+    Args:
+        values: 要解析的数据列表.
+        value_types: 数据类型, 所有数据类型相同时可以只传一个名称, 否则传和 values 一样长的列表.
+        base_value_types: 每个数据的子元素数据类型, 默认都没有.
+
+    Returns:
+        list[Union[int, float, str, bool, list, np.ndarray]]: 解析后的数据列表, 顺序和 values 一致.
+
+    Raises:
+        EquipmentRuntimeError: 不支持的数据类型.
+    """
+    if isinstance(value_types, str):
+        value_types = [value_types] * len(values)
+    if base_value_types is None:
+        base_value_types = [None] * len(values)
+    if not len(values) == len(value_types) == len(base_value_types):
+        raise EquipmentRuntimeError(f"数据数量 {len(values)} 和数据类型数量 {len(value_types)} 不一致")
+
+    parsers = {value_type: _get_value_parser(value_type) for value_type in set(value_types)}
+    base_types = {base_value_type: _get_base_type(base_value_type) for base_value_type in set(base_value_types)}
+    array_name = EnumSecsDataType.ARRAY.name
+    if array_name in parsers and (json_indexes := [
+        index for index, (value, value_type) in enumerate(zip(values, value_types))
+        if value_type == array_name and isinstance(value, str) and value
+    ]):
+        if (json_values := _load_json_rows([values[index] for index in json_indexes])) is not None:
+            values = list(values)
+            for index, json_value in zip(json_indexes, json_values):
+                values[index] = json_value
+    if not any(base_types.values()):
+        return [parsers[value_type](value) for value, value_type in zip(values, value_types)]
+    return [
+        parsers[value_type](value, base_types[base_value_type])
+        for value, value_type, base_value_type in zip(values, value_types, base_value_types)
+    ]
+
+
+def _load_json_rows(rows: list[str]) -> Optional[list[list]]:
+    """把多行 json 数组字符串拼接后一次解析.
+
+    Args:
+        rows: 每行一个 json 数组字符串.
+
+    Returns:
+        Optional[list[list]]: 每行解析出的数组, 解析失败或者结果和行数对不上时返回 None.
+    """
+    try:
+        json_values = json.loads(f"[{','.join(rows)}]")
+    except json.JSONDecodeError:
+        return None
+    if len(json_values) != len(rows) or not all(isinstance(json_value, list) for json_value in json_values):
+        return None
+    return json_values
+
+
+def dump_value(value: Union[int, float, str, bool, list, np.ndarray]) -> Union[int, float, str, bool, list]:
+    """把变量值转换成保存到数据库 JSON 列的值, ndarray 转换成 list.
+
+    Args:
+        value: 变量值.
+
+    Returns:
+        Union[int, float, str, bool, list]: 保存到数据库的值.
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
 
 
 def set_date_time(modify_time_str) -> bool:
@@ -0,0 +1,145 @@
+# pylint: skip-file
+"""一个进程运行多台设备."""
+import json
+import logging
+import threading
+from typing import Callable, Optional, Union
+
+from inovance_tag.tag_communication import TagCommunication
+from mitsubishi_plc.mitsubishi_plc import MitsubishiPlc
+from modbus_api.modbus_api import ModbusApi
+from siemens_plc.s7_plc import S7PLC
+
+from passive_equipment import factory, common_func
+from passive_equipment.async_runtime import AsyncRuntime
+from passive_equipment.exception import EquipmentRuntimeError
+from passive_equipment.handler_passive import HandlerPassive
+from passive_equipment.scan_scheduler import ScanScheduler
+from passive_equipment.thread_methods import ThreadMethods
+
+
+class EquipmentHost:
+    """在一个进程里运行多台设备.
+
+    每台设备有自己的 hsms 端口, plc 和保存配置的数据库, 数据库连接池, 扫描调度器, 日志文件和 socket 服务端所有设备共用.
+    socket 请求通过 equipment_name 字段指定设备, 例如 {"equipment_name": "cvd_1_snap7", "get_metrics": ""},
+    只有一台设备时可以省略.
+    使用 asyncio 运行时时, 所有设备的扫描任务, 事件发送, 信号流程和共用的 socket 服务端都在同一个运行时上执行.
+    """
+
+    LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(filename)s:%(lineno)d - %(message)s"
+
+    def __init__(
+            self, socket_ip: str = "127.0.0.1", socket_port: int = 1830, scan_worker_count: int = 4,
+            async_runtime: bool = False
+    ):
+        """EquipmentHost 构造函数.
+
+        Args:
+            socket_ip: 共用的 socket 服务端监听的 ip.
+            socket_port: 共用的 socket 服务端监听的端口.
+            scan_worker_count: 扫描调度器的工作线程数量, 和设备数量无关.
+            async_runtime: 是否使用 asyncio 运行时代替扫描调度器.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.equipments: dict[str, HandlerPassive] = {}  # 设备名称对应的设备
+        self.runtime = AsyncRuntime(scan_worker_count, logger=self.logger) if async_runtime else None
+        self.scan_scheduler = self.runtime or ScanScheduler(scan_worker_count, self.logger)
+        self.socket_server = factory.get_socket_server(socket_ip, socket_port)
+        self.socket_server.operations_return_data = self.operate_func_socket
+
+        common_func.create_log_dir()
+        self.file_handler = factory.get_time_rotating_handler()  # 所有设备的日志写入同一个文件, 日志器名称里带有设备名称
+        self.file_handler.namer = common_func.custom_log_name
+        self.file_handler.setFormatter(logging.Formatter(self.LOG_FORMAT))
+        self.logger.addHandler(self.file_handler)
+        self.socket_server.logger.addHandler(self.file_handler)
+        self._socket_started = False
+
+    def add_equipment(
+            self, equipment_name: str, plc: Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi],
+            database_name: str, open_flag: bool = False, handler_class: type[HandlerPassive] = HandlerPassive,
+            plc_factory: Optional[Callable[[], Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi]]] = None
+    ) -> HandlerPassive:
+        """创建并启动一台设备.
+
+        Args:
+            equipment_name: 设备名称, 也是 socket 请求里的 equipment_name.
+            plc: plc 实例对象.
+            database_name: 保存设备配置的数据库名称, 设备的 hsms 端口从这个数据库的 ec secs_port 读取.
+            open_flag: 是否打开监控 plc 的扫描任务.
+            handler_class: 设备类, HandlerPassive 或者它的子类, 子类的构造函数需要接收并传递 HandlerPassive 的参数.
+            plc_factory: 创建 plc 实例的函数, 传入时这台设备的监控地址在单独的扫描进程里扫描.
+
+        Returns:
+            HandlerPassive: 设备实例.
+
+        Raises:
+            EquipmentRuntimeError: 设备名称已经存在.
+        """
+        if equipment_name in self.equipments:
+            raise EquipmentRuntimeError(f"设备 {equipment_name} 已经存在")
+        equipment = handler_class(
+            equipment_name, plc, open_flag, database_name=database_name, scan_scheduler=self.scan_scheduler,
+            socket_server=self.socket_server, plc_factory=plc_factory, runtime=self.runtime
+        )
+        self.equipments[equipment_name] = equipment
+        self.logger.info(
+            "添加设备 %s, 数据库: %s, hsms 端口: %s", equipment_name, database_name, equipment.settings.port
+        )
+        return equipment
+
+    def start(self):
+        """启动共用的 socket 服务端, 使用运行时时 socket 服务端是运行时上的任务."""
+        if self._socket_started:
+            return
+        self._socket_started = True
+        if self.runtime:
+            self.runtime.run_coroutine(self.socket_server.run_socket_server())
+            return
+        threading.Thread(target=ThreadMethods.run_socket_server, args=(self.socket_server,), daemon=True).start()
+
+    def stop(self):
+        """停止所有设备的扫描进程, 使用运行时时关闭运行时."""
+        for equipment in self.equipments.values():
+            if equipment.scan_process:
+                equipment.scan_process.stop()
+        if self.runtime:
+            self.runtime.shutdown()
+
+    def get_state(self) -> dict:
+        """获取所有设备和共用资源的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "equipments": {
+                equipment_name: {
+                    "hsms_port": equipment.settings.port, "plc_connected": equipment.plc_supervisor.connected
+                }
+                for equipment_name, equipment in self.equipments.items()
+            },
+            "thread_count": threading.active_count(),
+            "scan_scheduler": self.scan_scheduler.get_state(),
+        }
+
+    async def operate_func_socket(self, byte_data) -> str:
+        """按 equipment_name 把 socket 请求转发给设备, 没有设备名称的 get_host_state 请求返回所有设备的统计信息.
+
+        Args:
+            byte_data: 下位机发送的数据.
+
+        Returns:
+            str: 返回的数据.
+        """
+        receive_dict = json.loads(byte_data.decode("UTF-8"))
+        equipment_name = receive_dict.pop("equipment_name", None)
+        if equipment_name is None and "get_host_state" in receive_dict:
+            return json.dumps(self.get_state())
+        if equipment_name is None and len(self.equipments) == 1:
+            equipment_name = next(iter(self.equipments))
+        if (equipment := self.equipments.get(equipment_name)) is None:
+            self.logger.warning("socket 请求的设备 %s 不存在, 请求: %s", equipment_name, receive_dict)
+            return f"设备 {equipment_name} 不存在"
+        return await equipment.execute_socket_operation(receive_dict)
@@ -1,37 +1,115 @@
 # pylint: skip-file
 """生成实例的方法集合."""
+import copy
 import os
-from logging.handlers import TimedRotatingFileHandler
+import threading
+from typing import Optional
 
 from mysql_api.mysql_database import MySQLDatabase
 from secsgem.common import DeviceType
 from secsgem.hsms import HsmsSettings, HsmsConnectMode
 from socket_cyg.socket_server_asyncio import CygSocketServerAsyncio
+from sqlalchemy.orm import scoped_session, sessionmaker
 
 from passive_equipment import models_class
+from passive_equipment.log_rate_limit import RateLimitFilter
+from passive_equipment.log_rotation import SizeTimeRotatingFileHandler
+from passive_equipment.recipe_store import RecipeStore
+from passive_equipment.scan_scheduler import ScanScheduler
+from passive_equipment.secs_spool import SecsSpool
 
+_mysql_instances: dict[Optional[str], MySQLDatabase] = {}  # 数据库名称对应的实例, None 是默认数据库
+_mysql_lock = threading.Lock()
+_shared_instances: dict[str, object] = {}  # 进程里共用的扫描调度器, 日志处理器和日志限流
+_shared_lock = threading.Lock()
 
-def get_mysql_secs() -> MySQLDatabase:
-    """获取 secs 数据库实例对象.
+
+def get_mysql_secs(database_name: Optional[str] = None) -> MySQLDatabase:
+    """获取 secs 数据库实例对象, 同一个数据库只创建一次.
+
+    不同设备的配置保存在同一个 mysql 服务的不同数据库里, 所有数据库共用默认实例的连接池,
+    查询时通过 schema_translate_map 把表名映射到设备自己的数据库.
+
+    Args:
+        database_name: 数据库名称, 默认使用 MySQLDatabase 的默认数据库.
 
     Returns:
         MySQLDatabase: 返回 secs 数据库实例对象.
     """
-    return MySQLDatabase("root", "liuwei.520")
+    with _mysql_lock:
+        if (mysql := _mysql_instances.get(database_name)) is not None:
+            return mysql
+        if (default_mysql := _mysql_instances.get(None)) is None:
+            default_mysql = _mysql_instances[None] = MySQLDatabase("root", "liuwei.520")
+        if database_name is None or database_name == default_mysql.engine.url.database:
+            mysql = default_mysql
+        else:
+            mysql = copy.copy(default_mysql)
+            mysql.engine = default_mysql.engine.execution_options(schema_translate_map={None: database_name})
+            mysql.session = scoped_session(sessionmaker(bind=mysql.engine))
+        _mysql_instances[database_name] = mysql
+        return mysql
+
+
+def get_socket_server(ip: str = "127.0.0.1", port: int = 1830) -> CygSocketServerAsyncio:
+    """获取 socket 服务端示例.
+
+    Args:
+        ip: 监听的 ip.
+        port: 监听的端口.
+
+    Returns:
+        CygSocketServerAsyncio: 返回 socket 服务端实例.
+    """
+    return CygSocketServerAsyncio(ip, port)
+
+
+def get_scan_scheduler() -> ScanScheduler:
+    """获取进程里所有设备共用的扫描调度器.
+
+    Returns:
+        ScanScheduler: 返回 ScanScheduler 实例对象.
+    """
+    with _shared_lock:
+        if "scan_scheduler" not in _shared_instances:
+            _shared_instances["scan_scheduler"] = ScanScheduler()
+        return _shared_instances["scan_scheduler"]
+
+
+def get_secs_spool(equipment_name: str = "") -> SecsSpool:
+    """获取 host 离线时缓存消息的 spool 实例对象.
+
+    Args:
+        equipment_name: 设备名称, 一个进程运行多台设备时每台设备使用自己的子目录.
+
+    Returns:
+        SecsSpool: 返回 SecsSpool 实例对象.
+    """
+    return SecsSpool(os.path.join(os.getcwd(), "spool", equipment_name))
 
 
-def get_socket_server():
-    """获取 socket 服务端示例"""
-    return CygSocketServerAsyncio("127.0.0.1", 1830)
+def get_recipe_store(equipment_name: str = "") -> RecipeStore:
+    """获取保存配方 body 的 RecipeStore 实例对象.
+
+    Args:
+        equipment_name: 设备名称, 一个进程运行多台设备时每台设备使用自己的子目录.
+
+    Returns:
+        RecipeStore: 返回 RecipeStore 实例对象.
+    """
+    return RecipeStore(os.path.join(os.getcwd(), "recipe", equipment_name))
 
 
-def get_hsms_setting() -> HsmsSettings:
+def get_hsms_setting(mysql: Optional[MySQLDatabase] = None) -> HsmsSettings:
     """获取 HsmsSettings 实例对象.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         HsmsSettings: 返回 HsmsSettings 实例对象.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     secs_ip = mysql.query_data(models_class.EcList, {"ec_name": "secs_ip"})[0].get("value", "127.0.0.1")
     secs_port = mysql.query_data(models_class.EcList, {"ec_name": "secs_port"})[0].get("value", 5000)
     hsms_settings = HsmsSettings(
@@ -43,13 +121,33 @@ def get_hsms_setting() -> HsmsSettings:
     return hsms_settings
 
 
-def get_time_rotating_handler() -> TimedRotatingFileHandler:
-    """获取自动生成日志的日志器实例.
+def get_log_rate_limiter() -> RateLimitFilter:
+    """获取日志限流, 进程里所有设备共用一个, 同一个调用位置的重复告警只统计一次.
 
     Returns:
-        TimedRotatingFileHandler: 返回自动生成日志的日志器实例.
+        RateLimitFilter: 日志限流实例.
     """
-    return TimedRotatingFileHandler(
-        f"{os.getcwd()}/log/all.log",
-        when="D", interval=1, backupCount=10, encoding="UTF-8"
-    )
+    with _shared_lock:
+        if "log_rate_limiter" not in _shared_instances:
+            _shared_instances["log_rate_limiter"] = RateLimitFilter()
+        return _shared_instances["log_rate_limiter"]
+
+
+def get_time_rotating_handler() -> SizeTimeRotatingFileHandler:
+    """获取自动生成日志的日志器实例, 进程里所有设备共用一个, 避免多个处理器同时写入和轮转同一个文件.
+
+    处理器带有日志限流, 故障期间重复的告警不会一直写入日志文件.
+    日志每天或者超过 100MB 时轮转, 轮转后的文件在后台压缩, 所有日志文件最多占用 2GB.
+
+    Returns:
+        SizeTimeRotatingFileHandler: 返回自动生成日志的日志器实例.
+    """
+    log_rate_limiter = get_log_rate_limiter()
+    with _shared_lock:
+        if "time_rotating_handler" not in _shared_instances:
+            _shared_instances["time_rotating_handler"] = SizeTimeRotatingFileHandler(
+                f"{os.getcwd()}/log/all.log", when="D", interval=1, backup_count=200,
+                max_bytes=100 * 1024 * 1024, max_total_bytes=2 * 1024 * 1024 * 1024, encoding="UTF-8"
+            )
+            _shared_instances["time_rotating_handler"].addFilter(log_rate_limiter)
+        return _shared_instances["time_rotating_handler"]
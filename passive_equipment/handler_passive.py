@@ -1,29 +1,57 @@
 # pylint: skip-file
 """设备服务端处理器."""
 import asyncio
+import functools
+import itertools
 import json
 import logging
+import queue
 import threading
 import time
 import socket
-from datetime import datetime
-from logging.handlers import TimedRotatingFileHandler
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
 from typing import Union, Optional, Callable
 
 from inovance_tag.tag_communication import TagCommunication
 from mitsubishi_plc.mitsubishi_plc import MitsubishiPlc
 from modbus_api.modbus_api import ModbusApi
-from secsgem.gem import GemEquipmentHandler
-from secsgem.secs.data_items import ACKC10
+import numpy as np
+from secsgem.gem import EquipmentConstantId, GemEquipmentHandler, StatusVariableId
+from secsgem.secs.data_items import ACKC7, ACKC10, PPGNT, RSDA, RSDC, RSPACK, STRACK, TIAACK
 from secsgem.secs.data_items.tiack import TIACK
-from secsgem.secs.functions import SecsS02F18
-from secsgem.secs.variables import U4
+from secsgem.secs.functions import SecsS02F18, SecsStreamFunction
+from secsgem.secs.variables import Array, Base, U4
 from siemens_plc.s7_plc import S7PLC
 from socket_cyg.socket_server_asyncio import CygSocketServerAsyncio
 
+from passive_equipment.alarm_history import AlarmHistory
+from passive_equipment.async_runtime import AsyncRuntime
+from passive_equipment.log_rotation import SizeTimeRotatingFileHandler
+from passive_equipment.lot_tracker import LotProgress, LotTracker
+from passive_equipment.plc_io_lane import PlcIoLane, PRIORITY_HANDSHAKE, PRIORITY_POLL
+from passive_equipment.plc_status_image import S7StatusImage
+from passive_equipment.plc_supervisor import PlcSupervisor
+from passive_equipment.recipe_download import RecipeDownloader, RecipeParameter
+from passive_equipment.scan_process import ScanProcess
+from passive_equipment.scan_scheduler import ScanScheduler
+from passive_equipment.signal_edge import SignalEdge
+from passive_equipment.startup_sequence import StartupSequence
 from passive_equipment.thread_methods import ThreadMethods
+from passive_equipment.trace_collector import TraceCollector, TraceJob
+from passive_equipment.variable_store import DataValueView, StatusVariableView, VariableStore
+from passive_equipment.write_verifier import WriteRequest, WriteResult, WriteVerifier
 
-from passive_equipment import secs_config, factory, common_func, models_class, plc_address_operation
+from passive_equipment import (
+    secs_config, factory, common_func, models_class, plc_address_operation, array_value, variable_snapshot, recipe_store,
+    migration
+)
+from passive_equipment.exception import EquipmentRuntimeError
+
+DYNAMIC_SV_IDS = {sv_id.value for sv_id in StatusVariableId}  # secsgem 每次请求时实时计算的 sv
+DYNAMIC_EC_IDS = {ec_id.value for ec_id in EquipmentConstantId}  # secsgem 每次请求时实时计算的 ec
+STARTUP_WAIT_TIMEOUT = 10  # host 消息和 plc 连接变化等待变量加载完成的最长时间, 比 host 的 T3 短, 单位秒
+PLC_CONNECT_TIMEOUT = 30  # 启动时等待第一次连接 plc 的时间, 超时后由 plc_supervisor 继续重连, 单位秒
 
 
 class HandlerPassive(GemEquipmentHandler):
@@ -32,53 +60,155 @@ class HandlerPassive(GemEquipmentHandler):
     LOG_FORMAT = "%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s"
     logging.basicConfig(level=logging.INFO, encoding="UTF-8", format=LOG_FORMAT)
 
-    def __init__(self, equipment_name: str, plc: Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi], open_flag: bool = False):
+    def __init__(
+            self, equipment_name: str, plc: Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi],
+            open_flag: bool = False, database_name: Optional[str] = None, scan_scheduler: Optional[ScanScheduler] = None,
+            socket_server: Optional[CygSocketServerAsyncio] = None,
+            plc_factory: Optional[Callable[[], Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi]]] = None,
+            runtime: Optional[AsyncRuntime] = None
+    ):
         """HandlerPassive 构造函数.
 
+        启动分成几个阶段并行执行, hsms 服务端最先启动, 不等待数据库升级, 变量加载和 plc 连接;
+        变量加载完成前收到的 host 消息等待加载完成后再处理. 连接 plc 不阻塞构造函数, 其他阶段完成后构造函数返回.
+
         Args:
             equipment_name: 设备名称.
             plc: plc 实例对象.
             open_flag: 是否打开监控 plc 的线程.
+            database_name: 保存设备配置的数据库名称, 默认使用 get_mysql_secs 的默认数据库.
+            scan_scheduler: 扫描调度器, 默认使用进程里共用的扫描调度器.
+            socket_server: 多台设备共用的 socket 服务端, 由 EquipmentHost 运行并按设备名称转发请求,
+                默认创建并运行设备自己的 socket 服务端.
+            plc_factory: 创建 plc 实例的函数, 必须可以被 pickle, 例如 functools.partial(S7PLC, "192.168.0.1"),
+                传入时监控地址在单独的扫描进程里扫描, 扫描进程使用自己创建的 plc 连接, 默认在本进程里扫描.
+            runtime: asyncio 运行时, 传入时代替扫描调度器, 扫描任务, socket 服务端, 事件发送, 报警发送和信号流程
+                都在运行时上执行, 线程数量不随信号和事件数量增加; 默认每个事件, 报警和流程启动一个线程.
         """
-        super().__init__(settings=factory.get_hsms_setting())
-
-        self.logger = logging.getLogger(__name__)  # handler_passive 日志器
-        self.mysql_secs = factory.get_mysql_secs()
-        self.socket_server = factory.get_socket_server()
-        self.plc = plc
+        mysql_secs = factory.get_mysql_secs(database_name)
+        super().__init__(settings=factory.get_hsms_setting(mysql_secs))
+
+        self.equipment_name = equipment_name
+        self.logger = logging.getLogger(f"{__name__}.{equipment_name}")  # handler_passive 日志器, 每台设备一个
+        self.mysql_secs = mysql_secs
+        self.alarm_history = AlarmHistory(self.mysql_secs, self.logger)  # 报警记录的查询, 统计和清理
+        self._shared_socket_server = socket_server is not None  # 是否和其他设备共用进程和 socket 服务端
+        self.socket_server = socket_server if socket_server else factory.get_socket_server()
+        data_dir_name = equipment_name if self._shared_socket_server else ""  # 共用进程时每台设备使用自己的子目录
+        self.secs_spool = factory.get_secs_spool(data_dir_name)  # host 离线时缓存事件和报警
+        self.spool_transmit_event = threading.Event()  # host 通过 S6F23 请求发送 spool 数据
+        self.recipe_store = factory.get_recipe_store(data_dir_name)  # 配方 body 的分块存储
+        self.recipe_tasks = queue.Queue()  # 配方线程要执行的 (函数, 参数)
+        self.runtime = runtime  # asyncio 运行时, 未使用时为 None
+        self.scan_scheduler = runtime or scan_scheduler or factory.get_scan_scheduler()  # plc 扫描任务的调度器
+        self.plc = PlcIoLane(plc)  # 所有线程通过同一个读写通道访问 plc
         self.plc_type = equipment_name.split("_")[-1]
+        self.plc_supervisor = PlcSupervisor(self.plc, self.logger)  # 所有线程共用的 plc 连接监督者
+        self.plc_supervisor.add_listener(self._on_plc_link_change)
 
         self._file_handler = None  # 保存日志的处理器
+        self._offline_control_state = None  # plc 断线前的控制状态, 没有配置控制状态地址时恢复连接后还原
         self._open_flag = open_flag  # 是否打开监控 plc 的线程
-        self._initial_status_variable()
-        self._initial_data_value()
-        self._initial_event()
-        self._initial_equipment_constant()
-        self._initial_remote_command()
-        self._initial_alarm()
+        self._plc_factory = plc_factory
         self._initial_log_config()
-
+        self.variable_store = VariableStore()  # sv, dv, ec 的值, gem 变量对象只是存储的视图
+        self.status_image: Optional[S7StatusImage] = None  # 监控线程共用的 S7 状态映像, 未开启时为 None
+        self.scan_process: Optional[ScanProcess] = None  # 单独的 plc 扫描进程, 未开启时为 None
+        self.write_verifier = WriteVerifier(self.plc, self.logger)  # 写入后回读校验
+        self.recipe_downloader = RecipeDownloader(self.plc, self.write_verifier, self.logger)  # 切换配方时下载配方参数
+        self.last_recipe_download = None  # 最后一次下载配方参数的结果
+        self.lot_tracker: Optional[LotTracker] = None  # 当前工单的生产进度
+        self.trace_collector: Optional[TraceCollector] = None  # S2F23 定义的 trace 采样
+        self.flow_step_executor: Optional[ThreadPoolExecutor] = None  # 并发执行 step 相同的流程步骤, ec 开启时才创建
         self.thread_methods = ThreadMethods(self)
 
-        self.enable_mes()  # 启动设备端服务器
+        self.startup = self._create_startup_sequence()  # 启动阶段和每个阶段的耗时
+        self.startup.start()
+        self.startup.wait([name for name in self.startup.phases if name != "plc_connect"])
+        self.startup.check(self.startup.phases)
+
+    def _create_startup_sequence(self) -> StartupSequence:
+        """创建启动阶段, 没有依赖关系的阶段并行执行.
+
+        Returns:
+            StartupSequence: 启动阶段.
+        """
+        startup = StartupSequence(self.logger)
+        startup.add_phase("hsms_enable", self.enable_mes)
+        if self._open_flag:
+            startup.add_phase("plc_connect", self._connect_plc)
+        startup.add_phase("upgrade_database", self._upgrade_database)
+        loaders = {
+            "load_sv": self._initial_status_variable, "load_dv": self._initial_data_value,
+            "load_event": self._initial_event, "load_ec": self._initial_equipment_constant,
+            "load_remote_command": self._initial_remote_command, "load_alarm": self._initial_alarm
+        }
+        for name, loader in loaders.items():
+            startup.add_phase(name, loader, ["upgrade_database"])
+        startup.add_phase("variable_snapshot", self._initial_variable_snapshot, loaders)
+        startup.add_phase("components", self._create_components, ["variable_snapshot"])
+        startup.add_phase("monitors", self._start_monitors, ["components"])
+        return startup
+
+    def _connect_plc(self):
+        """启动 plc_supervisor 并等待第一次连接, 连接失败时由 plc_supervisor 继续重连."""
+        self.plc_supervisor.start()
+        if not self.plc_supervisor.wait_connected(PLC_CONNECT_TIMEOUT):
+            self.logger.warning("%s 秒内没有连接上 plc, plc_supervisor 继续重连", PLC_CONNECT_TIMEOUT)
+
+    def _create_components(self):
+        """创建依赖 ec 和 sv 的组件."""
+        self.status_image = self._create_status_image()
+        self.scan_process = self._create_scan_process(self._plc_factory)
+        self.lot_tracker = self._create_lot_tracker()
+        self.trace_collector = TraceCollector(
+            self.plc, self.variable_store, self.logger,
+            max_block_bytes=int(self.get_ec_value_with_name("status_image_block_bytes", False, 200))
+        )
+        if self.get_ec_value_with_name("flow_parallel_steps", False, False):
+            self.flow_step_executor = ThreadPoolExecutor(
+                int(self.get_ec_value_with_name("flow_step_workers", False, 4)), thread_name_prefix="flow-step"
+            )
+
+    def _start_monitors(self):
+        """启动 socket 服务端, 后台线程和监控 plc 的扫描任务."""
         self._monitor_socket_thread()
+        self._monitor_spool_thread()
+        self._monitor_recipe_thread()
+        self._monitor_trace_thread()
+        self._monitor_alarm_retention_thread()
         self._monitor_control_thread()
 
     def _monitor_socket_thread(self):
-        """监控 socket 的线程."""
-        self.__start_monitor_socket_thread(self.socket_server, self.operate_func_socket)
+        """监控 socket 的线程, 共用的 socket 服务端由 EquipmentHost 运行."""
+        if not self._shared_socket_server:
+            self.__start_monitor_socket_thread(self.socket_server, self.operate_func_socket)
+
+    def _monitor_spool_thread(self):
+        """Host 恢复通讯后重发 spool 消息的线程."""
+        threading.Thread(target=self.thread_methods.spool_replay, daemon=True).start()
+
+    def _monitor_recipe_thread(self):
+        """保存, 读取和删除配方 body 的线程."""
+        threading.Thread(target=self.thread_methods.recipe_worker, daemon=True).start()
+
+    def _monitor_alarm_retention_thread(self):
+        """清理过期报警记录的线程."""
+        threading.Thread(target=self.thread_methods.alarm_retention, daemon=True).start()
+
+    def _monitor_trace_thread(self):
+        """发送 trace 报告的线程."""
+        threading.Thread(target=self.thread_methods.trace_sender, daemon=True).start()
 
     def _monitor_control_thread(self):
-        """监控 plc 的线程."""
+        """监控 plc 的扫描任务."""
         if self._open_flag:
-            self.logger.info("打开监控 plc 的线程.")
-            if self.plc.communication_open():
-                self.logger.info("首次连接 plc 成功, ip: %s", self.plc.ip)
-            else:
-                self.logger.info("首次连接 %s plc 失败, ip: %s", self.plc.ip)
-            self.__start_monitor_plc_thread()
+            self.logger.info("打开监控 plc 的扫描任务.")
+            if self.scan_process:
+                self.scan_process.start()
+            self.thread_methods.add_scan_tasks(self.scan_scheduler)
         else:
-            self.logger.info("不打开监控 plc 的线程.")
+            self.logger.info("不打开监控 plc 的扫描任务.")
 
     def __start_monitor_socket_thread(self, control_instance: CygSocketServerAsyncio, func: Callable):
         """启动 socket 服务.
@@ -88,32 +218,203 @@ class HandlerPassive(GemEquipmentHandler):
             func: 执行操作的函数.
         """
         control_instance.operations_return_data = func
+        if self.runtime:
+            self.runtime.run_coroutine(control_instance.run_socket_server())
+            return
         threading.Thread(target=self.thread_methods.run_socket_server, args=(control_instance,), daemon=True).start()
 
-    def __start_monitor_plc_thread(self):
-        """启动监控 plc 的线程."""
-        threading.Thread(target=self.thread_methods.mes_heart, daemon=True).start()
-        threading.Thread(target=self.thread_methods.control_state, daemon=True).start()
-        threading.Thread(target=self.thread_methods.machine_state, daemon=True).start()
-        threading.Thread(target=self.thread_methods.current_recipe_id, daemon=True).start()
-        for signal_address_info in plc_address_operation.get_signal_address_list():
-            if signal_address_info.get("state", False):  # 实时监控的信号才会创建线程
-                threading.Thread(
-                    target=self.thread_methods.monitor_plc_address, daemon=True,
-                    args=(signal_address_info, ),
-                ).start()
+    def start_background(self, func: Callable, *args, event: bool = False) -> Future:
+        """在后台执行会阻塞的函数, 使用运行时时放进运行时的线程池, 否则启动一个线程, 异常只记录日志.
+
+        Args:
+            func: 函数.
+            *args: 函数的参数.
+            event: 是否是事件或者报警发送, 使用运行时时放进事件线程池, 不和信号流程共用阻塞线程池.
+
+        Returns:
+            Future: 函数的结果.
+        """
+        if self.runtime:
+            future = (self.runtime.submit_event if event else self.runtime.submit_blocking)(func, *args)
+        else:
+            future = Future()
+            threading.Thread(target=self._run_with_future, args=(future, func, *args), daemon=True).start()
+        future.add_done_callback(functools.partial(self._on_background_done, func))
+        return future
+
+    def _on_background_done(self, func: Callable, future: Future):
+        """后台函数执行结束, 出现异常时记录日志.
+
+        Args:
+            func: 函数.
+            future: 函数的结果.
+        """
+        if not future.cancelled() and (error := future.exception()):
+            self.logger.warning("后台任务 %s 出现异常: %s", getattr(func, "__name__", func), str(error))
+
+    @staticmethod
+    def _run_with_future(future: Future, func: Callable, *args):
+        """在线程里执行函数, 把结果放进 Future.
+
+        Args:
+            future: 函数的结果.
+            func: 函数.
+            *args: 函数的参数.
+        """
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _upgrade_database(self):
+        """把数据库结构升级到最新版本, 失败时启动失败, 不能在缺少 role 等列的数据库上运行.
+
+        Raises:
+            EquipmentRuntimeError: 升级失败.
+        """
+        try:
+            migration.upgrade_database(self.mysql_secs.engine)
+        except Exception as e:
+            raise EquipmentRuntimeError(f"升级数据库结构失败: {e}") from e
+
+    def _on_plc_link_change(self, connected: bool):
+        """Plc 连接状态变化, 断线和断线后恢复时都更新控制状态并发送事件.
+
+        恢复时配置了控制状态地址就直接读取 plc, 值和断线时设置的 0 不同才发送事件; 没有配置时还原断线前的控制状态.
+
+        Args:
+            connected: 是否已连接.
+        """
+        if not self.startup.wait_ready("components", STARTUP_WAIT_TIMEOUT):  # 启动期间连接状态变化时, 等 sv 和事件加载完成
+            self.logger.warning("启动失败或者没有完成, 不处理 plc 连接状态变化: %s", connected)
+            return
+        self._invalidate_plc_values()
+        if connected:
+            self.logger.info("Plc 已连接, ip: %s", self.plc.ip)
+            if not self.plc_supervisor.link_down_count:  # 第一次连接, 控制状态由扫描任务更新
+                return
+            if (address_info := self.thread_methods.control_state_address_info) is not None:
+                self.thread_methods.control_state(address_info, max_age=0)
+            else:
+                self.set_sv_value_with_name("control_state", self._offline_control_state)
+                self.send_s6f11(1001)
+        else:
+            self.logger.warning("Plc 已断开, ip: %s", self.plc.ip)
+            self._offline_control_state = self.get_sv_value_with_name("control_state", save_log=False)
+            self.set_sv_value_with_name("control_state", 0)
+            self.send_s6f11(1001)
+
+    def _create_status_image(self) -> Optional[S7StatusImage]:
+        """西门子 plc 开启状态映像时创建状态映像.
+
+        Returns:
+            Optional[S7StatusImage]: 状态映像, 不是西门子 plc 或未开启时返回 None.
+        """
+        if not isinstance(self.plc.driver, S7PLC) or not self.get_ec_value_with_name("status_image_enable", False, True):
+            return None
+        return S7StatusImage(
+            self.plc, cycle_time=float(self.get_ec_value_with_name("status_image_cycle", False, 0.5)),
+            max_block_bytes=int(self.get_ec_value_with_name("status_image_block_bytes", False, 200))
+        )
+
+    def _create_scan_process(
+            self, plc_factory: Optional[Callable[[], Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi]]]
+    ) -> Optional[ScanProcess]:
+        """传入创建 plc 实例的函数时创建扫描进程客户端, 打开监控时启动扫描进程.
+
+        Args:
+            plc_factory: 创建 plc 实例的函数.
+
+        Returns:
+            Optional[ScanProcess]: 扫描进程客户端, 没有传入 plc_factory 时返回 None.
+        """
+        if plc_factory is None:
+            return None
+        return ScanProcess(
+            plc_factory, self.plc, cycle_time=float(self.get_ec_value_with_name("scan_process_cycle", False, 0.1)),
+            logger=self.logger
+        )
+
+    def _invalidate_plc_values(self):
+        """写入 plc 或重新连接后调用, 之后的读取不使用之前扫描的值."""
+        if self.status_image:
+            self.status_image.invalidate()
+        if self.scan_process:
+            self.scan_process.invalidate()
+
+    def _create_lot_tracker(self) -> LotTracker:
+        """创建工单进度跟踪, 程序重启后继续跟踪 sv 里保存的工单.
+
+        Returns:
+            LotTracker: 工单进度跟踪.
+        """
+        lot_tracker = LotTracker(
+            self.mysql_secs, self.logger, flush_gap=float(self.get_ec_value_with_name("lot_flush_gap", False, 5))
+        )
+        if lot_name := self.get_sv_value_with_name("lot_name", save_log=False):
+            lot_tracker.start_lot(
+                lot_name, self.get_sv_value_with_name("lot_quantity", save_log=False) or 0,
+                self.get_sv_value_with_name("recipe_name", save_log=False), resume=True
+            )
+        return lot_tracker
+
+    def on_lot_progress(self, progress: LotProgress):
+        """工单已生产数量变化, 更新 sv 并按 ec 配置发送进度事件和完成事件.
+
+        Args:
+            progress: 工单进度.
+        """
+        self.set_sv_value_with_name("do_quantity", progress.do_quantity, False)
+        if (event_id := self.get_ec_value_with_name("lot_progress_event", False)) in self.collection_events:
+            self.send_s6f11(event_id)
+        if progress.state_changed:
+            if (event_id := self.get_ec_value_with_name("lot_end_event", False)) in self.collection_events:
+                self.send_s6f11(event_id)
+
+    def on_signal_missed(self, address_info: dict, edge: SignalEdge):
+        """检测到漏掉的触发, 记录告警并按 ec 配置发送事件.
+
+        Args:
+            address_info: 信号地址.
+            edge: 漏掉触发之后的这次触发.
+        """
+        self.logger.warning(
+            "%s 漏掉 %s 次触发, 当前计数: %s", address_info["description"], edge.missed_count, edge.sequence
+        )
+        if (event_id := self.get_ec_value_with_name("signal_missed_event", False)) in self.collection_events:
+            self.send_s6f11(event_id)
+
+    def read_plc_value(
+            self, address_info: dict, priority: int = PRIORITY_POLL, max_age: Optional[float] = None
+    ) -> Union[int, float, bool, str]:
+        """读取监控地址的值, 开启扫描进程时从共享变量表读取, 开启状态映像时从映像读取.
+
+        Args:
+            address_info: 地址信息.
+            priority: 读取优先级.
+            max_age: 值最多允许旧多少秒, 扫描进程或者状态映像的刷新周期比它长时直接读取 plc, 默认不限制.
+
+        Returns:
+            Union[int, float, bool, str]: 读取的值.
+        """
+        if self.scan_process and (max_age is None or self.scan_process.cycle_time <= max_age):
+            return self.scan_process.read(address_info, priority)
+        if self.status_image and (max_age is None or self.status_image.cycle_time <= max_age):
+            return self.status_image.read(address_info, priority)
+        return self.plc.execute_read(**address_info, save_log=False, priority=priority)
 
     @property
-    def file_handler(self) -> TimedRotatingFileHandler:
-        """设置保存日志的处理器, 每隔 24h 自动生成一个日志文件.
+    def file_handler(self) -> SizeTimeRotatingFileHandler:
+        """设置保存日志的处理器, 每隔 24h 或者超过大小上限时自动生成一个日志文件.
 
         Returns:
-            TimedRotatingFileHandler: 返回 TimedRotatingFileHandler 日志处理器.
+            SizeTimeRotatingFileHandler: 返回 SizeTimeRotatingFileHandler 日志处理器.
         """
         if self._file_handler is None:
-            self._file_handler = factory.get_time_rotating_handler()
-            self._file_handler.namer = common_func.custom_log_name
-            self._file_handler.setFormatter(logging.Formatter(self.LOG_FORMAT))
+            self._file_handler = factory.get_time_rotating_handler()  # 进程里所有设备共用
+            if self._file_handler.formatter is None:
+                self._file_handler.namer = common_func.custom_log_name
+                self._file_handler.setFormatter(logging.Formatter(self.LOG_FORMAT))
         return self._file_handler
 
     @staticmethod
@@ -136,43 +437,59 @@ class HandlerPassive(GemEquipmentHandler):
         self.logger.addHandler(self.file_handler)  # handler_passive 日志保存到统一文件
         self.socket_server.logger.addHandler(self.file_handler)
         self.plc.logger.addHandler(self.file_handler)
+        for handler in logging.getLogger().handlers:  # 控制台输出和日志文件使用同一个限流, 每条日志只统计一次
+            handler.addFilter(factory.get_log_rate_limiter())
 
     def _initial_status_variable(self):
         """加载定义好的 sv."""
-        status_variables = secs_config.get_sv_list()
+        status_variables = secs_config.get_sv_list(self.variable_store, self.mysql_secs)
         for status_variable in status_variables:
             self.status_variables.update(status_variable)
 
     def _initial_data_value(self):
         """加载定义好的 data value."""
-        data_values = secs_config.get_dv_list()
+        data_values = secs_config.get_dv_list(self.variable_store, self.mysql_secs)
         for data_value in data_values:
             self.data_values.update(data_value)
 
     def _initial_equipment_constant(self):
         """加载定义好的常量."""
-        equipment_consts = secs_config.get_ec_list()
+        equipment_consts = secs_config.get_ec_list(self.variable_store, self.mysql_secs)
         for equipment_const in equipment_consts:
             self.equipment_constants.update(equipment_const)
 
     def _initial_event(self):
         """加载定义好的事件."""
-        events = secs_config.get_event_list()
+        events = secs_config.get_event_list(self.mysql_secs)
         for event in events:
             self.collection_events.update(event)
 
     def _initial_remote_command(self):
         """加载定义好的远程命令."""
-        remote_commands = secs_config.get_remote_command_list()
+        remote_commands = secs_config.get_remote_command_list(self.mysql_secs)
         for remote_command in remote_commands:
             self.remote_commands.update(remote_command)
 
     def _initial_alarm(self):
         """加载定义好的报警."""
-        alarms = secs_config.get_alarm_list()
+        alarms = secs_config.get_alarm_list(self.mysql_secs)
         for alarm in alarms:
             self.alarms.update(alarm)
 
+    def _initial_variable_snapshot(self):
+        """编码所有 sv 和 ec 的当前值, 生成 S1F3, S1F11, S2F13 回复用的快照."""
+        self.sv_snapshot = variable_snapshot.VariableSnapshot()  # sv id 到编码后的值
+        self.ec_snapshot = variable_snapshot.VariableSnapshot()  # ec id 到编码后的值
+        self.sv_snapshot.publish({
+            sv_id: self._encode_variable(sv_instance)
+            for sv_id, sv_instance in self.status_variables.items() if sv_id not in DYNAMIC_SV_IDS
+        })
+        self.ec_snapshot.publish({
+            ec_id: self._encode_variable(ec_instance)
+            for ec_id, ec_instance in self.equipment_constants.items() if ec_id not in DYNAMIC_EC_IDS
+        })
+        self._sv_name_items = {sv_id: self._encode_sv_name(sv_id) for sv_id in self.status_variables}  # S1F11 的元素
+
     def enable_mes(self):
         """启动 EAP 连接的 MES服务."""
         self.enable()  # 设备和host通讯
@@ -191,7 +508,10 @@ class HandlerPassive(GemEquipmentHandler):
             plc_value = self.plc.execute_read(**address_info)
         else:
             read_multiple_value_func = getattr(self, f"read_multiple_value_{self.plc_type}")
-            plc_value = read_multiple_value_func(callback)
+            plc_value = read_multiple_value_func(self.plc, callback)
+            sv_or_dv_instance = self.status_variables.get(sv_or_dv_id) or self.data_values.get(sv_or_dv_id)
+            if sv_or_dv_instance and issubclass(sv_or_dv_instance.value_type, Array):
+                plc_value = array_value.to_array_value(plc_value, sv_or_dv_instance.base_value_type)
         self.set_sv_or_dv_value_with_id(sv_or_dv_id, plc_value)
 
     def write_clean_signal_value(self, address_info: dict, value: int):
@@ -202,26 +522,98 @@ class HandlerPassive(GemEquipmentHandler):
             value: 要写入的值.
         """
         address_info_write = plc_address_operation.get_address_info(self.plc_type, address_info)
-        self.plc.execute_write(**address_info_write, value=value)
+        self.plc.execute_write(**address_info_write, value=value, priority=PRIORITY_HANDSHAKE)
+        self._invalidate_plc_values()
 
-    def write_sv_or_dv_value(self, callback: dict):
-        """向 plc 地址写入 sv 或 dv 值.
+    def write_sv_or_dv_value(self, callback: dict, defer_verify: bool = False) -> list[WriteRequest]:
+        """向 plc 地址写入 sv 或 dv 值, 按地址配置回读校验.
+
+        count_num 不是 1 时按 plc 类型算出每个元素的地址, 逐个元素写入, 需要校验时一起回读校验.
 
         Args:
             callback: 要执行的 callback 信息.
+            defer_verify: 是否延后校验, 延后时返回需要校验的写入请求, 由调用方和后面的写入一起校验.
+
+        Returns:
+            list[WriteRequest]: 延后校验的写入请求.
+
+        Raises:
+            EquipmentRuntimeError: 校验失败.
         """
         sv_or_dv_id = int(callback.get("associate_sv_or_dv"))
         count_num = callback.get("count_num", 1)
         value = self.get_sv_or_dv_value_with_id(sv_or_dv_id)
-        address_info = plc_address_operation.get_address_info(self.plc_type, callback)
-        if count_num == 1:
-            self.plc.execute_write(**address_info, value=value)
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        if count_num != 1:
+            get_multiple_address_info_func = getattr(self, f"get_multiple_address_info_{self.plc_type}")
+            address_infos = get_multiple_address_info_func(callback, len(value))
+            write_requests = [
+                self._get_write_request(callback, address_info, element)
+                for address_info, element in zip(address_infos, value)
+            ]
         else:
-            write_multiple_value_func = getattr(self, f"write_multiple_value_{self.plc_type}")
-            write_multiple_value_func(callback, value)
+            address_info = plc_address_operation.get_address_info(self.plc_type, callback)
+            write_requests = [self._get_write_request(callback, address_info, value)]
+
+        if defer_verify and write_requests and write_requests[0].verify:  # 同一个地址配置的元素校验方式相同
+            for write_request in write_requests:
+                self.plc.execute_write(**write_request.address_info, value=write_request.value)
+            return write_requests
+        self._check_write_results(self.write_verifier.write(write_requests))
+        return []
 
-        if isinstance(self.plc, S7PLC) and address_info.get("data_type") == "bool":
-            self.confirm_write_success(address_info, value)  # 确保写入成功
+    def verify_plc_writes(self, write_requests: list[WriteRequest]):
+        """批量回读校验已经写入的地址, 不一致的重新写入.
+
+        Args:
+            write_requests: 写入请求列表.
+
+        Raises:
+            EquipmentRuntimeError: 校验失败.
+        """
+        if write_requests:
+            self._check_write_results(self.write_verifier.verify(write_requests))
+
+    def _get_write_request(self, callback: dict, address_info: dict, value: Union[int, float, bool, str]) -> WriteRequest:
+        """根据地址配置生成写入请求.
+
+        verify_write 为空时只校验西门子 plc 的 bool 地址, verify_retry 和 verify_timeout 为空时使用 ec 的配置.
+
+        Args:
+            callback: 地址配置.
+            address_info: 地址信息.
+            value: 要写入的值.
+
+        Returns:
+            WriteRequest: 写入请求.
+        """
+        if (verify_write := callback.get("verify_write")) is None:
+            verify_write = isinstance(self.plc.driver, S7PLC) and address_info.get("data_type") == "bool"
+        if (verify_retry := callback.get("verify_retry")) is None:
+            verify_retry = self.get_ec_value_with_name("write_verify_retry", False, 5)
+        if (verify_timeout := callback.get("verify_timeout")) is not None:
+            verify_timeout = verify_timeout / 1000
+        else:
+            verify_timeout = self.get_ec_value_with_name("write_verify_timeout", False, 3)
+        return WriteRequest(
+            address_info, value, verify=bool(verify_write), retry=int(verify_retry), timeout=float(verify_timeout),
+            description=callback.get("description", "")
+        )
+
+    def _check_write_results(self, write_results: list[WriteResult]):
+        """检查写入结果, 有失败时通知 plc_supervisor 并抛出异常.
+
+        Args:
+            write_results: 写入结果列表.
+
+        Raises:
+            EquipmentRuntimeError: 校验失败.
+        """
+        if failed_results := [result for result in write_results if not result.success]:
+            if error := next((result.error for result in failed_results if result.error), None):
+                self.plc_supervisor.report_failure(error)
+            raise EquipmentRuntimeError(f"写入校验失败: {[result.to_dict() for result in failed_results]}")
 
     def get_sv_or_dv_value_with_id(self, sv_or_dv_id: int) -> Union[int, bool, float, str, list]:
         """根据 sv id 或 dv id 获取 sv 或 dv 值.
@@ -256,12 +648,33 @@ class HandlerPassive(GemEquipmentHandler):
         """
         if sv_instance := self.status_variables.get(self.get_sv_id_with_name(sv_name)):
             sv_instance.value = sv_value
+            self._publish_sv(sv_instance)
             self.logger.info("设置 sv 值, %s = %s", sv_instance.name, sv_value)
         if is_save:
             filter_data = {"sv_name": sv_name}
-            update_data = {"value": sv_value}
+            update_data = {"value": common_func.dump_value(sv_value)}
             self.mysql_secs.update_data(models_class.SvList, update_data, filter_data)
 
+    def set_sv_values_with_name(self, sv_values: dict[str, Union[str, int, float, list]], is_save: bool = True):
+        """在同一个版本里设置多个 sv 的值, 事件和 S1F3 要么看到全部新值, 要么都是旧值.
+
+        Args:
+            sv_values: 变量名称和要设定的值.
+            is_save: 是否更新数据库, 默认不更新.
+        """
+        sv_instances = {
+            sv_name: sv_instance for sv_name in sv_values
+            if (sv_instance := self.status_variables.get(self.get_sv_id_with_name(sv_name)))
+        }
+        self.variable_store.write_many({sv_instance.slot: sv_values[sv_name] for sv_name, sv_instance in sv_instances.items()})
+        self._publish_sv(*sv_instances.values())
+        self.logger.info("设置 sv 值, %s", {sv_name: sv_values[sv_name] for sv_name in sv_instances})
+        if is_save:
+            for sv_name, sv_value in sv_values.items():
+                filter_data = {"sv_name": sv_name}
+                update_data = {"value": common_func.dump_value(sv_value)}
+                self.mysql_secs.update_data(models_class.SvList, update_data, filter_data)
+
     def set_dv_value_with_name(self, dv_name: str, dv_value: Union[str, int, float, list], is_save: bool = True):
         """设置指定 dv 变量的值.
 
@@ -275,7 +688,7 @@ class HandlerPassive(GemEquipmentHandler):
             self.logger.info("设置 dv 值, %s = %s", dv_instance.name, dv_value)
         if is_save:
             filter_data = {"dv_name": dv_name}
-            update_data = {"value": dv_value}
+            update_data = {"value": common_func.dump_value(dv_value)}
             self.mysql_secs.update_data(models_class.DvList, update_data, filter_data)
 
     def set_ec_value_with_name(self, ec_name: str, ec_value: Union[str, int, float, list], is_save: bool = True):
@@ -286,13 +699,14 @@ class HandlerPassive(GemEquipmentHandler):
             ec_value: 要设定的值.
             is_save: 是否更新数据库, 默认不更新.
         """
-        if ec_instance := self.data_values.get(self.get_ec_id_with_name(ec_name)):
+        if ec_instance := self.equipment_constants.get(self.get_ec_id_with_name(ec_name)):
             ec_instance.value = ec_value
+            self._publish_ec(ec_instance)
             self.logger.info("设置 ec 值, %s = %s", ec_instance.name, ec_value)
         if is_save:
             filter_data = {"ec_name": ec_name}
-            update_data = {"value": ec_value}
-            self.mysql_secs.update_data(models_class.DvList, update_data, filter_data)
+            update_data = {"value": common_func.dump_value(ec_value)}
+            self.mysql_secs.update_data(models_class.EcList, update_data, filter_data)
 
     def set_sv_value_with_id(self, sv_id: int, sv_value: Union[str, int, float, list], is_save: bool = True):
         """设置指定 sv 变量的值.
@@ -304,10 +718,11 @@ class HandlerPassive(GemEquipmentHandler):
         """
         if sv_instance := self.status_variables.get(sv_id):
             sv_instance.value = sv_value
+            self._publish_sv(sv_instance)
             self.logger.info("设置 sv 值, %s = %s", sv_instance.name, sv_value)
         if is_save:
             filter_data = {"sv_id": sv_id}
-            update_data = {"value": sv_value}
+            update_data = {"value": common_func.dump_value(sv_value)}
             self.mysql_secs.update_data(models_class.SvList, update_data, filter_data)
 
     def set_dv_value_with_id(self, dv_id: int, dv_value: Union[str, int, float, list], is_save: bool = True):
@@ -323,7 +738,7 @@ class HandlerPassive(GemEquipmentHandler):
             self.logger.info("设置 dv 值, %s = %s", dv_instance.name, dv_value)
         if is_save:
             filter_data = {"dv_id": dv_id}
-            update_data = {"value": dv_value}
+            update_data = {"value": common_func.dump_value(dv_value)}
             self.mysql_secs.update_data(models_class.DvList, update_data, filter_data)
 
     def get_sv_value_with_id(self, sv_id: int, save_log: bool = True) -> Optional[Union[int, str, bool, list, float]]:
@@ -360,6 +775,28 @@ class HandlerPassive(GemEquipmentHandler):
             return dv_value
         return None
 
+    def get_sv_or_dv_values_with_ids(self, sv_or_dv_ids: list[int]) -> list[Union[int, str, bool, list, float, None]]:
+        """一次读取多个 sv 或 dv 的值, 所有值来自变量存储的同一个版本.
+
+        Args:
+            sv_or_dv_ids: sv id 或 dv id 列表.
+
+        Returns:
+            list[Union[int, str, bool, list, float, None]]: 值, 顺序和 sv_or_dv_ids 一致, 未定义的变量是 None.
+        """
+        instances = [
+            self.status_variables.get(sv_or_dv_id) if sv_or_dv_id in self.status_variables
+            else self.data_values.get(sv_or_dv_id) for sv_or_dv_id in sv_or_dv_ids
+        ]
+        stored_indexes = [
+            index for index, instance in enumerate(instances) if isinstance(instance, (StatusVariableView, DataValueView))
+        ]
+        _, stored_values = self.variable_store.snapshot([instances[index].slot for index in stored_indexes])
+        values = [instance.value if instance else None for instance in instances]
+        for index, value in zip(stored_indexes, stored_values):
+            values[index] = value
+        return values
+
     def get_sv_value_with_name(self, sv_name: str, save_log: bool = True) -> Optional[Union[int, str, bool, list, float]]:
         """根据变量 sv name 取变量 sv 值..
 
@@ -394,12 +831,15 @@ class HandlerPassive(GemEquipmentHandler):
             return dv_value
         return None
 
-    def get_ec_value_with_name(self, ec_name: str, save_log: bool = True) -> Optional[Union[int, str, bool, list, float]]:
+    def get_ec_value_with_name(
+            self, ec_name: str, save_log: bool = True, default: Optional[Union[int, str, bool, list, float]] = None
+    ) -> Optional[Union[int, str, bool, list, float]]:
         """根据变量 ec name 取变量 ec 值..
 
         Args:
             ec_name: dv id.
             save_log: 是否保存日志, 默认保存.
+            default: 未定义该 ec 时返回的默认值, 默认是 None.
 
         Returns:
             Optional[Union[int, str, bool, list, float]]: 返回对应 ec 变量的值.
@@ -409,7 +849,7 @@ class HandlerPassive(GemEquipmentHandler):
             if save_log:
                 self.logger.info("当前 ec %s = %s", ec_instance.name, ec_value)
             return ec_value
-        return None
+        return default
 
     def get_dv_id_with_name(self, dv_name: str) -> Optional[int]:
         """根据 dv name 获取 dv id.
@@ -519,10 +959,11 @@ class HandlerPassive(GemEquipmentHandler):
         """
         if ec_instance := self.equipment_constants.get(ec_id):
             ec_instance.value = ec_value
+            self._publish_ec(ec_instance)
             self.logger.info("设置 ec 值, %s = %s", ec_instance.name, ec_value)
         if is_save:
             filter_data = {"ec_id": ec_id}
-            update_data = {"value": ec_value}
+            update_data = {"value": common_func.dump_value(ec_value)}
             self.mysql_secs.update_data(models_class.EcList, update_data, filter_data)
 
     def send_s6f11(self, event_id: int):
@@ -531,7 +972,42 @@ class HandlerPassive(GemEquipmentHandler):
         Args:
             event_id: 事件 id.
         """
-        threading.Thread(target=self.thread_methods.collection_event_sender, args=(event_id,), daemon=True).start()
+        self.start_background(self.thread_methods.collection_event_sender, event_id, event=True)
+
+    def send_or_spool(self, function: SecsStreamFunction) -> bool:
+        """发送消息给 host, host 离线或 spool 里还有未重发的消息时写入 spool.
+
+        Args:
+            function: 要发送的消息.
+
+        Returns:
+            bool: 发送成功返回 True, 写入 spool 或发送失败返回 False.
+        """
+        spoolable = self.secs_spool.is_spoolable(function.stream, function.function)
+        if spoolable and (self.secs_spool.pending_count or not self.waitfor_communicating(0)):
+            self._append_to_spool(function)
+            return False
+        if self.send_and_waitfor_response(function) is not None:
+            return True
+        if spoolable:
+            self._append_to_spool(function)
+        else:
+            self.logger.warning("发送 S%sF%s 失败, 该消息不允许 spool", function.stream, function.function)
+        return False
+
+    def _append_to_spool(self, function: SecsStreamFunction):
+        """把消息写入 spool.
+
+        Args:
+            function: 要缓存的消息.
+        """
+        if self.secs_spool.append(function.stream, function.function, function.encode()):
+            self.logger.info(
+                "Host 不在线, S%sF%s 写入 spool, 当前 spool 消息数量: %s",
+                function.stream, function.function, self.secs_spool.pending_count
+            )
+        else:
+            self.logger.warning("Spool 已满, 丢弃 S%sF%s", function.stream, function.function)
 
     def set_clear_alarm(self, alarm_code: int):
         """通过S5F1发送报警和解除报警.
@@ -539,7 +1015,7 @@ class HandlerPassive(GemEquipmentHandler):
         Args:
             alarm_code: 报警 code, 128: 报警, 0: 清除报警.
         """
-        address_info = plc_address_operation.get_alarm_address_info(self.plc_type)
+        address_info = plc_address_operation.get_alarm_address_info(self.plc_type, self.mysql_secs)
         alarm_id = self.plc.execute_read(**address_info, save_log=False)
         self.logger.info("出现报警, 报警id: %s", alarm_id)
         self.send_and_save_alarm(alarm_code, alarm_id)
@@ -576,42 +1052,195 @@ class HandlerPassive(GemEquipmentHandler):
             alarm_text_send = "Alarm is not defined."
             alarm_text_save = "报警未定义"
 
-        threading.Thread(
-            target=self.thread_methods.alarm_sender, args=(alarm_code, alarm_id_send, alarm_text_send,), daemon=True
-        ).start()
+        self.start_background(
+            self.thread_methods.alarm_sender, alarm_code, alarm_id_send, alarm_text_send, event=True
+        )
 
         if alarm_code == int(self.get_ec_value_with_id(701)):
-            alarm_info = {"alarm_id": alarm_id, "alarm_text": alarm_text if alarm_text else alarm_text_save}
-            self.mysql_secs.add_data(models_class.AlarmRecordList, [alarm_info])
+            self.alarm_history.record_set(alarm_id, alarm_text if alarm_text else alarm_text_save)
+        elif isinstance(alarm_id, int):
+            self.alarm_history.record_clear(alarm_id)
 
     def get_signal_to_execute_callbacks(self, callbacks: list):
         """监控到信号执行 call_backs.
 
+        ec flow_parallel_steps 开启时, step 相同并且互不依赖的步骤是一组, 通过读写通道并发执行, 一组全部结束后再执行下一组;
+        默认所有步骤按顺序执行.
+
+        Args:
+            callbacks: 要执行的流程信息列表, 按 step 排序.
+        """
+        groups = self._group_callbacks(callbacks)
+        pending_writes = []  # 连续的写入步骤最后一起回读校验
+        step_num = 1
+        for i, group in enumerate(groups):
+            if len(group) > 1:
+                self._execute_callback_group(group, step_num)
+            else:
+                next_callback = groups[i + 1][0] if i + 1 < len(groups) and len(groups[i + 1]) == 1 else None
+                pending_writes = self._execute_callback(group[0], step_num, pending_writes, next_callback)
+            step_num += len(group)
+
+    def _group_callbacks(self, callbacks: list) -> list[list[dict]]:
+        """把 step 相同的步骤分成一组, 未开启并发或者组内步骤互相依赖时每个步骤单独一组.
+
+        Args:
+            callbacks: 要执行的流程信息列表, 按 step 排序.
+
+        Returns:
+            list[list[dict]]: 步骤分组.
+        """
+        groups = []
+        for step, group in itertools.groupby(callbacks, key=lambda _: _.get("step")):
+            group = list(group)
+            if len(group) > 1 and self.flow_step_executor and self._is_independent(group):
+                groups.append(group)
+            else:
+                if len(group) > 1 and self.flow_step_executor:
+                    self.logger.warning("第 %s 步的 %s 个步骤互相依赖, 按顺序执行", step, len(group))
+                groups.extend([callback] for callback in group)
+        return groups
+
+    def _execute_callback(
+            self, callback: dict, step_num: int, pending_writes: list[WriteRequest], next_callback: Optional[dict] = None
+    ) -> list[WriteRequest]:
+        """执行一个流程步骤.
+
+        Args:
+            callback: 流程步骤信息.
+            step_num: 步骤序号.
+            pending_writes: 前面的写入步骤还没有校验的写入请求.
+            next_callback: 下一个按顺序执行的步骤, 和这个步骤都只写入地址时留给下一个步骤一起校验.
+
+        Returns:
+            list[WriteRequest]: 还没有校验的写入请求.
+        """
+        description = callback.get("description")
+        self.logger.info("%s 第 %s 步: %s %s", "-" * 30, step_num, description, "-" * 30)
+
+        operation_type = callback.get("operation_type")
+        if operation_type == "read":
+            self.read_update_sv_or_dv(callback)
+
+        if operation_type == "write":
+            pending_writes = pending_writes + self.write_sv_or_dv_value(callback, defer_verify=True)
+
+        if pending_writes and not (
+                self._is_plain_write(callback) and next_callback is not None and self._is_plain_write(next_callback)
+        ):
+            self.verify_plc_writes(pending_writes)
+            pending_writes = []
+
+        if func_name := callback.get(f"func_name"):
+            getattr(self, func_name)(callback)
+
+        self._is_send_event(callback.get("event_id"))
+        self.logger.info("%s %s 结束 %s", "-" * 30, description, "-" * 30)
+        return pending_writes
+
+    def _execute_callback_group(self, group: list[dict], step_num: int):
+        """并发执行一组互不依赖的步骤, 每个步骤校验自己的写入, 全部结束后有失败的步骤时抛出第一个异常.
+
+        Args:
+            group: step 相同的步骤.
+            step_num: 第一个步骤的序号.
+
+        Raises:
+            Exception: 组内步骤出现的第一个异常.
+        """
+        self.logger.info("%s 第 %s-%s 步并发执行 %s", "-" * 30, step_num, step_num + len(group) - 1, "-" * 30)
+        futures = [
+            self.flow_step_executor.submit(self._execute_callback, callback, step_num + i, [])
+            for i, callback in enumerate(group)
+        ]
+        errors = [error for future in futures if (error := future.exception()) is not None]
+        if errors:
+            raise errors[0]
+
+    def _is_independent(self, group: list[dict]) -> bool:
+        """判断一组步骤是否互不依赖.
+
+        执行函数或者发送事件的步骤可能读写任意变量, 视为依赖; 其他步骤要求读取更新的变量不重复,
+        不是同组写入用到的变量, 写入的地址区间不和同组其他步骤读写的地址区间重叠.
+
+        Args:
+            group: step 相同的步骤.
+
+        Returns:
+            bool: 互不依赖返回 True.
+        """
+        if any(_.get("func_name") or _.get("event_id") for _ in group):
+            return False
+        reads = [_ for _ in group if _.get("operation_type") == "read"]
+        writes = [_ for _ in group if _.get("operation_type") == "write"]
+        read_ids = [_.get("associate_sv_or_dv") for _ in reads]
+        if len(read_ids) != len(set(read_ids)) or {_.get("associate_sv_or_dv") for _ in writes} & set(read_ids):
+            return False
+        read_spans = [self._get_callback_span(_) for _ in reads]
+        write_spans = [self._get_callback_span(_) for _ in writes]
+        for i, write_span in enumerate(write_spans):
+            if any(self._is_overlap(write_span, span) for span in read_spans + write_spans[i + 1:]):
+                return False
+        return True
+
+    @staticmethod
+    def _get_callback_span(callback: dict) -> tuple:
+        """计算步骤读写的地址区间, 连续地址包括所有元素.
+
         Args:
-            callbacks: 要执行的流程信息列表.
+            callback: 流程步骤信息.
+
+        Returns:
+            tuple: (地址, db 号, 起始字节, 结束字节), 地址不是字节偏移或者数据类型不能计算长度时后三项是 None.
         """
-        for i, callback in enumerate(callbacks, 1):
-            description = callback.get("description")
-            self.logger.info("%s 第 %s 步: %s %s", "-" * 30, i, description, "-" * 30)
+        address_info = {**callback, "db_num": callback.get("db_num") or 0, "size": callback.get("size") or 1}
+        try:
+            span = S7StatusImage.get_span(address_info)
+        except (KeyError, TypeError, ValueError):
+            span = None
+        if span is None:
+            return callback.get("address"), None, None, None
+        db_num, start, end = span
+        if (count_num := int(callback.get("count_num") or 1)) > 1:
+            end += (count_num - 1) * int(callback.get("gap") or 1)
+        return callback.get("address"), db_num, start, end
 
-            operation_type = callback.get("operation_type")
-            if operation_type == "read":
-                self.read_update_sv_or_dv(callback)
+    @staticmethod
+    def _is_overlap(span: tuple, other_span: tuple) -> bool:
+        """判断两个地址区间是否重叠, 有一个没有字节区间时比较地址是否相同.
 
-            if operation_type == "write":
-                self.write_sv_or_dv_value(callback)
+        Args:
+            span: _get_callback_span 返回的区间.
+            other_span: 另一个区间.
 
-            if func_name := callback.get(f"func_name"):
-                getattr(self, func_name)(callback)
+        Returns:
+            bool: 重叠返回 True.
+        """
+        address, db_num, start, end = span
+        other_address, other_db_num, other_start, other_end = other_span
+        if start is None or other_start is None:
+            return str(address) == str(other_address)
+        return db_num == other_db_num and start < other_end and other_start < end
 
-            self._is_send_event(callback.get("event_id"))
-            self.logger.info("%s %s 结束 %s", "-" * 30, description, "-" * 30)
+    @staticmethod
+    def _is_plain_write(callback: dict) -> bool:
+        """判断流程步骤是否只写入地址, 不执行函数也不发送事件, 这样的连续步骤可以一起校验.
+
+        Args:
+            callback: 流程步骤信息.
+
+        Returns:
+            bool: 只写入地址返回 True.
+        """
+        return callback.get("operation_type") == "write" and not callback.get("func_name") and not callback.get("event_id")
 
     def read_multiple_value_snap7(
-            self, plc: Union[S7PLC, TagCommunication, MitsubishiPlc, ModbusApi], callback: dict
-    ) -> list:
+            self, plc: Union[PlcIoLane, S7PLC, TagCommunication, MitsubishiPlc, ModbusApi], callback: dict
+    ) -> Union[list, np.ndarray]:
         """读取 Snap7 plc 多个数据.
 
+        数值和 bool 类型一次读取所有元素所在的字节, 再按间隔解析成 ndarray, 其他类型逐个读取.
+
         Args:
             plc: plc 实例对象.
             callback: callback 信息.
@@ -621,6 +1250,14 @@ class HandlerPassive(GemEquipmentHandler):
         count_num = callback["count_num"]
         gap = callback.get("gap", 1)
         start_address = int(callback.get("address"))
+        data_type = callback.get("data_type")
+        if isinstance(plc, PlcIoLane) and data_type in array_value.S7_DTYPES:
+            read_size = array_value.get_s7_read_size(data_type, count_num, gap)
+            buffer = plc.db_read(self.get_ec_value_with_name("db_num"), start_address, read_size)
+            value_list = array_value.decode_s7_array(buffer, data_type, count_num, gap, callback.get("bit_index", 0))
+            self.logger.info("读取 %s 开始的 %s 个值是: %s", start_address, count_num, value_list)
+            return value_list
+
         for i in range(count_num):
             real_address = start_address + i * gap
             address_info = {
@@ -685,15 +1322,7 @@ class HandlerPassive(GemEquipmentHandler):
             callback: callback 信息.
             value_list: 写入的值列表.
         """
-        gap = callback.get("gap", 1)
-        for i, value in enumerate(value_list):
-            address_info = {
-                "address": int(callback.get("address")) + gap * i,
-                "data_type": callback.get("data_type"),
-                "db_num": self.get_ec_value_with_name("db_num"),
-                "size": callback.get("size", 2),
-                "bit_index": callback.get("bit_index", 0)
-            }
+        for address_info, value in zip(self.get_multiple_address_info_snap7(callback, len(value_list)), value_list):
             self.plc.execute_write(**address_info, value=value)
 
     def write_multiple_value_tag(self, callback: dict, value_list: list):
@@ -703,11 +1332,7 @@ class HandlerPassive(GemEquipmentHandler):
             callback: callback 信息.
             value_list: 写入的值列表.
         """
-        for i, value in enumerate(value_list, 1):
-            address_info = {
-                "address": callback.get("address").replace("$", str(i)),
-                "data_type": callback.get("data_type"),
-            }
+        for address_info, value in zip(self.get_multiple_address_info_tag(callback, len(value_list)), value_list):
             self.plc.execute_write(**address_info, value=value)
 
     def write_multiple_value_modbus(self, callback: dict, value_list: list):
@@ -717,29 +1342,272 @@ class HandlerPassive(GemEquipmentHandler):
             callback: callback 信息.
             value_list: 写入的值列表.
         """
+        for address_info, value in zip(self.get_multiple_address_info_modbus(callback, len(value_list)), value_list):
+            self.plc.execute_write(**address_info, value=value)
+
+    def get_multiple_address_info_snap7(self, callback: dict, count: int) -> list[dict]:
+        """获取 snap7 plc 连续地址每个元素的地址信息.
+
+        Args:
+            callback: callback 信息.
+            count: 元素个数.
+
+        Returns:
+            list[dict]: 每个元素的地址信息.
+        """
+        gap = callback.get("gap", 1)
+        return [
+            {
+                "address": int(callback.get("address")) + gap * i,
+                "data_type": callback.get("data_type"),
+                "db_num": self.get_ec_value_with_name("db_num"),
+                "size": callback.get("size", 2),
+                "bit_index": callback.get("bit_index", 0)
+            } for i in range(count)
+        ]
+
+    @staticmethod
+    def get_multiple_address_info_tag(callback: dict, count: int) -> list[dict]:
+        """获取汇川 plc 标签通讯连续地址每个元素的地址信息, 地址里的 $ 替换成从 1 开始的序号.
+
+        Args:
+            callback: callback 信息.
+            count: 元素个数.
+
+        Returns:
+            list[dict]: 每个元素的地址信息.
+        """
+        return [
+            {"address": callback.get("address").replace("$", str(i)), "data_type": callback.get("data_type")}
+            for i in range(1, count + 1)
+        ]
+
+    @staticmethod
+    def get_multiple_address_info_modbus(callback: dict, count: int) -> list[dict]:
+        """获取 modbus 通讯连续地址每个元素的地址信息.
+
+        Args:
+            callback: callback 信息.
+            count: 元素个数.
+
+        Returns:
+            list[dict]: 每个元素的地址信息.
+        """
         start_address = callback.get("address")
         size = callback.get("size")
-        for i, value in enumerate(value_list, 0):
-            address_info = {
-                "address": int(start_address) + i * size,
-                "data_type": callback.get("data_type"),
-            }
-            self.plc.execute_write(**address_info, value=value)
+        return [
+            {"address": int(start_address) + i * size, "data_type": callback.get("data_type")}
+            for i in range(count)
+        ]
+
+    def on_sv_value_request(self, svid: Base, status_variable) -> Base:
+        """获取 sv 的 secs 值, 数组变量按子元素类型编码.
+
+        Args:
+            svid: sv id.
+            status_variable: sv 实例.
+
+        Returns:
+            Base: secs 值.
+        """
+        if issubclass(status_variable.value_type, Array):
+            return array_value.to_secs_array(status_variable.base_value_type, status_variable.value)
+        return status_variable.value_type(status_variable.value)
+
+    def on_dv_value_request(self, dvid: Base, data_value) -> Base:
+        """获取 dv 的 secs 值, 数组变量按子元素类型编码.
+
+        Args:
+            dvid: dv id.
+            data_value: dv 实例.
+
+        Returns:
+            Base: secs 值.
+        """
+        if issubclass(data_value.value_type, Array):
+            return array_value.to_secs_array(data_value.base_value_type, data_value.value)
+        return data_value.value_type(data_value.value)
+
+    def on_ec_value_update(self, equipment_constant_id: Base, equipment_constant, value: Union[int, float, str]):
+        """host 通过 S2F15 修改 ec 后更新快照.
+
+        Args:
+            equipment_constant_id: ec id.
+            equipment_constant: ec 实例.
+            value: 要设定的值.
+        """
+        equipment_constant.value = value
+        self._publish_ec(equipment_constant)
+
+    def _handle_stream_function(self, message):
+        """处理 host 消息, 变量和组件加载完成前收到的消息等待加载完成, S1F1 和 S1F13 立刻处理.
+
+        启动失败或者等待超时时回复 SxF0 放弃这条消息, 不在 hsms 接收线程里一直等待.
+
+        Args:
+            message: 收到的消息.
+        """
+        header = message.header
+        if header.stream != 1 or header.function not in (1, 13):
+            if not self.startup.wait_ready("components", STARTUP_WAIT_TIMEOUT):
+                self.logger.warning("启动失败或者等待启动完成超时, S%sF%s 回复 S%sF0", header.stream, header.function, header.stream)
+                if header.require_response:
+                    self.send_response(self.stream_function(header.stream, 0)(), header.system)
+                return
+        super()._handle_stream_function(message)
+
+    def _on_s01f03(self, handler, message) -> variable_snapshot.EncodedReply:
+        """查询 sv 值, 从快照里取编码好的值, 不逐个创建 secs 变量和记录日志.
+
+        Args:
+            handler: 收到消息的 handler.
+            message: 收到的消息.
+
+        Returns:
+            EncodedReply: 编码好的 S1F4.
+        """
+        sv_ids = self._decode_request_ids(message) or list(self.status_variables)
+        items = self.sv_snapshot.items
+        return variable_snapshot.encode_reply(1, 4, [items.get(sv_id) or self._encode_sv_value(sv_id) for sv_id in sv_ids])
+
+    def _on_s01f11(self, handler, message) -> variable_snapshot.EncodedReply:
+        """查询 sv 名称和单位, 使用初始化时编码好的元素.
+
+        Args:
+            handler: 收到消息的 handler.
+            message: 收到的消息.
+
+        Returns:
+            EncodedReply: 编码好的 S1F12.
+        """
+        sv_ids = self._decode_request_ids(message) or list(self.status_variables)
+        return variable_snapshot.encode_reply(
+            1, 12, [self._sv_name_items.get(sv_id) or self._encode_sv_name(sv_id) for sv_id in sv_ids]
+        )
+
+    def _on_s02f13(self, handler, message) -> variable_snapshot.EncodedReply:
+        """查询 ec 值, 从快照里取编码好的值.
+
+        Args:
+            handler: 收到消息的 handler.
+            message: 收到的消息.
+
+        Returns:
+            EncodedReply: 编码好的 S2F14.
+        """
+        ec_ids = self._decode_request_ids(message) or list(self.equipment_constants)
+        items = self.ec_snapshot.items
+        return variable_snapshot.encode_reply(2, 14, [items.get(ec_id) or self._encode_ec_value(ec_id) for ec_id in ec_ids])
 
-    def confirm_write_success(self, address_info: dict, value: Union[int, float, bool, str]):
-        """向 plc 写入数据, 并且一定会写成功.
+    def _decode_request_ids(self, message) -> list[Union[int, str]]:
+        """解析请求里的 id 列表, 不支持的格式使用 secsgem 解析.
+
+        Args:
+            message: 收到的消息.
+
+        Returns:
+            list[Union[int, str]]: id 列表.
+        """
+        if (variable_ids := variable_snapshot.decode_id_list(message.data)) is None:
+            variable_ids = self.settings.streams_functions.decode(message).get()
+        return variable_ids
+
+    def _publish_sv(self, *sv_instances):
+        """sv 值变化后更新快照, 多个 sv 一起发布, secsgem 实时计算的 sv 不放进快照.
+
+        Args:
+            *sv_instances: sv 实例.
+        """
+        self.sv_snapshot.publish({
+            sv_instance.svid: self._encode_variable(sv_instance)
+            for sv_instance in sv_instances if sv_instance.svid not in DYNAMIC_SV_IDS
+        })
+
+    def _publish_ec(self, ec_instance):
+        """ec 值变化后更新快照, secsgem 实时计算的 ec 不放进快照.
+
+        Args:
+            ec_instance: ec 实例.
+        """
+        if ec_instance.ecid not in DYNAMIC_EC_IDS:
+            self.ec_snapshot.publish({ec_instance.ecid: self._encode_variable(ec_instance)})
+
+    def _encode_variable(self, variable) -> Optional[bytes]:
+        """编码 sv 或 ec 的当前值.
+
+        Args:
+            variable: sv 或 ec 实例.
+
+        Returns:
+            Optional[bytes]: 编码后的值, 编码失败返回 None, 回复时由 secsgem 处理.
+        """
+        try:
+            if issubclass(variable.value_type, Array):
+                return array_value.to_secs_array(getattr(variable, "base_value_type", None), variable.value).encode()
+            return variable.value_type(variable.value).encode()
+        except Exception as e:
+            self.logger.warning("变量 %s 的值 %s 编码失败: %s", variable.name, variable.value, e)
+            return None
+
+    def _encode_sv_value(self, sv_id: Union[int, str]) -> bytes:
+        """编码快照里没有的 sv, 包括 secsgem 实时计算的 sv 和未定义的 sv.
+
+        Args:
+            sv_id: sv id.
+
+        Returns:
+            bytes: 编码后的值, 未定义的 sv 返回 L[0].
+        """
+        if sv_instance := self.status_variables.get(sv_id):
+            return self._get_sv_value(sv_instance).encode()
+        return variable_snapshot.EMPTY_LIST
+
+    def _encode_ec_value(self, ec_id: Union[int, str]) -> bytes:
+        """编码快照里没有的 ec, 包括 secsgem 实时计算的 ec 和未定义的 ec.
+
+        Args:
+            ec_id: ec id.
+
+        Returns:
+            bytes: 编码后的值, 未定义的 ec 返回 L[0].
+        """
+        if ec_instance := self.equipment_constants.get(ec_id):
+            return self._get_ec_value(ec_instance).encode()
+        return variable_snapshot.EMPTY_LIST
+
+    def _encode_sv_name(self, sv_id: Union[int, str]) -> bytes:
+        """编码 S1F12 的一个元素 {SVID, SVNAME, UNITS}.
+
+        Args:
+            sv_id: sv id.
+
+        Returns:
+            bytes: 编码后的元素, 未定义的 sv 名称和单位为空.
+        """
+        data_items = self.settings.data_items
+        name, unit = "", ""
+        if sv_instance := self.status_variables.get(sv_id):
+            sv_id, name, unit = sv_instance.svid, sv_instance.name, sv_instance.unit
+        return (
+            variable_snapshot.encode_list_header(3) + data_items.SVID(sv_id).encode()
+            + data_items.SVNAME(name).encode() + data_items.UNITS(unit).encode()
+        )
+
+    def confirm_write_success(self, address_info: dict, value: Union[int, float, bool, str]) -> WriteResult:
+        """确认 plc 地址的值是写入的值, 不一致时重新写入.
 
         在通过 S7 协议向西门子plc写入 bool 数据的时候, 会出现写不成功的情况, 所以再向西门子plc写入 bool 时调用此函数.
-        为了确保数据写入成功, 向任何plc写入数据都可调用此函数, 但是交互的时候每次会多读一次 plc.
+        重新写入的次数和截止时间使用 ec write_verify_retry 和 write_verify_timeout 的配置, 不会一直等待.
 
         Args:
             address_info: 写入数据的地址位信息.
             value: 要写入的数据.
+
+        Returns:
+            WriteResult: 写入结果.
         """
-        while (plc_value := self.plc.execute_read(**address_info)) != value:
-            self.logger.warning(f"当前地址 %s 的值是 %s != %s, %s", address_info.get("address"), plc_value,
-                                value, address_info.get("description"))
-            self.plc.execute_write(**address_info, value=value)
+        write_request = self._get_write_request({"verify_write": 1}, address_info, value)
+        return self.write_verifier.verify([write_request])[0]
 
     def wait_time(self, callback: dict):
         """等待时间.
@@ -790,7 +1658,17 @@ class HandlerPassive(GemEquipmentHandler):
     async def operate_func_socket(self, byte_data) -> str:
         """操作并返回数据."""
         str_data = byte_data.decode("UTF-8")  # 解析接收的下位机数据
-        receive_dict = json.loads(str_data)
+        return await self.execute_socket_operation(json.loads(str_data))
+
+    async def execute_socket_operation(self, receive_dict: dict) -> str:
+        """执行下位机请求的操作, 共用的 socket 服务端按设备名称转发到这里.
+
+        Args:
+            receive_dict: 下位机请求, 关键字是要执行的方法名称, 值是方法的参数.
+
+        Returns:
+            str: 返回的数据.
+        """
         for receive_key, receive_info in receive_dict.items():
             self.logger.info("收到的下位机关键字是: %s", receive_key)
             self.logger.info("收到的下位机关键字对应的数据是: %s", receive_info)
@@ -809,6 +1687,102 @@ class HandlerPassive(GemEquipmentHandler):
         """
         self.send_s6f11(event_id)
 
+    async def get_spool_state(self, *args) -> str:
+        """获取 spool 的统计信息.
+
+        Returns:
+            str: spool 统计信息 json 字符串.
+        """
+        self.logger.info("收到的参数是: %s", args)
+        return json.dumps(self.secs_spool.get_state())
+
+    async def get_alarm_history(self, query_info: dict) -> str:
+        """分页查询报警记录.
+
+        Args:
+            query_info: 查询条件, start_time 和 end_time 默认是最近 24 小时, 可选 alarm_id, page 和 per_page.
+
+        Returns:
+            str: 报警记录 json 字符串.
+        """
+        self.logger.info("收到的参数是: %s", query_info)
+        start_time, end_time = self._get_alarm_query_range(query_info)
+        per_page = min(int(query_info.get("per_page", 100)), 1000)
+        alarm_history = self.alarm_history.query(
+            start_time, end_time, query_info.get("alarm_id"), int(query_info.get("page", 1)), per_page
+        )
+        return json.dumps(alarm_history, default=str, ensure_ascii=False)
+
+    async def get_alarm_stats(self, query_info: dict) -> str:
+        """统计每个报警的次数和持续时间.
+
+        Args:
+            query_info: 查询条件, start_time 和 end_time 默认是最近 24 小时.
+
+        Returns:
+            str: 报警统计 json 字符串.
+        """
+        self.logger.info("收到的参数是: %s", query_info)
+        start_time, end_time = self._get_alarm_query_range(query_info)
+        return json.dumps(self.alarm_history.get_stats(start_time, end_time), default=str, ensure_ascii=False)
+
+    @staticmethod
+    def _get_alarm_query_range(query_info: dict) -> tuple[Union[str, datetime], Union[str, datetime]]:
+        """获取报警查询的时间范围.
+
+        Args:
+            query_info: 查询条件.
+
+        Returns:
+            tuple[Union[str, datetime], Union[str, datetime]]: 开始时间和结束时间.
+        """
+        end_time = query_info.get("end_time") or datetime.now()
+        start_time = query_info.get("start_time") or datetime.now() - timedelta(days=1)
+        return start_time, end_time
+
+    async def get_metrics(self, *args) -> str:
+        """获取运行指标.
+
+        Returns:
+            str: 运行指标 json 字符串.
+        """
+        self.logger.info("收到的参数是: %s", args)
+        signal_scan_rate = self.thread_methods.signal_scan_rate
+        return json.dumps({
+            "startup": self.startup.get_report(),
+            "spool": self.secs_spool.get_state(),
+            "scan_scheduler": self.scan_scheduler.get_state(self.equipment_name),
+            "plc_connection": self.plc_supervisor.get_state(),
+            "plc_io_lane": self.plc.get_state(),
+            "plc_status_image": self.status_image.get_state() if self.status_image else None,
+            "plc_scan_process": self.scan_process.get_state() if self.scan_process else None,
+            "write_verifier": self.write_verifier.get_state(),
+            "variable_store": self.variable_store.get_state(),
+            "recipe_store": self.recipe_store.get_state(),
+            "recipe_download": self.last_recipe_download,
+            "lot_tracker": self.lot_tracker.get_state(),
+            "trace_collector": self.trace_collector.get_state(),
+            "alarm_history": self.alarm_history.get_state(),
+            "signal_scan_rate": signal_scan_rate.get_state() if signal_scan_rate else None,
+            "mes_heart_period_error": self.thread_methods.mes_heart_period_error.get_state(),
+            "signal_edges": {address: edge.get_state() for address, edge in self.thread_methods.signal_edges.items()},
+            "log_rate_limit": factory.get_log_rate_limiter().get_state(),
+            "log_rotation": self.file_handler.get_state(),
+        })
+
+    async def get_suppressed_logs(self, query_info: dict) -> str:
+        """获取最近因为限流没有写入日志文件的告警.
+
+        Args:
+            query_info: 查询条件, 可选 limit, 默认返回最近 100 条.
+
+        Returns:
+            str: 被省略的日志 json 字符串.
+        """
+        self.logger.info("收到的参数是: %s", query_info)
+        limit = min(int(query_info.get("limit", 100)), 1000) if isinstance(query_info, dict) else 100
+        return json.dumps(factory.get_log_rate_limiter().get_records(limit), ensure_ascii=False)
+
     def wait_eap_reply(self, callback: dict):
         """等待 eap 反馈.
 
@@ -820,7 +1794,7 @@ class HandlerPassive(GemEquipmentHandler):
         is_wait = callback.get("is_wait")
         wait_eap_reply_time = self.get_ec_value_with_name("wait_time_eap_reply")
         dv_filter = {"dv_name": f"{self.get_dv_name_with_id(dv_id)}_reply"}
-        dv_info_reply_flag = secs_config.get_dv_info(dv_filter)
+        dv_info_reply_flag = secs_config.get_dv_info(dv_filter, self.mysql_secs)
         dv_id_reply_flag = dv_info_reply_flag["dv_id"]
         while not self.get_dv_value_with_id(dv_id_reply_flag):
             if is_wait:
@@ -852,7 +1826,136 @@ class HandlerPassive(GemEquipmentHandler):
     def _on_s07f19(self, *args):
         """查看设备的所有配方."""
         self.logger.info("收到的参数是: %s", args)
-        return self.stream_function(7, 20)(secs_config.get_recipe_list())
+        return self.stream_function(7, 20)(secs_config.get_recipe_list(self.mysql_secs))
+
+    def _on_s07f01(self, handler, message):
+        """Host 询问能否下载配方, 根据磁盘空间回复.
+
+        Args:
+            handler: 收到消息的 handler.
+            message: 收到的消息.
+        """
+        function = self.settings.streams_functions.decode(message)
+        ppid, length = function.PPID.get(), function.LENGTH.get()
+        grant = PPGNT.OK if self.recipe_store.has_space(length) else PPGNT.NO_SPACE
+        self.logger.info("host 询问能否下载配方 %s, 长度 %s, 回复 %s", ppid, length, grant)
+        return self.stream_function(7, 2)(grant)
+
+    def _on_s07f03(self, handler, message):
+        """Host 下载配方 body, 放到配方线程保存, 保存完成后回复 S7F4.
+
+        Args:
+            handler: 收到消息的 handler.
+            message: 收到的消息.
+        """
+        if (pp_message := recipe_store.split_pp_message(message.data)) is None:
+            self.logger.warning("S7F3 格式错误, 长度 %s", len(message.data))
+            return self.stream_function(7, 4)(ACKC7.LENGTH_ERROR)
+        self.recipe_tasks.put((self._save_recipe_body, (*pp_message, message.header.system)))
+        return None
+
+    def _on_s07f05(self, handler, message):
+        """Host 上传配方 body, 放到配方线程读取, 读取完成后回复 S7F6.
+
+        Args:
+            handler: 收到消息的 handler.
+            message: 收到的消息.
+        """
+        ppid = self.settings.streams_functions.decode(message).get()
+        self.recipe_tasks.put((self._send_recipe_body, (ppid, message.header.system)))
+        return None
+
+    def _on_s07f17(self, handler, message):
+        """Host 删除配方, 放到配方线程删除, 删除完成后回复 S7F18.
+
+        Args:
+            handler: 收到消息的 handler.
+            message: 收到的消息.
+        """
+        ppids = self.settings.streams_functions.decode(message).get()
+        self.recipe_tasks.put((self._delete_recipe_bodies, (ppids, message.header.system)))
+        return None
+
+    def _save_recipe_body(self, ppid: str, body_format: int, body: memoryview, system: int):
+        """保存配方 body 并回复 S7F4, 同名配方会被覆盖.
+
+        Args:
+            ppid: 配方名称.
+            body_format: body 的 secs 格式码.
+            body: body 数据.
+            system: 要回复的 system id.
+        """
+        try:
+            body_hash, body_size, chunk_hashes = self.recipe_store.put(body)
+            recipe_body = {
+                "recipe_name": ppid, "body_format": body_format, "body_size": body_size, "body_hash": body_hash,
+                "chunk_hashes": chunk_hashes
+            }
+            if secs_config.get_recipe_body_info(ppid, self.mysql_secs):
+                self.mysql_secs.update_data(models_class.RecipeBodyList, recipe_body, {"recipe_name": ppid})
+                self._remove_unreferenced_recipe_chunks()
+            else:
+                self.mysql_secs.add_data(models_class.RecipeBodyList, [recipe_body])
+            self.logger.info("保存配方 %s, 长度 %s, 块数量 %s", ppid, body_size, len(chunk_hashes))
+            ack = ACKC7.ACCEPTED
+        except Exception as e:
+            self.logger.warning("保存配方 %s 失败: %s", ppid, str(e))
+            ack = ACKC7.MATRIX_OVERFLOW
+        self.send_response(self.stream_function(7, 4)(ack), system)
+
+    def _send_recipe_body(self, ppid: str, system: int):
+        """读取配方 body 并回复 S7F6, 配方不存在或者读取失败时回复空列表.
+
+        Args:
+            ppid: 配方名称.
+            system: 要回复的 system id.
+        """
+        reply = variable_snapshot.EncodedReply(7, 6, 0, variable_snapshot.EMPTY_LIST)
+        if recipe_body := secs_config.get_recipe_body_info(ppid, self.mysql_secs):
+            prefix = variable_snapshot.encode_list_header(2) + self.settings.data_items.PPID(ppid).encode()
+            try:
+                data = self.recipe_store.encode_item(
+                    recipe_body["chunk_hashes"], recipe_body["body_size"], recipe_body["body_format"], prefix
+                )
+                reply = variable_snapshot.EncodedReply(7, 6, 2, data)
+                self.logger.info("上传配方 %s, 长度 %s", ppid, recipe_body["body_size"])
+            except EquipmentRuntimeError as e:
+                self.logger.warning("读取配方 %s 失败: %s", ppid, str(e))
+        else:
+            self.logger.warning("配方 %s 不存在", ppid)
+        self.send_response(reply, system)
+
+    def _delete_recipe_bodies(self, ppids: list[str], system: int):
+        """删除配方并回复 S7F18, 有配方不存在时不删除任何配方.
+
+        Args:
+            ppids: 配方名称列表, 空列表代表删除所有配方.
+            system: 要回复的 system id.
+        """
+        if not ppids:
+            ppids = [recipe_body["recipe_name"] for recipe_body in secs_config.get_recipe_body_list(self.mysql_secs)]
+        if missing_ppids := [ppid for ppid in ppids if not secs_config.get_recipe_body_info(ppid, self.mysql_secs)]:
+            self.logger.warning("要删除的配方不存在: %s", missing_ppids)
+            ack = ACKC7.PPID_NOT_FOUND
+        else:
+            for ppid in ppids:
+                self.mysql_secs.delete_data(models_class.RecipeBodyList, {"recipe_name": ppid})
+            removed_count = self._remove_unreferenced_recipe_chunks()
+            self.logger.info("删除配方 %s, 清理块数量 %s", ppids, removed_count)
+            ack = ACKC7.ACCEPTED
+        self.send_response(self.stream_function(7, 18)(ack), system)
+
+    def _remove_unreferenced_recipe_chunks(self) -> int:
+        """删除没有被任何配方引用的块.
+
+        Returns:
+            int: 删除的块数量.
+        """
+        referenced = {
+            chunk_hash for recipe_body in secs_config.get_recipe_body_list(self.mysql_secs)
+            for chunk_hash in recipe_body["chunk_hashes"]
+        }
+        return self.recipe_store.remove_unreferenced(referenced)
 
     def _on_s02f17(self, *args) -> SecsS02F18:
         """获取设备时间.
@@ -885,6 +1988,113 @@ class HandlerPassive(GemEquipmentHandler):
             ti_ack = TIACK.TIME_SET_FAIL
         return self.stream_function(2, 32)(ti_ack)
 
+    def _on_s02f43(self, *args):
+        """Host 设置允许 spool 的 stream function."""
+        function = self.settings.streams_functions.decode(args[1])
+        spool_streams = {}
+        reject_streams = []
+        for stream_info in function.get():
+            stream, functions = stream_info["STRID"], stream_info["FCNID"]
+            if stream == 1:  # stream 1 不允许 spool
+                reject_streams.append({"STRID": stream, "STRACK": STRACK.NOT_ALLOWED, "FCNID": functions})
+            else:
+                spool_streams[stream] = functions
+        if reject_streams:
+            self.logger.info("拒绝设置 spool, 不允许的 stream: %s", reject_streams)
+            return self.stream_function(2, 44)({"RSPACK": RSPACK.REJECTED, "DATA": reject_streams})
+        self.secs_spool.set_spool_streams(spool_streams)
+        self.logger.info("设置 spool 的 stream function: %s", spool_streams)
+        return self.stream_function(2, 44)({"RSPACK": RSPACK.ACK, "DATA": []})
+
+    def _on_s02f23(self, handler, message):
+        """Host 定义或者删除 trace, TOTSMP 是 0 时删除.
+
+        Args:
+            handler: 收到消息的 handler.
+            message: 收到的消息.
+        """
+        function = self.settings.streams_functions.decode(message)
+        trace_info = function.get()
+        trid, sv_ids = trace_info["TRID"], trace_info["SVID"]
+        total_samples, group_size = int(trace_info["TOTSMP"]), int(trace_info["REPGSZ"])
+        self.logger.info("Host 定义 trace: %s", trace_info)
+        if total_samples == 0:
+            self.trace_collector.stop_trace(trid)
+            return self.stream_function(2, 24)(TIAACK.OK)
+        sv_address_infos = plc_address_operation.get_sv_address_infos(self.plc_type, self.mysql_secs)
+        if (ti_ack := self._check_trace(trace_info, sv_address_infos)) != TIAACK.OK:
+            self.logger.info("拒绝 trace %s, TIAACK: %s", trid, ti_ack)
+            return self.stream_function(2, 24)(ti_ack)
+        address_infos = [sv_address_infos.get(sv_id) for sv_id in sv_ids]
+        slots = [
+            None if address_info else self.status_variables[sv_id].slot
+            for sv_id, address_info in zip(sv_ids, address_infos)
+        ]
+        self.trace_collector.start_trace(TraceJob(
+            trid, self._parse_trace_period(trace_info["DSPER"]), total_samples, group_size, sv_ids, address_infos, slots
+        ))
+        return self.stream_function(2, 24)(TIAACK.OK)
+
+    def _check_trace(self, trace_info: dict, sv_address_infos: dict[int, dict]) -> int:
+        """检查 trace 定义.
+
+        没有关联地址的 sv 从变量存储的槽位采样, secsgem 内置的 sv 没有槽位, 也没有关联地址, 按未知 sv 拒绝.
+
+        Args:
+            trace_info: S2F23 的内容.
+            sv_address_infos: 关联读取地址的 sv id 和地址信息.
+
+        Returns:
+            int: TIAACK.
+        """
+        sv_ids = trace_info["SVID"]
+        if len(sv_ids) > int(self.get_ec_value_with_name("trace_max_svid", False, 100)):
+            return TIAACK.SVID_EXCEEDED
+        max_trace_count = int(self.get_ec_value_with_name("trace_max_count", False, 8))
+        if self.trace_collector.trace_count >= max_trace_count and not self.trace_collector.has_trace(trace_info["TRID"]):
+            return TIAACK.TRACES_DENIED
+        period = self._parse_trace_period(trace_info["DSPER"])
+        if period is None or period < float(self.get_ec_value_with_name("trace_min_period", False, 0.1)):
+            return TIAACK.INVALID_PERIOD
+        if any(
+                sv_id not in self.status_variables
+                or (sv_id not in sv_address_infos and getattr(self.status_variables[sv_id], "slot", None) is None)
+                for sv_id in sv_ids
+        ):
+            return TIAACK.SVID_UNKNOWN
+        if not 0 < int(trace_info["REPGSZ"]) <= int(trace_info["TOTSMP"]):
+            return TIAACK.REPGSZ_INVALID
+        return TIAACK.OK
+
+    @staticmethod
+    def _parse_trace_period(dsper: str) -> Optional[float]:
+        """解析 DSPER, 格式是 hhmmss 或 hhmmsscc.
+
+        Args:
+            dsper: 采样周期.
+
+        Returns:
+            Optional[float]: 采样周期, 单位秒, 格式不对返回 None.
+        """
+        if len(dsper) not in (6, 8) or not dsper.isdigit():
+            return None
+        period = int(dsper[0:2]) * 3600 + int(dsper[2:4]) * 60 + int(dsper[4:6]) + int(dsper[6:8] or 0) / 100
+        return period or None
+
+    def _on_s06f23(self, *args):
+        """Host 请求发送或清除 spool 数据."""
+        function = self.settings.streams_functions.decode(args[1])
+        rsdc = function.get()
+        if not self.secs_spool.pending_count:
+            return self.stream_function(6, 24)(RSDA.DENIED_NO_DATA)
+        if rsdc == RSDC.PURGE:
+            purged_count = self.secs_spool.purge()
+            self.logger.info("Host 清除 spool 数据, 数量: %s", purged_count)
+        else:
+            self.logger.info("Host 请求发送 spool 数据, 数量: %s", self.secs_spool.pending_count)
+            self.spool_transmit_event.set()
+        return self.stream_function(6, 24)(RSDA.ACK)
+
     def _on_s10f03(self, *args):
         """Eap 下发弹框信息."""
         function = self.settings.streams_functions.decode(args[1])
@@ -894,24 +2104,64 @@ class HandlerPassive(GemEquipmentHandler):
         self.logger.info("接收到的弹框信息是, terminal_id: %s, terminal_text: %s", terminal_id, terminal_text)
         return self.stream_function(10, 4)(ACKC10.ACCEPTED)
 
+    def download_recipe_parameters(self, recipe_id: int) -> bool:
+        """把配方参数下载到 plc, 只写入和 plc 当前值不同的参数.
+
+        Args:
+            recipe_id: 配方id.
+
+        Returns:
+            bool: 所有参数都和配方一致返回 True.
+        """
+        parameters = []
+        for parameter_info in secs_config.get_recipe_parameter_list(recipe_id, self.mysql_secs):
+            address_info = plc_address_operation.get_address_info(self.plc_type, parameter_info)
+            if "snap7" in self.plc_type:
+                if not address_info["size"]:  # 没有配置长度时按数据类型计算, bool 占 1 个字节
+                    dtype = array_value.S7_DTYPES.get(address_info.get("data_type"))
+                    address_info["size"] = dtype.itemsize if dtype is not None else 2
+                address_info["bit_index"] = address_info["bit_index"] or 0
+                address_info["db_num"] = address_info["db_num"] or self.get_ec_value_with_name("db_num")
+            parameters.append(RecipeParameter(
+                address_info, parameter_info["value"], parameter_info.get("description") or parameter_info["parameter_name"]
+            ))
+        if not parameters:
+            return True
+        try:
+            result = self.recipe_downloader.download(parameters)
+        except Exception as e:
+            self.plc_supervisor.report_failure(e)
+            self.logger.warning("下载配方 %s 的参数失败: %s", recipe_id, str(e))
+            return False
+        finally:
+            self._invalidate_plc_values()
+        self.last_recipe_download = result.to_dict()
+        self.logger.info("下载配方 %s 的参数结果: %s", recipe_id, self.last_recipe_download)
+        return result.success
+
     def _on_rcmd_pp_select(self, recipe_name: str):
-        """工厂切换配方.
+        """工厂切换配方, 先把配方参数下载到 plc, 再通知 plc 切换.
 
         Args:
             recipe_name: 要切换的配方名称.
         """
         pp_select_recipe_name = recipe_name
-        self.set_sv_value_with_name("pp_select_recipe_name", pp_select_recipe_name)
-        pp_select_recipe_id = secs_config.get_recipe_id_with_name(recipe_name)
-        self.set_sv_value_with_name("pp_select_recipe_id", pp_select_recipe_id)
-
-        address_info = plc_address_operation.get_signal_address_info(self.plc_type, "pp_select")
-        callbacks = plc_address_operation.get_signal_callbacks(address_info["address"])
+        pp_select_recipe_id = secs_config.get_recipe_id_with_name(recipe_name, self.mysql_secs)
+        self.set_sv_values_with_name({
+            "pp_select_recipe_name": pp_select_recipe_name, "pp_select_recipe_id": pp_select_recipe_id
+        })
+        if not self.download_recipe_parameters(pp_select_recipe_id):
+            self.set_sv_value_with_name("pp_select_state", 2)
+            self.send_s6f11(2000)
+            return
+
+        address_info = plc_address_operation.get_signal_address_info(self.plc_type, "pp_select", self.mysql_secs)
+        callbacks = plc_address_operation.get_signal_callbacks(address_info["address"], self.mysql_secs)
 
         self.get_signal_to_execute_callbacks(callbacks,)
 
         current_recipe_id = self.get_sv_value_with_name("recipe_id")
-        current_recipe_name = secs_config.get_recipe_name_with_id(current_recipe_id)
+        current_recipe_name = secs_config.get_recipe_name_with_id(current_recipe_id, self.mysql_secs)
         self.set_sv_value_with_name("recipe_name", current_recipe_name)
         if current_recipe_id == pp_select_recipe_id:
             pp_select_state = 1
@@ -928,15 +2178,17 @@ class HandlerPassive(GemEquipmentHandler):
             lot_name: 工单数量.
         """
         lot_quantity = int(lot_quantity)
-        self.set_sv_value_with_name("lot_name", lot_name)
-        self.set_sv_value_with_name("lot_quantity", lot_quantity)
-        address_info = plc_address_operation.get_signal_address_info(self.plc_type, "new_lot")
-        callbacks = plc_address_operation.get_signal_callbacks(address_info["address"])
+        self.set_sv_values_with_name({"lot_name": lot_name, "lot_quantity": lot_quantity})
+        self.lot_tracker.start_lot(lot_name, lot_quantity, self.get_sv_value_with_name("recipe_name", save_log=False))
+        address_info = plc_address_operation.get_signal_address_info(self.plc_type, "new_lot", self.mysql_secs)
+        callbacks = plc_address_operation.get_signal_callbacks(address_info["address"], self.mysql_secs)
         self.get_signal_to_execute_callbacks(callbacks)
 
     def new_lot_pre_check(self):
-        """开工单前检查上个工单是否做完."""
-        address_info = plc_address_operation.get_do_quantity_address_info(self.plc_type)
+        """开工单前检查上个工单是否做完, 监控线程已经采样过已生产数量时直接使用内存里的进度."""
+        if (is_finished := self.lot_tracker.is_lot_finished()) is not None:
+            return is_finished
+        address_info = plc_address_operation.get_do_quantity_address_info(self.plc_type, self.mysql_secs)
         do_quantity = self.plc.execute_read(**address_info, save_log=True)
         self.set_sv_value_with_name("do_quantity", do_quantity)
         lot_quantity = self.get_sv_value_with_name("lot_quantity")
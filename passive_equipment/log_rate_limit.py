@@ -0,0 +1,185 @@
+# pylint: skip-file
+"""日志限流."""
+import collections
+import logging
+import threading
+import time
+
+
+class _LogKeyState:
+    """同一个调用位置和消息模板的日志在当前窗口里的统计."""
+
+    def __init__(self, record: logging.LogRecord):
+        """_LogKeyState 构造函数.
+
+        Args:
+            record: 这个调用位置的第一条日志.
+        """
+        self.logger_name = record.name
+        self.level = record.levelno
+        self.location = f"{record.filename}:{record.lineno}"
+        self.template = str(record.msg)
+        self.window_start = record.created
+        self.window_count = 0  # 当前窗口里的日志条数
+        self.suppressed_count = 0  # 当前窗口里被省略的条数, 汇总后清零
+        self.total_count = 0  # 总条数
+        self.total_suppressed = 0  # 总共省略的条数
+        self.last_message = ""  # 最后一条日志的内容
+
+    def to_dict(self) -> dict:
+        """转换成字典.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "logger": self.logger_name, "level": logging.getLevelName(self.level), "location": self.location,
+            "template": self.template, "total_count": self.total_count, "total_suppressed": self.total_suppressed,
+            "last_message": self.last_message
+        }
+
+
+class RateLimitFilter(logging.Filter):
+    """按调用位置和消息模板限流, 每个窗口里同一个位置的日志只输出前 burst 条.
+
+    被省略的日志保存在有上限的缓冲区里, 可以通过 get_records 查看. 窗口结束后下一次有日志经过时,
+    输出一条 "N 次, T 秒" 的汇总, 所以故障期间写入日志文件的条数只和调用位置的数量有关, 和故障持续时间无关.
+    同一条日志经过多个处理器时只判断一次, 同一个过滤器可以加到多个处理器上.
+    """
+
+    SUMMARY_MESSAGE = "%s 的日志 \"%s\" 在 %.0f 秒内重复 %d 次, 已省略, 最后一条: %s"
+
+    def __init__(self, window: float = 60, burst: int = 3, min_level: int = logging.WARNING, buffer_size: int = 1000):
+        """RateLimitFilter 构造函数.
+
+        Args:
+            window: 窗口长度, 单位秒.
+            burst: 每个窗口里同一个位置最多输出的条数.
+            min_level: 只对这个级别及以上的日志限流, 流程的 info 日志不受影响.
+            buffer_size: 保存被省略日志的条数上限.
+        """
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.min_level = min_level
+        self.suppressed_count = 0  # 总共省略的条数
+        self.summary_count = 0  # 输出汇总的条数
+
+        self._states: dict[tuple[str, int, str], _LogKeyState] = {}
+        self._records = collections.deque(maxlen=buffer_size)  # 被省略的日志
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """判断日志是否输出.
+
+        Args:
+            record: 日志.
+
+        Returns:
+            bool: 输出返回 True.
+        """
+        if (passed := getattr(record, "rate_limit_passed", None)) is not None:
+            return passed
+        if record.levelno < self.min_level or getattr(record, "rate_limit_summary", False):
+            return True
+        with self._lock:
+            summaries = self._sweep(record.created) if record.created >= self._next_sweep else []
+            passed = self._count(record)
+        record.rate_limit_passed = passed
+        self._log_summaries(summaries)
+        return passed
+
+    def flush(self):
+        """立刻输出所有窗口已经结束的汇总, 例如故障恢复后日志变少时."""
+        with self._lock:
+            summaries = self._sweep(time.time())
+        self._log_summaries(summaries)
+
+    def get_records(self, limit: int = 100) -> list[dict]:
+        """获取最近被省略的日志.
+
+        Args:
+            limit: 最多返回的条数.
+
+        Returns:
+            list[dict]: 被省略的日志, 按时间从旧到新排列.
+        """
+        with self._lock:
+            return list(self._records)[-limit:]
+
+    def get_state(self) -> dict:
+        """获取限流的统计信息.
+
+        Returns:
+            dict: 统计信息, keys 是正在限流的调用位置, 按省略条数从多到少排序.
+        """
+        with self._lock:
+            states = [state.to_dict() for state in self._states.values() if state.total_suppressed]
+        return {
+            "window": self.window, "burst": self.burst, "suppressed_count": self.suppressed_count,
+            "summary_count": self.summary_count, "buffered_count": len(self._records),
+            "keys": sorted(states, key=lambda _: _["total_suppressed"], reverse=True)
+        }
+
+    def _count(self, record: logging.LogRecord) -> bool:
+        """统计日志并判断是否输出, 调用方需要持有 _lock.
+
+        Args:
+            record: 日志.
+
+        Returns:
+            bool: 输出返回 True.
+        """
+        key = (record.pathname, record.lineno, str(record.msg))  # 调用位置和消息模板, 不包含参数
+        if (state := self._states.get(key)) is None:
+            state = self._states[key] = _LogKeyState(record)
+        elif record.created - state.window_start >= self.window and not state.suppressed_count:
+            state.window_start, state.window_count = record.created, 0
+        state.window_count += 1
+        state.total_count += 1
+        state.last_message = record.getMessage()
+        if state.window_count <= self.burst:
+            return True
+        state.suppressed_count += 1
+        state.total_suppressed += 1
+        self.suppressed_count += 1
+        self._records.append({
+            "time": record.created, "logger": record.name, "level": record.levelname,
+            "location": state.location, "message": state.last_message
+        })
+        return False
+
+    def _sweep(self, now: float) -> list[tuple[_LogKeyState, float, int]]:
+        """找出窗口已经结束的调用位置, 有省略的生成汇总并开始新窗口, 没有省略的删除, 调用方需要持有 _lock.
+
+        Args:
+            now: 当前时间戳.
+
+        Returns:
+            list[tuple[_LogKeyState, float, int]]: 要输出的汇总, (统计, 窗口长度, 省略条数).
+        """
+        self._next_sweep = now + min(self.window, 5)
+        summaries = []
+        for key, state in list(self._states.items()):
+            if now - state.window_start < self.window:
+                continue
+            if state.suppressed_count:
+                summaries.append((state, now - state.window_start, state.suppressed_count))
+                state.window_start, state.window_count, state.suppressed_count = now, 0, 0
+            elif not state.total_suppressed:
+                del self._states[key]
+        return summaries
+
+    def _log_summaries(self, summaries: list[tuple[_LogKeyState, float, int]]):
+        """输出汇总, 汇总本身不限流.
+
+        Args:
+            summaries: 要输出的汇总.
+        """
+        for state, duration, count in summaries:
+            self.summary_count += 1
+            logging.getLogger(state.logger_name).log(
+                state.level, self.SUMMARY_MESSAGE, state.location, state.template, duration, count, state.last_message,
+                extra={"rate_limit_summary": True}
+            )
@@ -0,0 +1,221 @@
+# pylint: skip-file
+"""按时间和大小轮转的日志处理器."""
+import gzip
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from logging.handlers import TimedRotatingFileHandler
+from typing import Optional
+
+SIZE_CHECK_INTERVAL = 64  # 每写入多少条日志检查一次文件大小
+
+
+class SizeTimeRotatingFileHandler(TimedRotatingFileHandler):
+    """到时间或者文件超过 max_bytes 时轮转的日志处理器.
+
+    轮转时只关闭文件, 改名, 再打开新文件, 写日志的线程不会等待压缩.
+    改名后的文件交给后台线程压缩成 .gz, 压缩完后按修改时间从旧到新删除轮转文件,
+    直到数量不超过 backup_count 并且包括当前文件在内的总大小不超过 max_total_bytes.
+    """
+
+    def __init__(
+            self, filename: str, when: str = "D", interval: int = 1, backup_count: int = 100,
+            max_bytes: int = 100 * 1024 * 1024, max_total_bytes: int = 2 * 1024 * 1024 * 1024,
+            compress: bool = True, encoding: str = "UTF-8", delay: bool = False, logger: logging.Logger = None
+    ):
+        """SizeTimeRotatingFileHandler 构造函数.
+
+        Args:
+            filename: 日志文件路径.
+            when: 按时间轮转的单位, 和 TimedRotatingFileHandler 相同.
+            interval: 按时间轮转的间隔.
+            backup_count: 最多保留的轮转文件数量, 0 表示不限制.
+            max_bytes: 单个日志文件的大小上限, 单位字节, 0 表示只按时间轮转.
+            max_total_bytes: 所有日志文件的总大小上限, 单位字节, 0 表示不限制.
+            compress: 是否压缩轮转后的文件.
+            encoding: 文件编码.
+            delay: 是否在写入第一条日志时才打开文件.
+            logger: 记录压缩和删除异常的日志器, 默认使用本模块的日志器.
+        """
+        super().__init__(filename, when=when, interval=interval, backupCount=backup_count, encoding=encoding, delay=delay)
+        self.max_bytes = max_bytes
+        self.max_total_bytes = max_total_bytes
+        self.compress = compress
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.rollover_count = 0  # 轮转次数
+        self.compressed_count = 0  # 压缩的文件数量
+        self.deleted_count = 0  # 超出数量或者总大小后删除的文件数量
+        self.rollover_time = 0.0  # 最后一次轮转时写日志线程等待的时间, 单位秒
+
+        self._record_count = 0  # 距离上次检查文件大小写入的日志条数
+        self._rotated_queue: queue.Queue[Optional[str]] = queue.Queue()  # 等待压缩的轮转文件
+        self._worker = threading.Thread(target=self._process_rotated, name="log-rotation", daemon=True)
+        self._worker.start()
+        for path in self.get_rotated_files():  # 上次退出前没来得及压缩的文件
+            if not path.endswith(".gz"):
+                self._rotated_queue.put(path)
+        self._rotated_queue.put("")  # 启动时检查一次总大小
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        """判断是否需要轮转, 文件大小每写入 SIZE_CHECK_INTERVAL 条日志检查一次.
+
+        Args:
+            record: 日志.
+
+        Returns:
+            bool: 需要轮转返回 True.
+        """
+        if int(time.time()) >= self.rolloverAt:
+            return True
+        if not self.max_bytes or self.stream is None:
+            return False
+        self._record_count += 1
+        if self._record_count < SIZE_CHECK_INTERVAL:
+            return False
+        self._record_count = 0
+        return self.stream.tell() >= self.max_bytes
+
+    def doRollover(self):
+        """关闭当前文件, 改名后交给后台线程压缩, 再打开新文件."""
+        start_time = time.perf_counter()
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        period_start = self.rolloverAt - self.interval  # 当前文件所属的时间段
+        time_tuple = time.gmtime(period_start) if self.utc else time.localtime(period_start)
+        rotated_path = self._get_rotated_path(time.strftime(self.suffix, time_tuple))
+        if os.path.exists(self.baseFilename):
+            os.rename(self.baseFilename, rotated_path)
+            self._rotated_queue.put(rotated_path)
+        if not self.delay:
+            self.stream = self._open()
+        now = int(time.time())
+        if now >= self.rolloverAt:
+            rollover_at = self.computeRollover(now)
+            while rollover_at <= now:
+                rollover_at += self.interval
+            self.rolloverAt = rollover_at
+        self._record_count = 0
+        self.rollover_count += 1
+        self.rollover_time = time.perf_counter() - start_time
+
+    def get_rotated_files(self) -> list[str]:
+        """获取轮转后的日志文件, 包括压缩后的文件.
+
+        Returns:
+            list[str]: 文件路径, 按修改时间从旧到新排列.
+        """
+        log_dir, base_name = os.path.split(self.baseFilename)
+        stem = os.path.splitext(base_name)[0]
+        paths = [
+            os.path.join(log_dir, name) for name in os.listdir(log_dir)
+            if name != base_name and (name.startswith(f"{stem}_") or name.startswith(base_name))
+            and not name.endswith(".tmp")
+        ]
+        return sorted(paths, key=self._get_mtime)
+
+    def get_state(self) -> dict:
+        """获取轮转的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "rollover_count": self.rollover_count, "rollover_time": round(self.rollover_time, 6),
+            "compressed_count": self.compressed_count, "deleted_count": self.deleted_count,
+            "pending_count": self._rotated_queue.qsize()
+        }
+
+    def close(self):
+        """关闭文件, 通知后台线程退出, 没压缩完的文件下次启动时再压缩."""
+        self._rotated_queue.put(None)
+        super().close()
+
+    def _get_rotated_path(self, date_str: str) -> str:
+        """获取轮转后的文件路径, 同一个时间段轮转多次时在文件名后面加序号.
+
+        Args:
+            date_str: 当前文件所属时间段的字符串.
+
+        Returns:
+            str: 不和已有文件重名的路径.
+        """
+        rotated_path = self.rotation_filename(f"{self.baseFilename}.{date_str}")
+        root, ext = os.path.splitext(rotated_path)
+        index = 0
+        while os.path.exists(rotated_path) or os.path.exists(f"{rotated_path}.gz"):
+            index += 1
+            rotated_path = f"{root}_{index}{ext}"
+        return rotated_path
+
+    def _process_rotated(self):
+        """后台线程, 压缩轮转后的文件并删除超出数量或者总大小的文件."""
+        while (path := self._rotated_queue.get()) is not None:
+            try:
+                if path and self.compress:
+                    self._compress(path)
+                self._delete_over_budget()
+            except Exception as e:
+                self.logger.warning("处理轮转日志 %s 出现异常: %s", path, str(e))
+
+    def _compress(self, path: str):
+        """把文件压缩成 .gz, 压缩完再删除原文件, 中途退出不会留下不完整的 .gz 文件.
+
+        Args:
+            path: 轮转后的文件路径.
+        """
+        temp_path = f"{path}.gz.tmp"
+        with open(path, "rb") as source, gzip.open(temp_path, "wb", compresslevel=6) as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        os.replace(temp_path, f"{path}.gz")
+        os.remove(path)
+        self.compressed_count += 1
+
+    def _delete_over_budget(self):
+        """从最旧的轮转文件开始删除, 直到数量和总大小都不超过上限."""
+        rotated_files = self.get_rotated_files()
+        sizes = {path: self._get_size(path) for path in rotated_files}
+        total_size = sum(sizes.values()) + self._get_size(self.baseFilename)
+        for path in list(rotated_files):
+            over_count = self.backupCount and len(rotated_files) > self.backupCount
+            over_size = self.max_total_bytes and total_size > self.max_total_bytes
+            if not over_count and not over_size:
+                break
+            if not self.compress or path.endswith(".gz"):  # 等待压缩的文件压缩后再决定
+                os.remove(path)
+                rotated_files.remove(path)
+                total_size -= sizes[path]
+                self.deleted_count += 1
+
+    @staticmethod
+    def _get_mtime(path: str) -> float:
+        """获取文件修改时间.
+
+        Args:
+            path: 文件路径.
+
+        Returns:
+            float: 修改时间戳, 文件已经被删除时返回 0.
+        """
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
+
+    @staticmethod
+    def _get_size(path: str) -> int:
+        """获取文件大小.
+
+        Args:
+            path: 文件路径.
+
+        Returns:
+            int: 文件大小, 单位字节, 文件不存在时返回 0.
+        """
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
@@ -0,0 +1,218 @@
+# pylint: skip-file
+"""工单生产进度跟踪."""
+import logging
+import threading
+import time
+from typing import Optional
+
+from mysql_api.mysql_database import MySQLDatabase
+
+from passive_equipment import models_class
+
+LOT_STATE_RUNNING = 1  # 生产中
+LOT_STATE_FINISHED = 2  # 已完成
+
+
+class LotProgress:
+    """一个工单的生产进度."""
+
+    def __init__(self, lot_name: str, lot_quantity: int, recipe_name: Optional[str] = None):
+        """LotProgress 构造函数.
+
+        Args:
+            lot_name: 工单名称.
+            lot_quantity: 工单数量.
+            recipe_name: 配方名称.
+        """
+        self.lot_name = lot_name
+        self.lot_quantity = lot_quantity
+        self.recipe_name = recipe_name
+        self.do_quantity = 0  # 已生产数量
+        self.lot_state = LOT_STATE_RUNNING
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self.state_changed = False  # 最后一次数量变化是否改变了工单状态
+
+    @property
+    def is_finished(self) -> bool:
+        """工单是否已经生产完成."""
+        return self.lot_state == LOT_STATE_FINISHED
+
+    def to_dict(self) -> dict:
+        """转换成字典, 用于日志和 socket 返回.
+
+        Returns:
+            dict: 生产进度.
+        """
+        return {
+            "lot_name": self.lot_name, "lot_quantity": self.lot_quantity, "recipe_name": self.recipe_name,
+            "do_quantity": self.do_quantity, "lot_state": self.lot_state
+        }
+
+
+class LotTracker:
+    """在内存里跟踪当前工单的已生产数量和完成状态.
+
+    监控线程按扫描周期把 plc 的已生产数量交给 update, 只有数量变化时才更新内存里的进度,
+    数据库每隔 flush_gap 秒合并写入一次, 工单开始和完成时立即写入. 开新工单前的检查直接使用内存里的进度.
+    """
+
+    def __init__(self, mysql: MySQLDatabase, logger: logging.Logger = None, flush_gap: float = 5):
+        """LotTracker 构造函数.
+
+        Args:
+            mysql: 数据库实例.
+            logger: 日志器, 默认使用本模块的日志器.
+            flush_gap: 合并写入数据库的间隔, 单位秒.
+        """
+        self.mysql = mysql
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.flush_gap = flush_gap
+        self.current: Optional[LotProgress] = None  # 当前工单
+        self.plc_quantity: Optional[int] = None  # 最后一次采样的 plc 已生产数量, 还没采样时是 None
+        self.sample_count = 0  # 采样次数
+        self.change_count = 0  # 数量变化的采样次数
+        self.produced_count = 0  # 累计生产数量, plc 计数清零不影响
+        self.reset_count = 0  # plc 计数变小的次数
+        self.flush_count = 0  # 写入数据库的次数
+        self.flush_error_count = 0  # 写入数据库失败的次数
+
+        self._pending: dict[str, dict] = {}  # 等待写入数据库的工单名称和字段
+        self._new_lots: set[str] = set()  # 数据库里可能还没有的工单
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # 保证同一个工单的进度按顺序写入
+
+    def start_lot(
+            self, lot_name: str, lot_quantity: int, recipe_name: Optional[str] = None, resume: bool = False
+    ) -> LotProgress:
+        """开始跟踪新工单, 立即写入数据库.
+
+        Args:
+            lot_name: 工单名称.
+            lot_quantity: 工单数量.
+            recipe_name: 配方名称.
+            resume: 是否是程序重启后继续跟踪之前的工单, 继续跟踪时不写入数据库.
+
+        Returns:
+            LotProgress: 新工单的进度.
+        """
+        progress = LotProgress(lot_name, int(lot_quantity), recipe_name)
+        with self._lock:
+            self.current = progress  # plc 的数量变化后才计入新工单, 开工单前的旧数量不会算作新工单的产量
+            if resume:
+                return progress
+            self._new_lots.add(lot_name)
+            self._pending[lot_name] = {
+                "recipe_name": recipe_name, "lot_quantity": progress.lot_quantity, "do_quantity": 0,
+                "lot_state": LOT_STATE_RUNNING
+            }
+        self.flush(True)
+        return progress
+
+    def update(self, plc_quantity: int) -> Optional[LotProgress]:
+        """记录一次 plc 已生产数量的采样.
+
+        Args:
+            plc_quantity: plc 的已生产数量.
+
+        Returns:
+            Optional[LotProgress]: 当前工单的已生产数量变化时返回进度, 否则返回 None.
+        """
+        plc_quantity = int(plc_quantity)
+        with self._lock:
+            self.sample_count += 1
+            last_quantity, self.plc_quantity = self.plc_quantity, plc_quantity
+            if plc_quantity == last_quantity:
+                return None
+            if last_quantity is not None:
+                if plc_quantity < last_quantity:
+                    self.reset_count += 1
+                else:
+                    self.produced_count += plc_quantity - last_quantity
+            self.change_count += 1
+            if (progress := self.current) is None or progress.do_quantity == plc_quantity:
+                return None
+            progress.do_quantity = plc_quantity
+            update_values = {"do_quantity": plc_quantity}
+            progress.state_changed = not progress.is_finished and 0 < progress.lot_quantity <= plc_quantity
+            if progress.state_changed:
+                progress.lot_state = update_values["lot_state"] = LOT_STATE_FINISHED
+                progress.end_time = time.time()
+            self._pending.setdefault(progress.lot_name, {}).update(update_values)
+        if progress.state_changed:
+            self.flush(True)
+        return progress
+
+    def is_lot_finished(self) -> Optional[bool]:
+        """根据内存里的进度判断上个工单是否做完, 和原来读取 plc 的判断一致.
+
+        Returns:
+            Optional[bool]: 做完或者没有工单返回 True, 还没采样过 plc 返回 None.
+        """
+        if self.plc_quantity is None:
+            return None
+        lot_quantity = self.current.lot_quantity if self.current else 0
+        return not (self.plc_quantity < lot_quantity and self.plc_quantity != 0)
+
+    def flush(self, force: bool = False) -> int:
+        """把合并后的进度写入数据库, 失败时保留等下次写入.
+
+        Args:
+            force: 是否忽略写入间隔立即写入.
+
+        Returns:
+            int: 写入的工单数量.
+        """
+        if not self._pending or (not force and time.monotonic() - self._last_flush < self.flush_gap):
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                new_lots, self._new_lots = self._new_lots, set()
+                self._last_flush = time.monotonic()
+            written_count = self._write(pending, new_lots)
+        self.flush_count += written_count
+        return written_count
+
+    def get_state(self) -> dict:
+        """获取跟踪的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "current": self.current.to_dict() if self.current else None, "plc_quantity": self.plc_quantity,
+            "sample_count": self.sample_count, "change_count": self.change_count,
+            "produced_count": self.produced_count, "reset_count": self.reset_count,
+            "flush_count": self.flush_count, "flush_error_count": self.flush_error_count,
+            "pending_count": len(self._pending)
+        }
+
+    def _write(self, pending: dict[str, dict], new_lots: set[str]) -> int:
+        """写入数据库, 写入失败的工单放回等待列表.
+
+        Args:
+            pending: 工单名称和要更新的字段.
+            new_lots: 数据库里可能还没有的工单.
+
+        Returns:
+            int: 写入成功的工单数量.
+        """
+        written_count = 0
+        for lot_name, update_values in pending.items():
+            try:
+                if lot_name in new_lots and not self.mysql.query_data(models_class.LotList, {"lot_name": lot_name}):
+                    self.mysql.add_data(models_class.LotList, [{"lot_name": lot_name, **update_values}])
+                else:
+                    self.mysql.update_data(models_class.LotList, update_values, {"lot_name": lot_name})
+                written_count += 1
+            except Exception as e:
+                self.flush_error_count += 1
+                self.logger.warning("保存工单 %s 的进度失败: %s", lot_name, str(e))
+                with self._lock:
+                    update_values.update(self._pending.get(lot_name, {}))
+                    self._pending[lot_name] = update_values
+                    if lot_name in new_lots:
+                        self._new_lots.add(lot_name)
+        return written_count
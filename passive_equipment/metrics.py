@@ -0,0 +1,62 @@
+# pylint: skip-file
+"""运行指标统计."""
+import threading
+from collections import deque
+
+
+class RollingStats:
+    """滑动窗口统计, 保存最近 window 个样本, 用于耗时和误差等指标."""
+
+    def __init__(self, window: int = 1000):
+        """RollingStats 构造函数.
+
+        Args:
+            window: 保留的样本数量.
+        """
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.last_value = 0.0
+        self.max_value = 0.0
+
+    def record(self, value: float):
+        """记录一个样本.
+
+        Args:
+            value: 样本值.
+        """
+        with self._lock:
+            self._samples.append(value)
+            self.count += 1
+            self.last_value = value
+            self.max_value = max(self.max_value, value)
+
+    def percentile(self, percent: float) -> float:
+        """获取窗口内样本的百分位数.
+
+        Args:
+            percent: 百分位, 0 ~ 100.
+
+        Returns:
+            float: 百分位数, 没有样本返回 0.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        index = min(len(samples) - 1, int(len(samples) * percent / 100))
+        return samples[index]
+
+    def get_state(self) -> dict:
+        """获取统计信息.
+
+        Returns:
+            dict: 样本总数, 最近值, 窗口平均值, 历史最大值, p50, p99.
+        """
+        with self._lock:
+            samples = list(self._samples)
+        mean_value = sum(samples) / len(samples) if samples else 0.0
+        return {
+            "count": self.count, "last": round(self.last_value, 6), "mean": round(mean_value, 6),
+            "max": round(self.max_value, 6), "p50": round(self.percentile(50), 6), "p99": round(self.percentile(99), 6)
+        }
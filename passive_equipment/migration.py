@@ -0,0 +1,33 @@
+# pylint: skip-file
+"""数据库结构迁移."""
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy.engine import Engine
+
+MIGRATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def upgrade_database(engine: Engine, revision: str = "head"):
+    """把数据库升级到指定版本, 已经是该版本时不做任何修改.
+
+    多台设备共用连接池时, 设备的引擎通过 schema_translate_map 映射到设备自己的数据库,
+    迁移期间把连接的当前数据库切换到设备的数据库, 结束后切换回来再放回连接池.
+
+    Args:
+        engine: 数据库引擎.
+        revision: 目标版本, 默认升级到最新版本.
+    """
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_PATH)
+    database_name = (engine.get_execution_options().get("schema_translate_map") or {}).get(None)
+    with engine.begin() as connection:
+        if database_name:
+            connection.exec_driver_sql(f"USE `{database_name}`")
+        try:
+            config.attributes["connection"] = connection
+            command.upgrade(config, revision)
+        finally:
+            if database_name:
+                connection.exec_driver_sql(f"USE `{engine.url.database}`")
@@ -0,0 +1,10 @@
+# pylint: skip-file
+"""Alembic 迁移环境, 使用 migration.upgrade_database 传入的数据库连接."""
+from alembic import context
+
+from passive_equipment.models_class import BASE
+
+connection = context.config.attributes["connection"]
+context.configure(connection=connection, target_metadata=BASE.metadata)
+with context.begin_transaction():
+    context.run_migrations()
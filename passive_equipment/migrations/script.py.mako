@@ -0,0 +1,24 @@
+# pylint: skip-file
+"""${message}.
+
+Revision ID: ${up_revision}
+Revises: ${down_revision | comma,n}
+Create Date: ${create_date}
+"""
+import sqlalchemy as sa
+from alembic import op
+${imports if imports else ""}
+revision = ${repr(up_revision)}
+down_revision = ${repr(down_revision)}
+branch_labels = ${repr(branch_labels)}
+depends_on = ${repr(depends_on)}
+
+
+def upgrade():
+    """升级."""
+    ${upgrades if upgrades else "pass"}
+
+
+def downgrade():
+    """降级."""
+    ${downgrades if downgrades else "pass"}
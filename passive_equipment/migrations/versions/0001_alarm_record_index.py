@@ -0,0 +1,54 @@
+# pylint: skip-file
+"""报警记录增加解除时间和索引, 新建归档表.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_alarm_record_list_created_at": ["created_at"],
+    "ix_alarm_record_list_alarm_id_created_at": ["alarm_id", "created_at"],
+}
+
+
+def upgrade():
+    """升级, 已经由 create_table 按新模型建好的表和索引会跳过."""
+    inspector = sa.inspect(op.get_bind())
+    table_names = inspector.get_table_names()
+    if "alarm_record_list" in table_names:
+        if "cleared_at" not in {column["name"] for column in inspector.get_columns("alarm_record_list")}:
+            op.add_column(
+                "alarm_record_list",
+                sa.Column("cleared_at", sa.DateTime, nullable=True, comment="报警解除时间, 未解除时为空")
+            )
+        index_names = {index["name"] for index in inspector.get_indexes("alarm_record_list")}
+        for index_name, columns in INDEXES.items():
+            if index_name not in index_names:
+                op.create_index(index_name, "alarm_record_list", columns)
+    if "alarm_record_archive" not in table_names:
+        op.create_table(
+            "alarm_record_archive",
+            sa.Column("id", sa.Integer, primary_key=True, autoincrement=False, comment="原报警记录 id"),
+            sa.Column("alarm_id", sa.Integer, nullable=True, comment="报警 id"),
+            sa.Column("alarm_text", sa.String(520), nullable=True, comment="报警内容"),
+            sa.Column("cleared_at", sa.DateTime, nullable=True, comment="报警解除时间"),
+            sa.Column("created_at", sa.DateTime, nullable=True, comment="报警发生时间"),
+            sa.Column("archived_at", sa.DateTime, nullable=True, comment="归档时间"),
+            comment="超过保留天数的报警记录"
+        )
+
+
+def downgrade():
+    """降级."""
+    op.drop_table("alarm_record_archive")
+    for index_name in INDEXES:
+        op.drop_index(index_name, "alarm_record_list")
+    op.drop_column("alarm_record_list", "cleared_at")
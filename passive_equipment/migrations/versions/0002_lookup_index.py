@@ -0,0 +1,75 @@
+# pylint: skip-file
+"""地址表增加角色列, 配置表和地址表的查询列增加索引.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "sv_list": {"ix_sv_list_sv_name": ["sv_name"]},
+    "dv_list": {"ix_dv_list_dv_name": ["dv_name"]},
+    "ec_list": {"ix_ec_list_ec_name": ["ec_name"]},
+    "plc_address_list": {
+        "ix_plc_address_list_role": ["role"],
+        "ix_plc_address_list_associate_signal_step": ["associate_signal", "step"],
+    },
+    "mes_address_list": {
+        "ix_mes_address_list_role": ["role"],
+        "ix_mes_address_list_associate_signal_step": ["associate_signal", "step"],
+    },
+    "signal_address_list": {"ix_signal_address_list_address": ["address"]},
+    "flow_func": {"ix_flow_func_associate_signal_step": ["associate_signal", "step"]},
+}
+
+# 原来程序按描述信息查找的地址, 迁移时按描述信息填上角色
+ROLES = {
+    "plc_address_list": {
+        "设备的控制状态": "control_state",
+        "设备的运行状态": "machine_state",
+        "当前配方id": "recipe_id",
+        "当前设备已生产的工单数量": "do_quantity",
+        "出现报警时报警 id": "alarm_id",
+    },
+    "mes_address_list": {"MES 心跳": "mes_heart"},
+}
+
+
+def upgrade():
+    """升级, 已经存在的列和索引会跳过, 已经填写的角色不会被覆盖."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    table_names = inspector.get_table_names()
+    for table_name, roles in ROLES.items():
+        if table_name not in table_names:
+            continue
+        if "role" not in {column["name"] for column in inspector.get_columns(table_name)}:
+            op.add_column(table_name, sa.Column("role", sa.String(50), nullable=True, comment="地址角色"))
+        for description, role in roles.items():
+            bind.execute(
+                sa.text(f"UPDATE {table_name} SET role = :role WHERE description = :description AND role IS NULL"),
+                {"role": role, "description": description}
+            )
+    for table_name, indexes in INDEXES.items():
+        if table_name not in table_names:
+            continue
+        index_names = {index["name"] for index in inspector.get_indexes(table_name)}
+        for index_name, columns in indexes.items():
+            if index_name not in index_names:
+                op.create_index(index_name, table_name, columns)
+
+
+def downgrade():
+    """降级."""
+    for table_name, indexes in INDEXES.items():
+        for index_name in indexes:
+            op.drop_index(index_name, table_name)
+    for table_name in ROLES:
+        op.drop_column(table_name, "role")
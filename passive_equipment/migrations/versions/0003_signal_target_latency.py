@@ -0,0 +1,34 @@
+# pylint: skip-file
+"""信号地址表增加目标检测延迟列.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """升级, 已经存在的列会跳过."""
+    inspector = sa.inspect(op.get_bind())
+    if "signal_address_list" not in inspector.get_table_names():
+        return
+    if "target_latency" not in {column["name"] for column in inspector.get_columns("signal_address_list")}:
+        op.add_column(
+            "signal_address_list",
+            sa.Column(
+                "target_latency", sa.Integer, nullable=True,
+                comment="目标检测延迟, 单位毫秒, 为空时使用 ec signal_target_latency"
+            )
+        )
+
+
+def downgrade():
+    """降级."""
+    op.drop_column("signal_address_list", "target_latency")
@@ -0,0 +1,40 @@
+# pylint: skip-file
+"""信号地址表增加握手方式和消抖时间列.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    "handshake": sa.Column(
+        "handshake", sa.String(20), nullable=True, comment="握手方式: level, toggle, counter, 为空时是 level"
+    ),
+    "debounce": sa.Column(
+        "debounce", sa.Integer, nullable=True, comment="消抖时间, 单位毫秒, 为空时使用 ec signal_debounce"
+    ),
+}
+
+
+def upgrade():
+    """升级, 已经存在的列会跳过."""
+    inspector = sa.inspect(op.get_bind())
+    if "signal_address_list" not in inspector.get_table_names():
+        return
+    column_names = {column["name"] for column in inspector.get_columns("signal_address_list")}
+    for column_name, column in COLUMNS.items():
+        if column_name not in column_names:
+            op.add_column("signal_address_list", column)
+
+
+def downgrade():
+    """降级."""
+    for column_name in COLUMNS:
+        op.drop_column("signal_address_list", column_name)
@@ -0,0 +1,61 @@
+# pylint: skip-file
+"""plc 地址表和 mes 地址表增加写入校验列.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+TABLE_NAMES = ("plc_address_list", "mes_address_list")
+COLUMN_NAMES = ("verify_write", "verify_retry", "verify_timeout")
+
+
+def _columns() -> list:
+    """新增的列, 每张表要用各自的列对象.
+
+    默认值是 NULL, 为空时按 ec 和 plc 类型决定是否校验, 已有的地址升级后行为不变.
+
+    Returns:
+        list: 新增的列.
+    """
+    return [
+        sa.Column(
+            "verify_write", sa.Integer, nullable=True, server_default=sa.text("NULL"),
+            comment="写入后是否回读校验, 1: 校验, 0: 不校验, 为空时只校验西门子 plc 的 bool 地址"
+        ),
+        sa.Column(
+            "verify_retry", sa.Integer, nullable=True, server_default=sa.text("NULL"),
+            comment="校验失败后最多重新写入几次, 为空时使用 ec write_verify_retry"
+        ),
+        sa.Column(
+            "verify_timeout", sa.Integer, nullable=True, server_default=sa.text("NULL"),
+            comment="写入校验截止时间, 单位毫秒, 为空时使用 ec write_verify_timeout"
+        ),
+    ]
+
+
+def upgrade():
+    """升级, 已经存在的列会跳过."""
+    inspector = sa.inspect(op.get_bind())
+    table_names = inspector.get_table_names()
+    for table_name in TABLE_NAMES:
+        if table_name not in table_names:
+            continue
+        column_names = {column["name"] for column in inspector.get_columns(table_name)}
+        for column in _columns():
+            if column.name not in column_names:
+                op.add_column(table_name, column)
+
+
+def downgrade():
+    """降级."""
+    for table_name in TABLE_NAMES:
+        for column_name in COLUMN_NAMES:
+            op.drop_column(table_name, column_name)
@@ -0,0 +1,31 @@
+# pylint: skip-file
+"""工单表增加已生产数量列.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """升级, 已经存在的列会跳过."""
+    inspector = sa.inspect(op.get_bind())
+    if "lot_list" not in inspector.get_table_names():
+        return
+    if "do_quantity" not in {column["name"] for column in inspector.get_columns("lot_list")}:
+        op.add_column(
+            "lot_list",
+            sa.Column("do_quantity", sa.Integer, nullable=True, server_default="0", comment="已生产数量")
+        )
+
+
+def downgrade():
+    """降级."""
+    op.drop_column("lot_list", "do_quantity")
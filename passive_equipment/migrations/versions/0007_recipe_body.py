@@ -0,0 +1,37 @@
+# pylint: skip-file
+"""新建配方 body 表.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """升级, 已经由 create_table 按新模型建好的表会跳过."""
+    if "recipe_body_list" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "recipe_body_list",
+        sa.Column("id", sa.Integer, primary_key=True, unique=True, nullable=False, autoincrement=True),
+        sa.Column("recipe_name", sa.String(120), nullable=True, unique=True, comment="配方名称, 即 PPID"),
+        sa.Column("body_format", sa.Integer, nullable=True, comment="body 的 secs 格式码, 8: Binary, 16: ASCII"),
+        sa.Column("body_size", sa.Integer, nullable=True, comment="body 字节数"),
+        sa.Column("body_hash", sa.String(64), nullable=True, comment="整个 body 的 sha256"),
+        sa.Column("chunk_hashes", sa.JSON, nullable=True, comment="按顺序排列的块 sha256 列表"),
+        sa.Column("updated_at", sa.DateTime, nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=True),
+        comment="配方 body 模型, body 内容按块保存在 RecipeStore 里"
+    )
+
+
+def downgrade():
+    """降级."""
+    op.drop_table("recipe_body_list")
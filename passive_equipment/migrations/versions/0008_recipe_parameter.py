@@ -0,0 +1,46 @@
+# pylint: skip-file
+"""新建配方参数表.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """升级, 已经由 create_table 按新模型建好的表会跳过."""
+    if "recipe_parameter_list" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "recipe_parameter_list",
+        sa.Column("id", sa.Integer, primary_key=True, unique=True, nullable=False, autoincrement=True),
+        sa.Column("recipe_id", sa.Integer, nullable=True, comment="配方 id"),
+        sa.Column("parameter_name", sa.String(250), nullable=True, comment="参数名称"),
+        sa.Column("address", sa.String(250), nullable=True, comment="标签地址"),
+        sa.Column(
+            "data_type", sa.String(250), nullable=True,
+            comment="标签地址值数据类型: bool, string, sint, int, dint, lint, byte, word, dword, lword, real, lreal"
+        ),
+        sa.Column("bit_index", sa.Integer, nullable=True, comment="bool 类型的 bit 位"),
+        sa.Column("size", sa.Integer, nullable=True, comment="地址大小"),
+        sa.Column("db_num", sa.Integer, nullable=True, comment="西门子 plc 的 db 号, 为空时使用 ec db_num"),
+        sa.Column("value", sa.JSON, nullable=True, comment="参数值"),
+        sa.Column("description", sa.String(250), nullable=True, comment="参数描述信息"),
+        sa.Column("updated_at", sa.DateTime, nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=True),
+        comment="配方参数模型, 切换配方时下载到 plc"
+    )
+    op.create_index("ix_recipe_parameter_list_recipe_id", "recipe_parameter_list", ["recipe_id"])
+
+
+def downgrade():
+    """降级."""
+    op.drop_index("ix_recipe_parameter_list_recipe_id", "recipe_parameter_list")
+    op.drop_table("recipe_parameter_list")
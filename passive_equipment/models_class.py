@@ -3,7 +3,7 @@
 import datetime
 
 from mysql_api.mysql_database import MySQLDatabase
-from sqlalchemy import Column, String, Integer, DateTime, JSON
+from sqlalchemy import Column, String, Integer, DateTime, Index, JSON
 from sqlalchemy.orm import declarative_base
 
 BASE = declarative_base()
@@ -33,6 +33,7 @@ class LotList(BASE):
     lot_name = Column(String(50),  unique=True, comment="工单名称")
     recipe_name = Column(String(50), nullable=True, comment="配方名称")
     lot_quantity = Column(Integer, nullable=True, comment="工单数量")
+    do_quantity = Column(Integer, nullable=True, default=0, comment="已生产数量")
     lot_state = Column(Integer, nullable=True, default=1, comment="工单状态")
     updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
     created_at = Column(DateTime, default=datetime.datetime.now)
@@ -41,7 +42,10 @@ class LotList(BASE):
 class SvList(BASE):
     """SV列表模型."""
     __tablename__ = "sv_list"
-    __table_args__ = {"comment": "sv 列表"}
+    __table_args__ = (
+        Index("ix_sv_list_sv_name", "sv_name"),
+        {"comment": "sv 列表"}
+    )
 
     id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
     sv_id = Column(Integer, nullable=True, comment="sv id")
@@ -57,7 +61,10 @@ class SvList(BASE):
 class DvList(BASE):
     """SV列表模型."""
     __tablename__ = "dv_list"
-    __table_args__ = {"comment": "dv 列表"}
+    __table_args__ = (
+        Index("ix_dv_list_dv_name", "dv_name"),
+        {"comment": "dv 列表"}
+    )
 
     id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
     dv_id = Column(Integer, nullable=True, comment="dv id")
@@ -73,7 +80,10 @@ class DvList(BASE):
 class EcList(BASE):
     """EC列表模型."""
     __tablename__ = "ec_list"
-    __table_args__ = {"comment": "ec 列表"}
+    __table_args__ = (
+        Index("ix_ec_list_ec_name", "ec_name"),
+        {"comment": "ec 列表"}
+    )
 
     id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
     ec_id = Column(Integer, nullable=True, comment="ec id")
@@ -142,18 +152,40 @@ class AlarmList(BASE):
 class AlarmRecordList(BASE):
     """报警信息模型."""
     __tablename__ = "alarm_record_list"
-    __table_args__ = {"comment": "设备报警记录模型"}
+    __table_args__ = (
+        Index("ix_alarm_record_list_created_at", "created_at"),
+        Index("ix_alarm_record_list_alarm_id_created_at", "alarm_id", "created_at"),
+        {"comment": "设备报警记录模型"}
+    )
 
     id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
     alarm_id = Column(Integer, nullable=True, comment="报警 id")
     alarm_text = Column(String(520), nullable=True, comment="报警内容")
+    cleared_at = Column(DateTime, nullable=True, comment="报警解除时间, 未解除时为空")
     created_at = Column(DateTime, default=datetime.datetime.now)
 
 
+class AlarmRecordArchiveList(BASE):
+    """报警记录归档模型."""
+    __tablename__ = "alarm_record_archive"
+    __table_args__ = {"comment": "超过保留天数的报警记录"}
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=False, comment="原报警记录 id")
+    alarm_id = Column(Integer, nullable=True, comment="报警 id")
+    alarm_text = Column(String(520), nullable=True, comment="报警内容")
+    cleared_at = Column(DateTime, nullable=True, comment="报警解除时间")
+    created_at = Column(DateTime, nullable=True, comment="报警发生时间")
+    archived_at = Column(DateTime, default=datetime.datetime.now, comment="归档时间")
+
+
 class PlcAddressList(BASE):
     """PLC plc 2 mes 地址列表模型."""
     __tablename__ = "plc_address_list"
-    __table_args__ = {"comment": "plc 2 mes 地址列表"}
+    __table_args__ = (
+        Index("ix_plc_address_list_role", "role"),
+        Index("ix_plc_address_list_associate_signal_step", "associate_signal", "step"),
+        {"comment": "plc 2 mes 地址列表"}
+    )
 
     id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
     address = Column(String(250), nullable=True, comment="标签地址")
@@ -170,6 +202,12 @@ class PlcAddressList(BASE):
     associate_signal = Column(String(250), nullable=True, comment="关联信号")
     step = Column(Integer, nullable=True, comment="所属信号的第几步流程")
     event_id = Column(Integer, nullable=True, comment="要发送的事件id")
+    verify_write = Column(
+        Integer, nullable=True, comment="写入后是否回读校验, 1: 校验, 0: 不校验, 为空时只校验西门子 plc 的 bool 地址"
+    )
+    verify_retry = Column(Integer, nullable=True, comment="校验失败后最多重新写入几次, 为空时使用 ec write_verify_retry")
+    verify_timeout = Column(Integer, nullable=True, comment="写入校验截止时间, 单位毫秒, 为空时使用 ec write_verify_timeout")
+    role = Column(String(50), nullable=True, comment="地址角色, 程序按角色查找地址: control_state, machine_state, recipe_id, do_quantity, alarm_id")
     description = Column(String(250), nullable=True, comment="地址描述信息")
     updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
     created_at = Column(DateTime, default=datetime.datetime.now)
@@ -178,7 +216,11 @@ class PlcAddressList(BASE):
 class MesAddressList(BASE):
     """PLC plc 2 mes 地址列表模型."""
     __tablename__ = "mes_address_list"
-    __table_args__ = {"comment": "mes 2 plc 地址列表"}
+    __table_args__ = (
+        Index("ix_mes_address_list_role", "role"),
+        Index("ix_mes_address_list_associate_signal_step", "associate_signal", "step"),
+        {"comment": "mes 2 plc 地址列表"}
+    )
 
     id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
     address = Column(String(250), nullable=True, comment="标签地址")
@@ -194,6 +236,12 @@ class MesAddressList(BASE):
     associate_signal = Column(String(250), nullable=True, comment="关联信号")
     step = Column(Integer, nullable=True, comment="所属信号的第几步流程")
     event_id = Column(Integer, nullable=True, comment="要发送的事件id")
+    verify_write = Column(
+        Integer, nullable=True, comment="写入后是否回读校验, 1: 校验, 0: 不校验, 为空时只校验西门子 plc 的 bool 地址"
+    )
+    verify_retry = Column(Integer, nullable=True, comment="校验失败后最多重新写入几次, 为空时使用 ec write_verify_retry")
+    verify_timeout = Column(Integer, nullable=True, comment="写入校验截止时间, 单位毫秒, 为空时使用 ec write_verify_timeout")
+    role = Column(String(50), nullable=True, comment="地址角色, 程序按角色查找地址: mes_heart")
     description = Column(String(250), nullable=True, comment="地址描述信息")
     updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
     created_at = Column(DateTime, default=datetime.datetime.now)
@@ -202,7 +250,10 @@ class MesAddressList(BASE):
 class SignalAddressList(BASE):
     """PLC 信号地址列表模型."""
     __tablename__ = "signal_address_list"
-    __table_args__ = {"comment": "PLC 信号地址列表"}
+    __table_args__ = (
+        Index("ix_signal_address_list_address", "address"),
+        {"comment": "PLC 信号地址列表"}
+    )
 
     id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
     address = Column(String(250), nullable=True, comment="标签地址")
@@ -213,6 +264,9 @@ class SignalAddressList(BASE):
     signal_value = Column(Integer, nullable=True, comment="监控信号值")
     clean_signal_value = Column(Integer, nullable=True, comment="清除信号值")
     state = Column(Integer, nullable=True, comment="是否监控地址信号, 1: 监控, 0: 不监控")
+    target_latency = Column(Integer, nullable=True, comment="目标检测延迟, 单位毫秒, 为空时使用 ec signal_target_latency")
+    handshake = Column(String(20), nullable=True, comment="握手方式: level, toggle, counter, 为空时是 level")
+    debounce = Column(Integer, nullable=True, comment="消抖时间, 单位毫秒, 为空时使用 ec signal_debounce")
     description = Column(String(250), nullable=True, comment="地址描述信息")
     updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
     created_at = Column(DateTime, default=datetime.datetime.now)
@@ -221,7 +275,10 @@ class SignalAddressList(BASE):
 class FlowFunc(BASE):
     """流程函数的表模型."""
     __tablename__ = "flow_func"
-    __table_args__ = {"comment": "流程函数的表模型"}
+    __table_args__ = (
+        Index("ix_flow_func_associate_signal_step", "associate_signal", "step"),
+        {"comment": "流程函数的表模型"}
+    )
 
     id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
     func_name = Column(String(50), nullable=True, comment="函数名称")
@@ -245,3 +302,40 @@ class Recipes(BASE):
     description = Column(String(250), nullable=True, comment="描述信息")
     updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
     created_at = Column(DateTime, default=datetime.datetime.now)
+
+
+class RecipeBodyList(BASE):
+    """配方 body 模型."""
+    __tablename__ = "recipe_body_list"
+    __table_args__ = {"comment": "配方 body 模型, body 内容按块保存在 RecipeStore 里"}
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
+    recipe_name = Column(String(120), nullable=True, unique=True, comment="配方名称, 即 PPID")
+    body_format = Column(Integer, nullable=True, comment="body 的 secs 格式码, 8: Binary, 16: ASCII")
+    body_size = Column(Integer, nullable=True, comment="body 字节数")
+    body_hash = Column(String(64), nullable=True, comment="整个 body 的 sha256")
+    chunk_hashes = Column(JSON, nullable=True, comment="按顺序排列的块 sha256 列表")
+    updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+    created_at = Column(DateTime, default=datetime.datetime.now)
+
+
+class RecipeParameterList(BASE):
+    """配方参数模型."""
+    __tablename__ = "recipe_parameter_list"
+    __table_args__ = {"comment": "配方参数模型, 切换配方时下载到 plc"}
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False, autoincrement=True)
+    recipe_id = Column(Integer, nullable=True, index=True, comment="配方 id")
+    parameter_name = Column(String(250), nullable=True, comment="参数名称")
+    address = Column(String(250), nullable=True, comment="标签地址")
+    data_type = Column(
+        String(250), nullable=True,
+        comment="标签地址值数据类型: bool, string, sint, int, dint, lint, byte, word, dword, lword, real, lreal"
+    )
+    bit_index = Column(Integer, nullable=True, comment="bool 类型的 bit 位")
+    size = Column(Integer, nullable=True, comment="地址大小")
+    db_num = Column(Integer, nullable=True, comment="西门子 plc 的 db 号, 为空时使用 ec db_num")
+    value = Column(JSON, nullable=True, comment="参数值")
+    description = Column(String(250), nullable=True, comment="参数描述信息")
+    updated_at = Column(DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+    created_at = Column(DateTime, default=datetime.datetime.now)
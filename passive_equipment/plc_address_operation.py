@@ -2,116 +2,146 @@
 from operator import itemgetter
 from typing import Any, Optional
 
+from mysql_api.mysql_database import MySQLDatabase
+
 from passive_equipment import models_class
 from passive_equipment.factory import get_mysql_secs
 
+ROLE_MES_HEART = "mes_heart"  # MES 心跳
+ROLE_CONTROL_STATE = "control_state"  # 设备的控制状态
+ROLE_RECIPE_ID = "recipe_id"  # 当前配方id
+ROLE_DO_QUANTITY = "do_quantity"  # 当前设备已生产的工单数量
+ROLE_MACHINE_STATE = "machine_state"  # 设备的运行状态
+ROLE_ALARM_ID = "alarm_id"  # 出现报警时报警 id
+ROLE_DESCRIPTIONS = {
+    ROLE_MES_HEART: "MES 心跳", ROLE_CONTROL_STATE: "设备的控制状态", ROLE_RECIPE_ID: "当前配方id",
+    ROLE_DO_QUANTITY: "当前设备已生产的工单数量", ROLE_MACHINE_STATE: "设备的运行状态", ROLE_ALARM_ID: "出现报警时报警 id"
+}  # 地址角色对应的旧描述信息, 没有填写角色的地址按描述信息查找
+
 
-def get_mes_herat(equipment_name) -> Optional[dict[str, Any]]:
+def get_mes_herat(equipment_name, mysql: Optional[MySQLDatabase] = None) -> Optional[dict[str, Any]]:
     """获取 MES 心跳地址信息.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
        Optional[dict[str, Any]]: 返回 MES 心跳地址信息.
     """
-    mysql = get_mysql_secs()
-    address_info_list = mysql.query_data(models_class.MesAddressList, {"description": "MES 心跳"})
-    if address_info_list:
-        address_info = address_info_list[0]
-        return get_address_info(equipment_name, address_info)
-    return None
+    return get_role_address_info(equipment_name, models_class.MesAddressList, ROLE_MES_HEART, mysql)
 
 
-def get_control_state(equipment_name) -> Optional[dict[str, Any]]:
+def get_control_state(equipment_name, mysql: Optional[MySQLDatabase] = None) -> Optional[dict[str, Any]]:
     """获取控制状态地址信息.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         Optional[dict[str, Any]]: 返回 MES 心跳地址信息.
     """
-    mysql = get_mysql_secs()
-    address_info_list = mysql.query_data(models_class.PlcAddressList, {"description": "设备的控制状态"})
-    if address_info_list:
-        address_info = address_info_list[0]
-        return get_address_info(equipment_name, address_info)
-    return None
+    return get_role_address_info(equipment_name, models_class.PlcAddressList, ROLE_CONTROL_STATE, mysql)
 
 
-def get_recipe_address_info(equipment_name) -> Optional[dict[str, Any]]:
+def get_recipe_address_info(equipment_name, mysql: Optional[MySQLDatabase] = None) -> Optional[dict[str, Any]]:
     """获取配方 id 地址信息.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         Optional[dict[str, Any]]: 返回 配方 id 地址信息.
     """
-    mysql = get_mysql_secs()
-    address_info_list = mysql.query_data(models_class.PlcAddressList, {"description": "当前配方id"})
-    if address_info_list:
-        address_info = address_info_list[0]
-        return get_address_info(equipment_name, address_info)
-    return None
+    return get_role_address_info(equipment_name, models_class.PlcAddressList, ROLE_RECIPE_ID, mysql)
 
 
-def get_do_quantity_address_info(equipment_name) -> Optional[dict[str, Any]]:
+def get_do_quantity_address_info(equipment_name, mysql: Optional[MySQLDatabase] = None) -> Optional[dict[str, Any]]:
     """获取已生产数量地址信息.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         Optional[dict[str, Any]]: 返回 已生产数量地址信息.
     """
-    mysql = get_mysql_secs()
-    address_info_list = mysql.query_data(models_class.PlcAddressList, {"description": "当前设备已生产的工单数量"})
-    if address_info_list:
-        address_info = address_info_list[0]
-        return get_address_info(equipment_name, address_info)
-    return None
+    return get_role_address_info(equipment_name, models_class.PlcAddressList, ROLE_DO_QUANTITY, mysql)
 
 
-def get_machine_state(equipment_name) -> Optional[dict[str, Any]]:
+def get_machine_state(equipment_name, mysql: Optional[MySQLDatabase] = None) -> Optional[dict[str, Any]]:
     """获取运行状态地址信息.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
          Optional[dict[str, Any]]: 返回 MES 心跳地址信息.
     """
-    mysql = get_mysql_secs()
-    address_info_list = mysql.query_data(models_class.PlcAddressList, {"description": "设备的运行状态"})
-    if address_info_list:
-        address_info = address_info_list[0]
-        return get_address_info(equipment_name, address_info)
-    return None
+    return get_role_address_info(equipment_name, models_class.PlcAddressList, ROLE_MACHINE_STATE, mysql)
 
 
-def get_alarm_address_info(equipment_name) -> Optional[dict[str, Any]]:
+def get_alarm_address_info(equipment_name, mysql: Optional[MySQLDatabase] = None) -> Optional[dict[str, Any]]:
     """获取报警地址信息.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         Optional[dict[str, Any]]: 返回 获取报警地址信息.
     """
-    mysql = get_mysql_secs()
-    address_info_list = mysql.query_data(models_class.PlcAddressList, {"description": "出现报警时报警 id"})
+    return get_role_address_info(equipment_name, models_class.PlcAddressList, ROLE_ALARM_ID, mysql)
+
+
+def get_role_address_info(
+        equipment_name, model_class, role: str, mysql: Optional[MySQLDatabase] = None
+) -> Optional[dict[str, Any]]:
+    """根据地址角色获取地址信息, role 列有索引; 没有地址填写这个角色时按原来的描述信息查找.
+
+    Args:
+        equipment_name: 设备名称.
+        model_class: 地址表模型, PlcAddressList 或 MesAddressList.
+        role: 地址角色.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
+    Returns:
+        Optional[dict[str, Any]]: 返回地址信息, 没有这个角色的地址返回 None.
+    """
+    mysql = mysql if mysql else get_mysql_secs()
+    address_info_list = mysql.query_data(model_class, {"role": role})
+    if not address_info_list and (description := ROLE_DESCRIPTIONS.get(role)):
+        address_info_list = mysql.query_data(model_class, {"description": description})
     if address_info_list:
-        address_info = address_info_list[0]
-        return get_address_info(equipment_name, address_info)
+        return get_address_info(equipment_name, address_info_list[0])
     return None
 
 
-def get_signal_address_list() -> list[dict]:
+def get_signal_address_list(mysql: Optional[MySQLDatabase] = None) -> list[dict]:
     """获取所有的信号地址.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         list[dict]: 返回所有的信号地址.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     address_info_list = mysql.query_data(models_class.SignalAddressList)
     return address_info_list
 
 
-def get_signal_address_info(equipment_name, address: str) -> Optional[dict[str, Any]]:
+def get_signal_address_info(
+        equipment_name, address: str, mysql: Optional[MySQLDatabase] = None
+) -> Optional[dict[str, Any]]:
     """获取信号地址信息.
 
     Args:
         equipment_name: 设备名称.
         address: 地址.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
 
     Returns:
         Optional[dict[str, Any]]: 返回信号地址信息.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     address_info_list = mysql.query_data(models_class.SignalAddressList, {"address": address})
     if address_info_list:
         address_info = address_info_list[0]
@@ -119,16 +149,17 @@ def get_signal_address_info(equipment_name, address: str) -> Optional[dict[str,
     return None
 
 
-def get_signal_callbacks(address: str) -> list:
+def get_signal_callbacks(address: str, mysql: Optional[MySQLDatabase] = None) -> list:
     """获取信号的流程信息.
 
     Args:
         address: 信号地址.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
 
     Returns:
         list: 返回排序后的 call back 列表.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     models_class_flow_func = models_class.FlowFunc
     filter_dict = {"associate_signal": address}
     callbacks_plc = mysql.query_data(models_class.PlcAddressList, filter_dict)
@@ -139,6 +170,24 @@ def get_signal_callbacks(address: str) -> list:
     return callbacks_return
 
 
+def get_sv_address_infos(equipment_name, mysql: Optional[MySQLDatabase] = None) -> dict[int, dict[str, Any]]:
+    """获取关联 sv 或 dv 的单个读取地址, 用于 trace 采样.
+
+    Args:
+        equipment_name: 设备名称.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
+    Returns:
+        dict[int, dict[str, Any]]: sv 或 dv id 和地址信息, 一个 id 关联多个地址时使用第一个.
+    """
+    mysql = mysql if mysql else get_mysql_secs()
+    address_infos = {}
+    for address_info in mysql.query_data(models_class.PlcAddressList, {"operation_type": "read"}):
+        if address_info.get("associate_sv_or_dv") and address_info.get("count_num", 1) in (None, 1):
+            address_infos.setdefault(int(address_info["associate_sv_or_dv"]), get_address_info(equipment_name, address_info))
+    return address_infos
+
+
 def get_address_info(equipment_name, address_info) -> dict[str, Any]:
     """根据数据库查询的地址信息获取整理后的地址信息.
 
@@ -0,0 +1,238 @@
+# pylint: skip-file
+"""Plc 读写通道."""
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Union
+
+from inovance_tag.tag_communication import TagCommunication
+from mitsubishi_plc.mitsubishi_plc import MitsubishiPlc
+from modbus_api.modbus_api import ModbusApi
+from siemens_plc.exception import PLCReadError, PLCWriteError
+from siemens_plc.s7_plc import S7PLC
+
+from passive_equipment import metrics
+
+PRIORITY_HANDSHAKE = 0  # 心跳, 清除信号等交互写入
+PRIORITY_FLOW = 1  # 流程步骤的读写
+PRIORITY_POLL = 2  # 后台轮询
+
+
+class PlcIoLane:
+    """放在 plc 连接前面的唯一读写通道.
+
+    snap7, modbus_tk 等驱动不能多线程同时使用一个连接, 所以所有线程的读写都放进一个优先级队列, 由一个线程按顺序执行.
+    还在队列里没执行的相同读取会合并成一次, 交互写入优先于后台轮询执行.
+    合并时如果新的读取优先级更高, 队列里的读取会按新的优先级再放进队列一次, 先执行的那次给所有调用方返回结果.
+    除 execute_read 和 execute_write 外, 驱动的其他方法也会通过该通道执行, 属性直接读取驱动的属性.
+    """
+
+    def __init__(self, plc: Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi]):
+        """PlcIoLane 构造函数.
+
+        Args:
+            plc: plc 实例对象.
+        """
+        self.driver = plc
+        self.request_count = 0  # 实际执行的请求数量
+        self.coalesced_count = 0  # 被合并的读取数量
+        self.promoted_count = 0  # 合并时提高优先级的读取数量
+        self.wait_time = {
+            PRIORITY_HANDSHAKE: metrics.RollingStats(), PRIORITY_FLOW: metrics.RollingStats(),
+            PRIORITY_POLL: metrics.RollingStats()
+        }  # 各优先级请求从提交到返回的时间, 单位秒
+        self.service_time = metrics.RollingStats()  # 驱动执行请求的时间, 单位秒
+
+        self._queue = queue.PriorityQueue()
+        self._pending_reads: dict[tuple, tuple[Future, int]] = {}  # 未执行的读取和它在队列里的最高优先级
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._start_time = time.monotonic()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def __getattr__(self, item: str) -> Any:
+        """其他属性读取驱动的属性, 方法通过读写通道执行."""
+        attribute = getattr(self.driver, item)
+        if callable(attribute):
+            return lambda *args, **kwargs: self.call(attribute, *args, **kwargs)
+        return attribute
+
+    def execute_read(self, priority: int = PRIORITY_FLOW, **address_info) -> Any:
+        """读取 plc 地址值, 和队列里未执行的相同读取合并, 合并后按两者中较高的优先级执行.
+
+        Args:
+            priority: 优先级, 数值越小越先执行.
+            **address_info: 驱动 execute_read 的参数.
+
+        Returns:
+            Any: 读取的值.
+        """
+        read_key = tuple(sorted((key, value) for key, value in address_info.items() if key != "save_log"))
+        submit_time = time.monotonic()
+        with self._lock:
+            if pending := self._pending_reads.get(read_key):
+                future, pending_priority = pending
+                self.coalesced_count += 1
+                enqueue = priority < pending_priority  # 不能排在合并进去的低优先级读取后面, 按新的优先级再放一次
+                self.promoted_count += enqueue
+            else:
+                future, enqueue = Future(), True
+            if enqueue:
+                self._pending_reads[read_key] = (future, priority)
+                self._queue.put((priority, next(self._sequence), self.driver.execute_read, address_info, future, read_key))
+        try:
+            return future.result()
+        finally:
+            self.wait_time[priority].record(time.monotonic() - submit_time)
+
+    def execute_write(self, priority: int = PRIORITY_FLOW, **address_info) -> Any:
+        """向 plc 地址写入值.
+
+        Args:
+            priority: 优先级, 数值越小越先执行.
+            **address_info: 驱动 execute_write 的参数.
+
+        Returns:
+            Any: 驱动 execute_write 的返回值.
+        """
+        return self.call(self.driver.execute_write, priority=priority, **address_info)
+
+    def communication_open(self) -> bool:
+        """连接 plc, 以交互优先级执行.
+
+        Returns:
+            bool: 连接成功返回 True.
+        """
+        return self.call(self.driver.communication_open, priority=PRIORITY_HANDSHAKE)
+
+    def db_read(self, db_num: int, start: int, size: int, priority: int = PRIORITY_FLOW) -> bytearray:
+        """读取西门子 plc db 块的一段原始字节, 用于一次读取多个地址.
+
+        Args:
+            db_num: db num.
+            start: 起始字节.
+            size: 字节长度.
+            priority: 优先级, 数值越小越先执行.
+
+        Returns:
+            bytearray: 读取的字节.
+
+        Raises:
+            PLCReadError: 读取失败.
+        """
+        return self.call(self._db_read, db_num, start, size, priority=priority)
+
+    def db_write(self, db_num: int, start: int, data: Union[bytes, bytearray], priority: int = PRIORITY_FLOW) -> int:
+        """向西门子 plc db 块写入一段原始字节, 用于一次写入多个地址.
+
+        Args:
+            db_num: db num.
+            start: 起始字节.
+            data: 要写入的字节.
+            priority: 优先级, 数值越小越先执行.
+
+        Returns:
+            int: 驱动 db_write 的返回值.
+
+        Raises:
+            PLCWriteError: 写入失败.
+        """
+        return self.call(self._db_write, db_num, start, bytearray(data), priority=priority)
+
+    def call(self, func: Callable, *args, priority: int = PRIORITY_FLOW, **kwargs) -> Any:
+        """通过读写通道执行驱动的方法.
+
+        Args:
+            func: 驱动的方法.
+            *args: 位置参数.
+            priority: 优先级, 数值越小越先执行.
+            **kwargs: 关键字参数.
+
+        Returns:
+            Any: 方法的返回值.
+        """
+        submit_time = time.monotonic()
+        future = Future()
+        self._queue.put((priority, next(self._sequence), lambda **_: func(*args, **kwargs), {}, future, None))
+        try:
+            return future.result()
+        finally:
+            self.wait_time[priority].record(time.monotonic() - submit_time)
+
+    def get_state(self) -> dict:
+        """获取读写通道的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "request_count": self.request_count, "coalesced_count": self.coalesced_count,
+            "promoted_count": self.promoted_count,
+            "queue_size": self._queue.qsize(),
+            "throughput": round(self.request_count / (time.monotonic() - self._start_time), 2),
+            "service_time": self.service_time.get_state(),
+            "wait_time": {
+                "handshake": self.wait_time[PRIORITY_HANDSHAKE].get_state(),
+                "flow": self.wait_time[PRIORITY_FLOW].get_state(),
+                "poll": self.wait_time[PRIORITY_POLL].get_state()
+            }
+        }
+
+    def _run(self):
+        """按优先级顺序执行请求的线程."""
+        while True:
+            _, __, func, kwargs, future, read_key = self._queue.get()
+            if future.done():  # 提高优先级的读取已经执行过, 跳过原来低优先级的那次
+                continue
+            if read_key is not None:
+                with self._lock:  # 开始执行后再来的相同读取不再合并, 保证读到的是提交之后的值
+                    self._pending_reads.pop(read_key, None)
+            start_time = time.monotonic()
+            try:
+                future.set_result(func(**kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            self.service_time.record(time.monotonic() - start_time)
+            self.request_count += 1
+
+    def _db_read(self, db_num: int, start: int, size: int) -> bytearray:
+        """在读写通道线程里读取 db 块的原始字节.
+
+        Args:
+            db_num: db num.
+            start: 起始字节.
+            size: 字节长度.
+
+        Returns:
+            bytearray: 读取的字节.
+
+        Raises:
+            PLCReadError: 读取失败.
+        """
+        with self.driver.plc_lock:
+            response_data = self.driver._s7_client.db_read(db_num, start, size)
+        if not response_data or len(response_data) < size:
+            raise PLCReadError(f"PLC: Read db{db_num}.{start} size {size} error")
+        return response_data
+
+    def _db_write(self, db_num: int, start: int, data: bytearray) -> int:
+        """在读写通道线程里向 db 块写入原始字节.
+
+        Args:
+            db_num: db num.
+            start: 起始字节.
+            data: 要写入的字节.
+
+        Returns:
+            int: 驱动 db_write 的返回值.
+
+        Raises:
+            PLCWriteError: 写入失败.
+        """
+        with self.driver.plc_lock:
+            try:
+                return self.driver._s7_client.db_write(db_num, start, data)
+            except RuntimeError as e:
+                raise PLCWriteError(f"PLC: Write db{db_num}.{start} size {len(data)} error") from e
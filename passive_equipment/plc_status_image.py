@@ -0,0 +1,227 @@
+# pylint: skip-file
+"""S7 plc 状态映像."""
+import threading
+import time
+from typing import Any, Optional
+
+from siemens_plc.exception import PLCReadError
+from snap7 import util
+
+from passive_equipment import metrics
+from passive_equipment.plc_io_lane import PlcIoLane, PRIORITY_POLL
+
+NUMERIC_GETTERS = {
+    "int": (2, util.get_int), "dint": (4, util.get_dint), "real": (4, util.get_real), "lreal": (8, util.get_lreal)
+}
+NUMERIC_SETTERS = {"int": util.set_int, "dint": util.set_dint, "real": util.set_real, "lreal": util.set_lreal}
+
+
+class S7StatusImage:
+    """类似 plc 过程映像, 每个扫描周期把所有监控地址所在的字节区间读进内存, 监控线程从映像里取值.
+
+    注册的地址按 db 和起始地址排序, 相邻区间间隔不超过 merge_gap 且合并后不超过 max_block_bytes 的合并成一个读取块,
+    每个周期只需要读取几个块, 而不是每个地址读取一次.
+    映像超过 cycle_time 没有刷新时, 第一个读取的线程负责刷新, 同一周期的其他线程直接使用刷新后的映像.
+    """
+
+    def __init__(self, lane: PlcIoLane, cycle_time: float = 0.5, max_block_bytes: int = 200, merge_gap: int = 32):
+        """S7StatusImage 构造函数.
+
+        Args:
+            lane: plc 读写通道, 驱动必须是 S7PLC.
+            cycle_time: 扫描周期, 单位秒.
+            max_block_bytes: 一个读取块的最大字节数, 不超过一个 PDU 能携带的数据长度.
+            merge_gap: 两个区间之间最多相隔多少字节时合并读取.
+        """
+        self.lane = lane
+        self.cycle_time = cycle_time
+        self.max_block_bytes = max_block_bytes
+        self.merge_gap = merge_gap
+        self.cycle_count = 0  # 刷新映像的次数
+        self.block_read_count = 0  # 读取块的总次数
+        self.refresh_time = metrics.RollingStats()  # 刷新一次映像的时间, 单位秒
+
+        self._spans: set[tuple[int, int, int]] = set()  # (db_num, 起始字节, 结束字节)
+        self._blocks: list[tuple[int, int, int]] = []  # (db_num, 起始字节, 字节长度)
+        self._block_data: dict[tuple[int, int, int], bytearray] = {}
+        self._refresh_deadline = 0.0
+        self._lock = threading.Lock()
+
+    def read(self, address_info: dict[str, Any], priority: int = PRIORITY_POLL) -> Any:
+        """从映像读取地址值, 不能放进映像的地址直接通过读写通道读取.
+
+        Args:
+            address_info: 地址信息.
+            priority: 刷新映像或直接读取时的优先级.
+
+        Returns:
+            Any: 读取的值.
+        """
+        if (span := self.get_span(address_info)) is None:
+            return self.lane.execute_read(**address_info, save_log=False, priority=priority)
+        with self._lock:
+            if span not in self._spans:
+                self._spans.add(span)
+                self._plan_blocks()
+            if time.monotonic() >= self._refresh_deadline:
+                self._refresh(priority)
+            data, offset = self._locate(span)
+        return self.decode(address_info, data, offset)
+
+    def read_many(self, address_infos: list[dict[str, Any]], priority: int = PRIORITY_POLL) -> list[Any]:
+        """立刻刷新映像后读取多个地址, 用于写入后的批量回读.
+
+        Args:
+            address_infos: 地址信息列表.
+            priority: 刷新映像或直接读取时的优先级.
+
+        Returns:
+            list[Any]: 读取的值, 顺序和 address_infos 一致.
+        """
+        spans = [self.get_span(address_info) for address_info in address_infos]
+        with self._lock:
+            if new_spans := {span for span in spans if span is not None} - self._spans:
+                self._spans |= new_spans
+                self._plan_blocks()
+            self._refresh(priority)
+            locations = [self._locate(span) if span else None for span in spans]
+        return [
+            self.decode(address_info, *location) if location
+            else self.lane.execute_read(**address_info, save_log=False, priority=priority)
+            for address_info, location in zip(address_infos, locations)
+        ]
+
+    def invalidate(self):
+        """写入 plc 或重新连接后调用, 下一次读取会重新刷新映像."""
+        self._refresh_deadline = 0.0
+
+    def get_state(self) -> dict:
+        """获取状态映像的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "address_count": len(self._spans), "block_count": len(self._blocks),
+            "blocks": [{"db_num": db_num, "start": start, "size": size} for db_num, start, size in self._blocks],
+            "cycle_count": self.cycle_count, "block_read_count": self.block_read_count,
+            "refresh_time": self.refresh_time.get_state()
+        }
+
+    @staticmethod
+    def get_span(address_info: dict[str, Any]) -> Optional[tuple[int, int, int]]:
+        """计算地址占用的字节区间.
+
+        Args:
+            address_info: 地址信息.
+
+        Returns:
+            Optional[tuple[int, int, int]]: (db_num, 起始字节, 结束字节), 不能放进映像的地址返回 None.
+        """
+        data_type = address_info["data_type"]
+        if address_info.get("swap_bytes"):
+            return None
+        start = int(address_info["address"])
+        size = int(address_info.get("size", 1))
+        if data_type in NUMERIC_GETTERS:
+            size = NUMERIC_GETTERS[data_type][0]
+        elif data_type in ("str", "string"):
+            size += 2
+        elif data_type not in ("bool", "char"):
+            return None
+        return int(address_info["db_num"]), start, start + size
+
+    @staticmethod
+    def decode(address_info: dict[str, Any], data: bytearray, offset: int) -> Any:
+        """按数据类型解析映像里的值, 结果和 S7PLC.execute_read 一致.
+
+        Args:
+            address_info: 地址信息.
+            data: 读取块的数据.
+            offset: 地址在块里的偏移.
+
+        Returns:
+            Any: 解析后的值.
+        """
+        data_type = address_info["data_type"]
+        if data_type in NUMERIC_GETTERS:
+            return NUMERIC_GETTERS[data_type][1](data, offset)
+        if data_type == "bool":
+            return util.get_bool(data, offset, int(address_info.get("bit_index", 0)))
+        size = int(address_info.get("size", 1))
+        if data_type == "char":
+            return bytes(data[offset:offset + size]).strip().replace(b"\x00", b"").decode(encoding="ascii")
+        response_data = bytes(data[offset:offset + 2 + size]).strip()  # 和 S7PLC.read_str_data 一样先去掉两端空白
+        data_len = response_data[1]
+        return response_data[2:2 + data_len].decode(encoding="ascii")
+
+    @staticmethod
+    def encode(address_info: dict[str, Any], value: Any, data: bytearray, offset: int):
+        """把值编码进字节区间, 结果和 S7PLC.execute_write 写入的字节一致, bool 只修改对应的 bit.
+
+        Args:
+            address_info: 地址信息, 必须是 get_span 能处理的地址.
+            value: 要写入的值.
+            data: 字节区间.
+            offset: 地址在区间里的偏移.
+        """
+        data_type = address_info["data_type"]
+        if data_type in NUMERIC_SETTERS:
+            NUMERIC_SETTERS[data_type](data, offset, value)
+            return
+        if data_type == "bool":
+            util.set_bool(data, offset, int(address_info.get("bit_index", 0)), bool(value))
+            return
+        size = int(address_info.get("size", 1))
+        payload = str(value).encode(encoding="ascii")[:size].ljust(size, b"\x00")
+        if data_type == "char":
+            data[offset:offset + size] = payload
+            return
+        data[offset:offset + 2 + size] = bytes((size, min(len(str(value).encode(encoding="ascii")), size))) + payload
+
+    def _refresh(self, priority: int):
+        """按读取块刷新映像, 刷新开始时就计算下一次刷新时间, 保证映像不早于周期开始.
+
+        Args:
+            priority: 读取优先级.
+        """
+        start_time = time.monotonic()
+        self._refresh_deadline = 0.0
+        block_data = {}
+        for block in self._blocks:
+            block_data[block] = self.lane.db_read(*block, priority=priority)
+            self.block_read_count += 1
+        self._block_data = block_data
+        self._refresh_deadline = start_time + self.cycle_time
+        self.cycle_count += 1
+        self.refresh_time.record(time.monotonic() - start_time)
+
+    def _plan_blocks(self):
+        """把注册的区间合并成读取块."""
+        blocks = []
+        for db_num, start, end in sorted(self._spans):
+            if blocks:
+                block_db_num, block_start, block_end = blocks[-1]
+                if (block_db_num == db_num and start - block_end <= self.merge_gap
+                        and max(end, block_end) - block_start <= self.max_block_bytes):
+                    blocks[-1] = (db_num, block_start, max(end, block_end))
+                    continue
+            blocks.append((db_num, start, end))
+        self._blocks = [(db_num, start, end - start) for db_num, start, end in blocks]
+        self._refresh_deadline = 0.0
+
+    def _locate(self, span: tuple[int, int, int]) -> tuple[bytearray, int]:
+        """找到包含区间的读取块.
+
+        Args:
+            span: (db_num, 起始字节, 结束字节).
+
+        Returns:
+            tuple[bytearray, int]: 读取块的数据和区间在块里的偏移.
+        """
+        db_num, start, end = span
+        for block in self._blocks:
+            block_db_num, block_start, block_size = block
+            if block_db_num == db_num and block_start <= start and end <= block_start + block_size:
+                return self._block_data[block], start - block_start
+        raise PLCReadError(f"PLC: Address db{db_num}.{start} is not in status image")
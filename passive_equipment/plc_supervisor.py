@@ -0,0 +1,159 @@
+# pylint: skip-file
+"""Plc 连接监督者."""
+import logging
+import threading
+import time
+from typing import Callable, Optional, Union
+
+from inovance_tag.tag_communication import TagCommunication
+from mitsubishi_plc.mitsubishi_plc import MitsubishiPlc
+from modbus_api.modbus_api import ModbusApi
+from siemens_plc.s7_plc import S7PLC
+
+from passive_equipment import metrics
+from passive_equipment.backoff import ExponentialBackoff
+
+
+class PlcSupervisor:
+    """一个 plc 连接只有一个监督者, 由它维护连接状态并负责断线重连.
+
+    工作线程读写 plc 前调用 wait_connected 等待连接可用, 读写失败时调用 report_failure.
+    监督者收到失败后立刻重连一次, 成功则视为偶发错误; 失败才发布断线, 然后按指数退避重连, 连上后发布恢复.
+    断线和恢复各只发布一次.
+    """
+
+    def __init__(self, plc: Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi], logger: logging.Logger = None):
+        """PlcSupervisor 构造函数.
+
+        Args:
+            plc: plc 实例对象.
+            logger: 日志器, 默认使用本模块的日志器.
+        """
+        self.plc = plc
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.link_state: Optional[bool] = None  # 最近一次发布的连接状态, None 代表还未连接过
+        self.link_down_count = 0  # 发布断线的次数
+        self.io_error_count = 0  # 立刻重连成功的偶发读写错误次数
+        self.recovery_time = metrics.RollingStats()  # 从第一次失败到恢复连接的时间, 单位秒
+
+        self._backoff = ExponentialBackoff(base=1, cap=30)
+        self._listeners: list[Callable[[bool], None]] = []
+        self._connected_event = threading.Event()
+        self._failure_event = threading.Event()
+        self._failure_time = time.monotonic()
+        self._thread = None
+
+    @property
+    def connected(self) -> bool:
+        """当前连接是否可用."""
+        return self._connected_event.is_set()
+
+    def add_listener(self, callback: Callable[[bool], None]):
+        """添加连接状态变化的回调, 断线时传入 False, 恢复时传入 True.
+
+        Args:
+            callback: 回调函数.
+        """
+        self._listeners.append(callback)
+
+    def start(self):
+        """启动监督线程, 首次连接也在监督线程里完成."""
+        if self._thread is None:
+            self._failure_event.set()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        """等待连接可用.
+
+        Args:
+            timeout: 超时时间, 默认一直等待.
+
+        Returns:
+            bool: 连接可用返回 True, 超时返回 False.
+        """
+        return self._connected_event.wait(timeout)
+
+    def report_failure(self, error: Exception):
+        """工作线程读写 plc 失败时调用, 多个线程同时上报只会触发一次重连.
+
+        Args:
+            error: 读写 plc 时的异常.
+        """
+        if not self._connected_event.is_set():
+            return
+        self._connected_event.clear()
+        self._failure_time = time.monotonic()
+        self.logger.warning("Plc 读写失败, 开始检查连接: %s", str(error))
+        self._failure_event.set()
+
+    def get_state(self) -> dict:
+        """获取连接统计信息.
+
+        Returns:
+            dict: 连接统计信息.
+        """
+        return {
+            "connected": self.connected, "link_down_count": self.link_down_count,
+            "io_error_count": self.io_error_count, "recovery_time": self.recovery_time.get_state()
+        }
+
+    def _run(self):
+        """监督线程."""
+        while True:
+            self._failure_event.wait()
+            self._failure_event.clear()
+            if self._reconnect():
+                if self.link_state:
+                    self.io_error_count += 1
+                    self.logger.info("Plc 重新连接成功, 本次为偶发读写错误.")
+                self._set_connected()
+                continue
+
+            self._publish(False)
+            while not self._reconnect():
+                reconnect_delay = self._backoff.next_delay()
+                self.logger.warning("Plc 重新连接失败, 等待 %.1f 秒后尝试重新连接.", reconnect_delay)
+                time.sleep(reconnect_delay)
+            self.recovery_time.record(time.monotonic() - self._failure_time)
+            self._set_connected()
+
+    def _reconnect(self) -> bool:
+        """关闭旧连接后重新连接.
+
+        Returns:
+            bool: 连接成功返回 True.
+        """
+        try:
+            if self.link_state is not None:
+                close_func = getattr(self.plc, "communication_close", None) or getattr(self.plc, "disconnect", None)
+                if close_func:
+                    close_func()
+            return bool(self.plc.communication_open())
+        except Exception as e:
+            self.logger.warning("Plc 连接出现异常: %s", str(e))
+            return False
+
+    def _set_connected(self):
+        """连接恢复, 通知等待的工作线程."""
+        self._backoff.reset()
+        self._publish(True)
+        self._connected_event.set()
+
+    def _publish(self, link_state: bool):
+        """连接状态变化时通知所有回调, 同一个状态只发布一次.
+
+        Args:
+            link_state: 连接状态.
+        """
+        if link_state == self.link_state:
+            return
+        if not link_state:
+            self.link_down_count += 1
+        self.link_state = link_state
+        self.logger.info("Plc 连接状态变化: %s, ip: %s", "已连接" if link_state else "已断开", self.plc.ip)
+        for callback in self._listeners:
+            try:
+                callback(link_state)
+            except Exception as e:
+                self.logger.warning("Plc 连接状态回调出现异常: %s", str(e))
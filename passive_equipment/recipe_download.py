@@ -0,0 +1,209 @@
+# pylint: skip-file
+"""配方参数下载."""
+import logging
+import time
+from typing import Any, Optional
+
+from siemens_plc.s7_plc import S7PLC
+
+from passive_equipment.plc_io_lane import PlcIoLane, PRIORITY_FLOW
+from passive_equipment.plc_status_image import S7StatusImage
+from passive_equipment.write_verifier import WriteRequest, WriteVerifier
+
+
+class RecipeParameter:
+    """一个要下载的配方参数."""
+
+    def __init__(self, address_info: dict[str, Any], value: Any, description: str = ""):
+        """RecipeParameter 构造函数.
+
+        Args:
+            address_info: 地址信息.
+            value: 配方里的值.
+            description: 参数描述信息, 用于日志.
+        """
+        self.address_info = address_info
+        self.value = value
+        self.description = description
+        self.span = None  # 西门子 plc 地址占用的 (db_num, 起始字节, 结束字节)
+        self.changed = False  # plc 当前值和配方值不同
+
+
+class RecipeDownloadResult:
+    """一次配方下载的结果."""
+
+    def __init__(self, parameter_count: int):
+        """RecipeDownloadResult 构造函数.
+
+        Args:
+            parameter_count: 配方参数数量.
+        """
+        self.parameter_count = parameter_count
+        self.changed_count = 0  # 和 plc 当前值不同的参数数量
+        self.read_count = 0  # 读取 plc 的次数
+        self.write_count = 0  # 写入 plc 的次数
+        self.fallback_count = 0  # 块写入后校验失败, 改为逐个写入的参数数量
+        self.failed: list[dict] = []  # 最终写入失败的参数
+        self.elapsed = 0.0  # 下载耗时, 单位秒
+
+    @property
+    def success(self) -> bool:
+        """所有参数都和配方一致."""
+        return not self.failed
+
+    def to_dict(self) -> dict:
+        """转换成字典, 用于日志和 socket 返回.
+
+        Returns:
+            dict: 下载结果.
+        """
+        return {
+            "success": self.success, "parameter_count": self.parameter_count, "changed_count": self.changed_count,
+            "read_count": self.read_count, "write_count": self.write_count, "fallback_count": self.fallback_count,
+            "elapsed": round(self.elapsed, 4), "failed": self.failed
+        }
+
+
+class RecipeDownloader:
+    """把配方参数下载到 plc, 只写入和 plc 当前值不同的参数.
+
+    西门子 plc 的参数按 db 和起始地址排序, 首尾相接的参数合并成一个区间, 每个区间读取一次当前值,
+    有变化的区间从第一个变化的参数到最后一个变化的参数整段写入一次, 然后整段回读一次校验.
+    区间之间的字节不属于配方, 不会被写入. 校验失败的参数和其他 plc 的参数通过 WriteVerifier 逐个写入校验.
+    """
+
+    def __init__(self, lane: PlcIoLane, write_verifier: WriteVerifier, logger: logging.Logger = None, max_block_bytes: int = 200):
+        """RecipeDownloader 构造函数.
+
+        Args:
+            lane: plc 读写通道.
+            write_verifier: 逐个写入时使用的写入校验.
+            logger: 日志器, 默认使用本模块的日志器.
+            max_block_bytes: 一次读写的最大字节数, 不超过一个 PDU 能携带的数据长度.
+        """
+        self.lane = lane
+        self.write_verifier = write_verifier
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.max_block_bytes = max_block_bytes
+
+    def download(self, parameters: list[RecipeParameter], priority: int = PRIORITY_FLOW) -> RecipeDownloadResult:
+        """下载配方参数.
+
+        Args:
+            parameters: 配方参数列表.
+            priority: 读写优先级.
+
+        Returns:
+            RecipeDownloadResult: 下载结果.
+        """
+        start_time = time.monotonic()
+        result = RecipeDownloadResult(len(parameters))
+        block_parameters, single_parameters = [], []
+        is_s7 = isinstance(self.lane.driver, S7PLC)
+        for parameter in parameters:
+            parameter.span = S7StatusImage.get_span(parameter.address_info) if is_s7 else None
+            (block_parameters if parameter.span else single_parameters).append(parameter)
+        fallback_parameters = self._download_blocks(block_parameters, result, priority)
+        result.fallback_count = len(fallback_parameters)
+        self._download_single(single_parameters, fallback_parameters, result, priority)
+        result.elapsed = time.monotonic() - start_time
+        return result
+
+    def _download_blocks(self, parameters: list[RecipeParameter], result: RecipeDownloadResult, priority: int) -> list[RecipeParameter]:
+        """按区间下载西门子 plc 的参数.
+
+        Args:
+            parameters: 配方参数.
+            result: 下载结果.
+            priority: 读写优先级.
+
+        Returns:
+            list[RecipeParameter]: 块写入失败或者校验失败, 需要逐个写入的参数.
+        """
+        fallback_parameters, written_blocks = [], []
+        for db_num, block_start, block_parameters in self._plan_blocks(parameters):
+            block_end = max(parameter.span[2] for parameter in block_parameters)
+            data = self.lane.db_read(db_num, block_start, block_end - block_start, priority=priority)
+            result.read_count += 1
+            changed_parameters = []
+            for parameter in block_parameters:
+                plc_value = S7StatusImage.decode(parameter.address_info, data, parameter.span[1] - block_start)
+                if not WriteVerifier.is_equal(plc_value, parameter.value):
+                    parameter.changed = True
+                    changed_parameters.append(parameter)
+            if not changed_parameters:
+                continue
+            result.changed_count += len(changed_parameters)
+            write_start = min(parameter.span[1] for parameter in changed_parameters)
+            write_end = max(parameter.span[2] for parameter in changed_parameters)
+            write_data = bytearray(data[write_start - block_start:write_end - block_start])
+            for parameter in block_parameters:
+                if write_start <= parameter.span[1] and parameter.span[2] <= write_end:
+                    S7StatusImage.encode(parameter.address_info, parameter.value, write_data, parameter.span[1] - write_start)
+            try:
+                self.lane.db_write(db_num, write_start, write_data, priority=priority)
+                result.write_count += 1
+                written_blocks.append((db_num, write_start, write_end, changed_parameters))
+            except Exception as e:
+                self.logger.warning("写入 db%s.%s 长度 %s 失败: %s", db_num, write_start, len(write_data), e)
+                fallback_parameters.extend(changed_parameters)
+        for db_num, write_start, write_end, changed_parameters in written_blocks:
+            data = self.lane.db_read(db_num, write_start, write_end - write_start, priority=priority)
+            result.read_count += 1
+            for parameter in changed_parameters:
+                plc_value = S7StatusImage.decode(parameter.address_info, data, parameter.span[1] - write_start)
+                if not WriteVerifier.is_equal(plc_value, parameter.value):
+                    fallback_parameters.append(parameter)
+        return fallback_parameters
+
+    def _download_single(
+            self, parameters: list[RecipeParameter], changed_parameters: list[RecipeParameter],
+            result: RecipeDownloadResult, priority: int
+    ):
+        """逐个读取比较后写入参数, 写入后批量校验.
+
+        Args:
+            parameters: 需要先读取比较的参数.
+            changed_parameters: 已经确定要写入的参数.
+            result: 下载结果.
+            priority: 读写优先级.
+        """
+        for parameter in parameters:
+            plc_value = self.lane.execute_read(**parameter.address_info, save_log=False, priority=priority)
+            result.read_count += 1
+            if not WriteVerifier.is_equal(plc_value, parameter.value):
+                parameter.changed = True
+                result.changed_count += 1
+                changed_parameters = changed_parameters + [parameter]
+        if not changed_parameters:
+            return
+        requests = [
+            WriteRequest(parameter.address_info, parameter.value, description=parameter.description)
+            for parameter in changed_parameters
+        ]
+        for write_result in self.write_verifier.write(requests, priority):
+            result.write_count += write_result.attempts
+            if not write_result.success:
+                result.failed.append(write_result.to_dict())
+
+    def _plan_blocks(self, parameters: list[RecipeParameter]) -> list[tuple[int, int, list[RecipeParameter]]]:
+        """把首尾相接的参数合并成区间.
+
+        Args:
+            parameters: 西门子 plc 的配方参数.
+
+        Returns:
+            list[tuple[int, int, list[RecipeParameter]]]: (db_num, 起始字节, 区间里的参数).
+        """
+        blocks: list[tuple[int, int, list[RecipeParameter]]] = []
+        block_end: Optional[int] = None
+        for parameter in sorted(parameters, key=lambda _: _.span):
+            db_num, start, end = parameter.span
+            if (blocks and blocks[-1][0] == db_num and start <= block_end
+                    and max(end, block_end) - blocks[-1][1] <= self.max_block_bytes):
+                blocks[-1][2].append(parameter)
+                block_end = max(end, block_end)
+                continue
+            blocks.append((db_num, start, [parameter]))
+            block_end = end
+        return blocks
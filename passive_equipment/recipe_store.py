@@ -0,0 +1,222 @@
+# pylint: skip-file
+"""配方 body 的分块存储."""
+import hashlib
+import os
+import pathlib
+import shutil
+import threading
+from typing import Iterable, Iterator, Optional, Union
+
+from passive_equipment import variable_snapshot
+from passive_equipment.exception import EquipmentRuntimeError
+
+
+class RecipeStore:
+    """按内容寻址的配方 body 存储.
+
+    body 按 chunk_size 切成块, 每块以 sha256 命名保存在 ``objects/前两位/哈希`` 下, 内容相同的块只保存一份.
+    一个配方由块哈希列表描述, 列表保存在数据库里, 读写都是一块一块进行, 不需要把整个 body 放进内存.
+    """
+
+    def __init__(self, store_dir: str, chunk_size: int = 256 * 1024, min_free_bytes: int = 512 * 1024 * 1024):
+        """RecipeStore 构造函数.
+
+        Args:
+            store_dir: 配方 body 保存目录.
+            chunk_size: 块大小, 单位字节.
+            min_free_bytes: 保存新 body 后磁盘至少保留的空闲字节数.
+        """
+        self.chunk_size = chunk_size
+        self.min_free_bytes = min_free_bytes
+        self.written_count = 0  # 新写入的块数量
+        self.deduplicated_count = 0  # 已经存在而跳过写入的块数量
+        self.removed_count = 0  # 清理掉的块数量
+
+        self._objects_path = pathlib.Path(store_dir) / "objects"
+        self._objects_path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def has_space(self, length: int) -> bool:
+        """判断磁盘是否还能保存指定长度的 body, 用于 S7F1.
+
+        Args:
+            length: body 字节数.
+
+        Returns:
+            bool: 能保存返回 True.
+        """
+        return shutil.disk_usage(self._objects_path).free - length >= self.min_free_bytes
+
+    def put(self, body: Union[bytes, bytearray, memoryview, Iterable[bytes]]) -> tuple[str, int, list[str]]:
+        """保存 body.
+
+        Args:
+            body: 完整的 body, 或者按顺序产生 body 片段的可迭代对象.
+
+        Returns:
+            tuple[str, int, list[str]]: 整个 body 的 sha256, 字节数和块哈希列表.
+        """
+        body_hash = hashlib.sha256()
+        body_size, chunk_hashes = 0, []
+        for chunk in self._split(body):
+            body_hash.update(chunk)
+            body_size += len(chunk)
+            chunk_hashes.append(self._put_chunk(chunk))
+        return body_hash.hexdigest(), body_size, chunk_hashes
+
+    def iter_chunks(self, chunk_hashes: list[str]) -> Iterator[bytes]:
+        """按顺序读取 body 的每一块, 读取时校验哈希.
+
+        Args:
+            chunk_hashes: 块哈希列表.
+
+        Yields:
+            bytes: 块数据.
+
+        Raises:
+            EquipmentRuntimeError: 块不存在或者内容被破坏.
+        """
+        for chunk_hash in chunk_hashes:
+            try:
+                chunk = self._get_chunk_path(chunk_hash).read_bytes()
+            except FileNotFoundError as e:
+                raise EquipmentRuntimeError(f"配方块 {chunk_hash} 不存在") from e
+            if hashlib.sha256(chunk).hexdigest() != chunk_hash:
+                raise EquipmentRuntimeError(f"配方块 {chunk_hash} 内容被破坏")
+            yield chunk
+
+    def encode_item(self, chunk_hashes: list[str], body_size: int, format_code: int, prefix: bytes = b"") -> bytearray:
+        """把 body 编码成 secs item, 按块直接拷贝进预先分配好的缓冲区.
+
+        Args:
+            chunk_hashes: 块哈希列表.
+            body_size: body 字节数.
+            format_code: secs 格式码, ASCII 或 Binary.
+            prefix: 放在 item 前面的已编码数据, 例如回复的列表头和 PPID.
+
+        Returns:
+            bytearray: prefix 加编码后的 item.
+        """
+        header = prefix + variable_snapshot.encode_item_header(format_code, body_size)
+        item = bytearray(len(header) + body_size)
+        item[:len(header)] = header
+        position = len(header)
+        for chunk in self.iter_chunks(chunk_hashes):
+            item[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        if position != len(item):
+            raise EquipmentRuntimeError(f"配方长度不一致, 记录的是 {body_size}, 实际是 {position - len(header)}")
+        return item
+
+    def remove_unreferenced(self, referenced: set[str]) -> int:
+        """删除没有被任何配方引用的块.
+
+        Args:
+            referenced: 所有配方引用的块哈希.
+
+        Returns:
+            int: 删除的块数量.
+        """
+        removed_count = 0
+        with self._lock:
+            for chunk_path in self._objects_path.glob("*/*"):
+                if chunk_path.name not in referenced and not chunk_path.name.endswith(".tmp"):
+                    chunk_path.unlink(missing_ok=True)
+                    removed_count += 1
+        self.removed_count += removed_count
+        return removed_count
+
+    def get_state(self) -> dict:
+        """获取存储的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "written_count": self.written_count, "deduplicated_count": self.deduplicated_count,
+            "removed_count": self.removed_count
+        }
+
+    def _split(self, body: Union[bytes, bytearray, memoryview, Iterable[bytes]]) -> Iterator[memoryview]:
+        """把 body 切成固定大小的块, 完整 body 只切片不拷贝.
+
+        Args:
+            body: 完整的 body 或者 body 片段.
+
+        Yields:
+            memoryview: 块数据.
+        """
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            view = memoryview(body).cast("B")
+            for start in range(0, len(view), self.chunk_size):
+                yield view[start:start + self.chunk_size]
+            return
+        buffer = bytearray()
+        for piece in body:
+            buffer += piece
+            while len(buffer) >= self.chunk_size:
+                yield memoryview(bytes(buffer[:self.chunk_size]))
+                del buffer[:self.chunk_size]
+        if buffer:
+            yield memoryview(bytes(buffer))
+
+    def _put_chunk(self, chunk: memoryview) -> str:
+        """保存一块, 已经存在时跳过.
+
+        Args:
+            chunk: 块数据.
+
+        Returns:
+            str: 块哈希.
+        """
+        chunk_hash = hashlib.sha256(chunk).hexdigest()
+        chunk_path = self._get_chunk_path(chunk_hash)
+        with self._lock:
+            if chunk_path.exists():
+                self.deduplicated_count += 1
+                return chunk_hash
+            chunk_path.parent.mkdir(exist_ok=True)
+            temp_path = chunk_path.with_name(f"{chunk_hash}.tmp")
+            with open(temp_path, "wb") as chunk_file:
+                chunk_file.write(chunk)
+                chunk_file.flush()
+                os.fsync(chunk_file.fileno())
+            os.replace(temp_path, chunk_path)
+            self.written_count += 1
+        return chunk_hash
+
+    def _get_chunk_path(self, chunk_hash: str) -> pathlib.Path:
+        """获取块的保存路径.
+
+        Args:
+            chunk_hash: 块哈希.
+
+        Returns:
+            pathlib.Path: 保存路径.
+        """
+        return self._objects_path / chunk_hash[:2] / chunk_hash
+
+
+def split_pp_message(data: bytes) -> Optional[tuple[str, int, memoryview]]:
+    """直接解析 S7F3 的 L[2] {PPID, PPBODY}, body 不拷贝.
+
+    Args:
+        data: 消息数据.
+
+    Returns:
+        Optional[tuple[str, int, memoryview]]: ppid, body 的格式码和 body, 格式不对返回 None.
+    """
+    try:
+        position, count = variable_snapshot.decode_item_header(data, 0)
+        if data[0] >> 2 != 0 or count != 2 or data[position] >> 2 != variable_snapshot.ASCII_FORMAT:
+            return None
+        start, length = variable_snapshot.decode_item_header(data, position)
+        ppid = bytes(data[start:start + length]).decode("ascii")
+        position = start + length
+        body_format = data[position] >> 2
+        start, length = variable_snapshot.decode_item_header(data, position)
+    except (IndexError, UnicodeDecodeError):
+        return None
+    if body_format not in (variable_snapshot.ASCII_FORMAT, variable_snapshot.BINARY_FORMAT) or start + length != len(data):
+        return None
+    return ppid, body_format, memoryview(data)[start:start + length]
@@ -0,0 +1,346 @@
+# pylint: skip-file
+"""在单独的进程里扫描 plc."""
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional, Union
+
+from inovance_tag.tag_communication import TagCommunication
+from mitsubishi_plc.mitsubishi_plc import MitsubishiPlc
+from modbus_api.modbus_api import ModbusApi
+from siemens_plc.s7_plc import S7PLC
+
+from passive_equipment import metrics
+from passive_equipment.backoff import ExponentialBackoff
+from passive_equipment.plc_io_lane import PlcIoLane, PRIORITY_POLL
+from passive_equipment.plc_status_image import S7StatusImage
+from passive_equipment.shared_value_table import SharedValueTable, STATUS_ERROR, STATUS_OK, STATUS_UNSUPPORTED
+
+COMMAND_ADD = "add"  # 参数是 (槽位, 地址信息)
+COMMAND_STATE = "state"  # 扫描进程把统计信息放进回复队列
+COMMAND_STOP = "stop"
+
+
+class ScanWorker:
+    """扫描进程里的扫描循环, 按截止时间周期读取所有注册的地址, 写入共享变量表.
+
+    扫描进程有自己的 plc 连接和 GIL, 主进程解析 json, 写日志和执行流程时不会推迟扫描.
+    等待下一个周期时阻塞在命令队列上, 新注册的地址在下一个周期就开始扫描.
+    """
+
+    def __init__(
+            self, plc: Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi], table: SharedValueTable,
+            cycle_time: float, command_queue: multiprocessing.Queue, reply_queue: multiprocessing.Queue,
+            logger: logging.Logger = None
+    ):
+        """ScanWorker 构造函数.
+
+        Args:
+            plc: 扫描进程自己的 plc 实例对象.
+            table: 共享变量表.
+            cycle_time: 扫描周期, 单位秒.
+            command_queue: 主进程发来的命令.
+            reply_queue: 回复主进程的队列.
+            logger: 日志器, 默认使用本模块的日志器.
+        """
+        self.lane = PlcIoLane(plc)
+        self.table = table
+        self.cycle_time = cycle_time
+        self.command_queue = command_queue
+        self.reply_queue = reply_queue
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.points: dict[int, dict[str, Any]] = {}  # 槽位对应的地址信息
+        self.cycle_count = 0  # 扫描次数
+        self.error_count = 0  # 读取失败的次数
+        self.unsupported_count = 0  # 值不能写入共享变量表, 由主进程直接读取的次数
+        self.missed_count = 0  # 扫描太慢跳过的周期数
+        self.reconnect_count = 0  # 重新连接 plc 的次数
+        self.lateness = metrics.RollingStats()  # 实际扫描时间晚于截止时间多少, 单位秒
+        self.scan_time = metrics.RollingStats()  # 一次扫描的读取耗时, 单位秒
+
+        self._image = S7StatusImage(self.lane, cycle_time=0) if isinstance(plc, S7PLC) else None
+        self._connected = False
+        self._backoff = ExponentialBackoff(base=1, cap=30)
+        self._retry_deadline = 0.0
+
+    def run(self):
+        """扫描循环, 收到停止命令后返回."""
+        next_deadline = time.monotonic()
+        while self._wait_commands(next_deadline):
+            start_time = time.monotonic()
+            self.lateness.record(start_time - next_deadline)
+            self._scan()
+            self.scan_time.record(time.monotonic() - start_time)
+            self.cycle_count += 1
+            next_deadline += self.cycle_time
+            if (behind := time.monotonic() - next_deadline) > self.cycle_time:
+                missed = int(behind / self.cycle_time)
+                self.missed_count += missed
+                next_deadline += missed * self.cycle_time
+
+    def get_state(self) -> dict:
+        """获取扫描进程的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "connected": self._connected, "address_count": len(self.points), "cycle_count": self.cycle_count,
+            "error_count": self.error_count, "unsupported_count": self.unsupported_count,
+            "missed_count": self.missed_count,
+            "reconnect_count": self.reconnect_count, "lateness": self.lateness.get_state(),
+            "scan_time": self.scan_time.get_state(), "plc_io_lane": self.lane.get_state()
+        }
+
+    def _wait_commands(self, deadline: float) -> bool:
+        """处理命令直到截止时间.
+
+        Args:
+            deadline: 下一次扫描的截止时间.
+
+        Returns:
+            bool: 收到停止命令返回 False.
+        """
+        while True:
+            try:
+                if (wait_time := deadline - time.monotonic()) > 0:
+                    command, argument = self.command_queue.get(timeout=wait_time)
+                else:
+                    command, argument = self.command_queue.get_nowait()
+            except queue.Empty:
+                return True
+            if command == COMMAND_STOP:
+                return False
+            if command == COMMAND_ADD:
+                slot, address_info = argument
+                self.points[slot] = address_info
+            elif command == COMMAND_STATE:
+                self.reply_queue.put(self.get_state())
+
+    def _scan(self):
+        """读取所有注册的地址写入共享变量表, 读取失败时把这些槽位标记为失败, 下一个周期重新连接.
+
+        每个槽位单独写入, 一个值写入失败只把这个槽位标记为失败, 不影响其他槽位和扫描循环.
+        """
+        if not self.points or not self._connect():
+            return
+        slots, address_infos = list(self.points), list(self.points.values())
+        sample_time = time.time()
+        try:
+            if self._image:
+                values = self._image.read_many(address_infos)
+            else:
+                values = [
+                    self.lane.execute_read(**address_info, save_log=False, priority=PRIORITY_POLL)
+                    for address_info in address_infos
+                ]
+        except Exception as e:
+            self.error_count += 1
+            self._connected = False
+            self.logger.warning("扫描进程读取 plc 失败: %s", str(e))
+            for slot in slots:
+                self.table.write(slot, None, STATUS_ERROR, sample_time)
+            return
+        for slot, value in zip(slots, values):
+            try:
+                if self.table.write(slot, value, STATUS_OK, sample_time) == STATUS_UNSUPPORTED:
+                    self.unsupported_count += 1
+            except Exception as e:
+                self.error_count += 1
+                self.logger.warning("扫描进程写入槽位 %s 失败: %s", slot, str(e))
+                self.table.write(slot, None, STATUS_ERROR, sample_time)
+
+    def _connect(self) -> bool:
+        """没有连接时按指数退避连接 plc.
+
+        Returns:
+            bool: 连接可用返回 True.
+        """
+        if self._connected:
+            return True
+        if time.monotonic() < self._retry_deadline:
+            return False
+        try:
+            if self.reconnect_count:
+                close_func = getattr(self.lane.driver, "communication_close", None) or getattr(
+                    self.lane.driver, "disconnect", None
+                )
+                if close_func:
+                    close_func()
+            self.reconnect_count += 1
+            self._connected = bool(self.lane.communication_open())
+        except Exception as e:
+            self.logger.warning("扫描进程连接 plc 出现异常: %s", str(e))
+        if self._connected:
+            self._backoff.reset()
+            if self._image:
+                self._image.invalidate()
+        else:
+            self._retry_deadline = time.monotonic() + self._backoff.next_delay()
+        return self._connected
+
+
+def run_scan_worker(
+        plc_factory: Callable[[], Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi]], table_name: str,
+        slot_count: int, cycle_time: float, command_queue: multiprocessing.Queue, reply_queue: multiprocessing.Queue
+):
+    """扫描进程的入口.
+
+    Args:
+        plc_factory: 创建 plc 实例的函数.
+        table_name: 共享变量表的名称.
+        slot_count: 共享变量表的槽位数量.
+        cycle_time: 扫描周期, 单位秒.
+        command_queue: 主进程发来的命令.
+        reply_queue: 回复主进程的队列.
+    """
+    table = SharedValueTable(slot_count, table_name)
+    try:
+        ScanWorker(plc_factory(), table, cycle_time, command_queue, reply_queue).run()
+    finally:
+        table.close()
+
+
+class ScanProcess:
+    """主进程里的扫描进程客户端, 监控地址的扫描放到单独的进程里.
+
+    第一次读取一个地址时给它分配槽位并通知扫描进程, 之后直接从共享变量表取扫描进程写入的最新值, 不再访问 plc.
+    值还没有写入, 读取失败, 放不进共享变量表, 比 max_age 旧或者早于最近一次 invalidate 时, 通过主进程自己的读写通道直接读取,
+    扫描进程连不上 plc 或者异常退出时监控仍然可以继续.
+    """
+
+    def __init__(
+            self, plc_factory: Callable[[], Union[TagCommunication, S7PLC, MitsubishiPlc, ModbusApi]],
+            lane: PlcIoLane, cycle_time: float = 0.1, slot_count: int = 512, logger: logging.Logger = None
+    ):
+        """ScanProcess 构造函数.
+
+        Args:
+            plc_factory: 在扫描进程里创建 plc 实例的函数, 必须可以被 pickle, 例如 functools.partial(S7PLC, "192.168.0.1").
+            lane: 主进程的 plc 读写通道, 共享变量表里没有可用的值时直接读取.
+            cycle_time: 扫描周期, 单位秒.
+            slot_count: 共享变量表的槽位数量, 超过数量的地址直接读取.
+            logger: 日志器, 默认使用本模块的日志器.
+        """
+        self.plc_factory = plc_factory
+        self.lane = lane
+        self.cycle_time = cycle_time
+        self.slot_count = slot_count
+        self.max_age = 3 * cycle_time + 0.5  # 超过这个时间没有更新的值视为过期, 单位秒
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.table_read_count = 0  # 从共享变量表读取的次数
+        self.fallback_count = 0  # 直接读取 plc 的次数
+
+        self._slots: dict[tuple, int] = {}  # 地址对应的槽位
+        self._valid_after = 0.0  # 早于这个时间采样的值不能使用
+        self._table: Optional[SharedValueTable] = None
+        self._process: Optional[multiprocessing.Process] = None
+        self._command_queue: Optional[multiprocessing.Queue] = None
+        self._reply_queue: Optional[multiprocessing.Queue] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_alive(self) -> bool:
+        """扫描进程是否在运行."""
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        """创建共享变量表并启动扫描进程."""
+        with self._lock:
+            if self._process is not None:
+                return
+            self._table = SharedValueTable(self.slot_count)
+            self._command_queue = multiprocessing.Queue()
+            self._reply_queue = multiprocessing.Queue()
+            self._process = multiprocessing.Process(
+                target=run_scan_worker, name="plc-scan", daemon=True, args=(
+                    self.plc_factory, self._table.name, self.slot_count, self.cycle_time, self._command_queue,
+                    self._reply_queue
+                )
+            )
+            self._process.start()
+        self.logger.info("启动 plc 扫描进程, pid: %s, 扫描周期: %s 秒", self._process.pid, self.cycle_time)
+
+    def stop(self, timeout: float = 5):
+        """停止扫描进程并删除共享变量表.
+
+        Args:
+            timeout: 等待扫描进程退出的时间, 超时后强制结束.
+        """
+        with self._lock:
+            if self._process is None:
+                return
+            self._command_queue.put((COMMAND_STOP, None))
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._table.close()
+            self._process, self._table = None, None
+            self._slots.clear()
+        self.logger.info("停止 plc 扫描进程")
+
+    def read(self, address_info: dict[str, Any], priority: int = PRIORITY_POLL) -> Any:
+        """读取地址的值, 共享变量表里没有可用的值时通过读写通道直接读取.
+
+        Args:
+            address_info: 地址信息.
+            priority: 直接读取时的优先级.
+
+        Returns:
+            Any: 读取的值.
+        """
+        if (slot := self._get_slot(address_info)) is not None and (table := self._table) is not None:
+            value, status, sample_time = table.read(slot)
+            if status == STATUS_OK and self._valid_after <= sample_time and time.time() - sample_time <= self.max_age:
+                self.table_read_count += 1
+                return value
+        self.fallback_count += 1
+        return self.lane.execute_read(**address_info, save_log=False, priority=priority)
+
+    def invalidate(self):
+        """写入 plc 或重新连接后调用, 之前采样的值不再使用, 直到扫描进程写入新的值."""
+        self._valid_after = time.time()
+
+    def get_state(self) -> dict:
+        """获取扫描进程的统计信息.
+
+        Returns:
+            dict: 统计信息, worker 是扫描进程里的统计信息, 扫描进程没有回复时是 None.
+        """
+        state = {
+            "alive": self.is_alive, "address_count": len(self._slots), "table_read_count": self.table_read_count,
+            "fallback_count": self.fallback_count, "table_retry_count": self._table.retry_count if self._table else 0,
+            "worker": None
+        }
+        with self._lock:
+            if self.is_alive:
+                self._command_queue.put((COMMAND_STATE, None))
+                try:
+                    state["worker"] = self._reply_queue.get(timeout=1)
+                except queue.Empty:
+                    self.logger.warning("plc 扫描进程没有回复统计信息")
+        return state
+
+    def _get_slot(self, address_info: dict[str, Any]) -> Optional[int]:
+        """获取地址的槽位, 第一次读取时分配槽位并通知扫描进程.
+
+        Args:
+            address_info: 地址信息.
+
+        Returns:
+            Optional[int]: 槽位, 扫描进程没有启动或者槽位已经用完时返回 None.
+        """
+        if self._table is None:
+            return None
+        key = tuple(sorted(address_info.items()))
+        if (slot := self._slots.get(key)) is not None:
+            return slot
+        with self._lock:
+            if self._table is None or len(self._slots) >= self.slot_count:
+                return None
+            if (slot := self._slots.get(key)) is None:
+                slot = self._slots[key] = len(self._slots)
+                self._command_queue.put((COMMAND_ADD, (slot, dict(address_info))))
+        return slot
@@ -0,0 +1,206 @@
+# pylint: skip-file
+"""多台设备共用的扫描调度器."""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+from passive_equipment import metrics
+
+
+class ScanTask:
+    """一个按周期执行的扫描任务."""
+
+    def __init__(self, name: str, func: Callable[[], None], period: float, owner: str = ""):
+        """ScanTask 构造函数.
+
+        Args:
+            name: 任务名称.
+            func: 每个周期执行一次的函数.
+            period: 周期, 单位秒.
+            owner: 任务所属的设备名称.
+        """
+        self.name = name
+        self.func = func
+        self.period = period
+        self.owner = owner
+        self.next_deadline = 0.0
+        self.cancelled = False
+        self.running = False
+        self.run_count = 0  # 执行次数
+        self.error_count = 0  # 抛出异常的次数
+        self.missed_count = 0  # 执行太慢跳过的周期数
+        self.lateness = metrics.RollingStats()  # 实际开始时间晚于截止时间多少, 单位秒
+        self.duration = metrics.RollingStats()  # 一次执行的耗时, 单位秒
+
+    def get_state(self) -> dict:
+        """获取任务的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "period": self.period, "run_count": self.run_count, "error_count": self.error_count,
+            "missed_count": self.missed_count, "lateness": self.lateness.get_state(),
+            "duration": self.duration.get_state()
+        }
+
+    def schedule_next(self):
+        """按周期计算下一次截止时间, 落后超过一个周期时跳过错过的周期."""
+        self.next_deadline += self.period
+        if (behind := time.monotonic() - self.next_deadline) > self.period:
+            missed = int(behind / self.period)
+            self.missed_count += missed
+            self.next_deadline += missed * self.period
+
+
+class ScanScheduler:
+    """所有设备的 plc 扫描任务放在同一个截止时间堆里, 由固定数量的工作线程执行.
+
+    线程数量和设备数量无关, 一个任务执行时不在堆里, 同一个任务不会并发执行.
+    截止时间按周期累加, 执行耗时不会累积成漂移, 落后超过一个周期时跳过错过的周期.
+    任务里不要执行会长时间阻塞的操作, 例如等待 eap 回复的流程, 这类操作交给单独的线程.
+    """
+
+    def __init__(self, worker_count: int = 4, logger: logging.Logger = None):
+        """ScanScheduler 构造函数.
+
+        Args:
+            worker_count: 工作线程数量.
+            logger: 日志器, 默认使用本模块的日志器.
+        """
+        self.worker_count = worker_count
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.tasks: list[ScanTask] = []
+
+        self._heap: list[tuple[float, int, ScanTask]] = []
+        self._sequence = itertools.count()  # 截止时间相同时按加入顺序执行
+        self._condition = threading.Condition()
+        self._threads: list[threading.Thread] = []
+
+    def add_task(
+            self, name: str, func: Callable[[], None], period: float, owner: str = "", delay: float = 0
+    ) -> ScanTask:
+        """添加扫描任务, 第一次添加任务时启动工作线程.
+
+        Args:
+            name: 任务名称.
+            func: 每个周期执行一次的函数.
+            period: 周期, 单位秒.
+            owner: 任务所属的设备名称.
+            delay: 第一次执行前等待的时间, 单位秒.
+
+        Returns:
+            ScanTask: 扫描任务.
+        """
+        task = ScanTask(name, func, float(period), owner)
+        with self._condition:
+            task.next_deadline = time.monotonic() + delay
+            self.tasks.append(task)
+            heapq.heappush(self._heap, (task.next_deadline, next(self._sequence), task))
+            self._start_workers()
+            self._condition.notify()
+        return task
+
+    def cancel(self, task: ScanTask):
+        """取消扫描任务, 正在执行的任务执行完后不再执行.
+
+        Args:
+            task: 扫描任务.
+        """
+        with self._condition:
+            task.cancelled = True
+            if task in self.tasks:
+                self.tasks.remove(task)
+
+    def set_period(self, task: ScanTask, period: float):
+        """修改任务的周期, 周期变短时下一次截止时间跟着提前, 不用等到原来的截止时间.
+
+        Args:
+            task: 扫描任务.
+            period: 新的周期, 单位秒.
+        """
+        with self._condition:
+            next_deadline = task.next_deadline - task.period + period
+            task.period = period
+            if task.running or task.cancelled or next_deadline >= task.next_deadline:
+                return
+            task.next_deadline = max(next_deadline, time.monotonic())
+            heapq.heappush(self._heap, (task.next_deadline, next(self._sequence), task))  # 原来的条目取出时跳过
+            self._condition.notify()
+
+    def get_tasks(self, owner: Optional[str] = None) -> list[ScanTask]:
+        """获取扫描任务.
+
+        Args:
+            owner: 设备名称, 默认获取所有任务.
+
+        Returns:
+            list[ScanTask]: 扫描任务列表.
+        """
+        return [task for task in list(self.tasks) if owner is None or task.owner == owner]
+
+    def get_state(self, owner: Optional[str] = None) -> dict:
+        """获取调度器的统计信息.
+
+        Args:
+            owner: 设备名称, 默认统计所有任务.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "worker_count": len(self._threads), "task_count": len(self.get_tasks(owner)),
+            "tasks": {f"{task.owner}.{task.name}": task.get_state() for task in self.get_tasks(owner)}
+        }
+
+    def _start_workers(self):
+        """启动工作线程, 调用方需要持有 _condition."""
+        while len(self._threads) < self.worker_count:
+            thread = threading.Thread(target=self._run, name=f"scan-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _run(self):
+        """工作线程, 取出最早到期的任务执行, 执行完后放回堆里."""
+        while True:
+            with self._condition:
+                while True:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    next_deadline, _, task = self._heap[0]
+                    if task.cancelled or task.running or next_deadline != task.next_deadline:  # 周期变短后留下的旧条目
+                        heapq.heappop(self._heap)
+                        continue
+                    if (wait_time := next_deadline - time.monotonic()) > 0:
+                        self._condition.wait(wait_time)
+                        continue
+                    heapq.heappop(self._heap)
+                    task.running = True
+                    break
+            self._execute(task)
+            with self._condition:
+                task.running = False
+                if not task.cancelled:
+                    task.schedule_next()
+                    heapq.heappush(self._heap, (task.next_deadline, next(self._sequence), task))
+                    self._condition.notify()
+
+    def _execute(self, task: ScanTask):
+        """执行一次任务, 异常只记录日志, 不影响下一个周期.
+
+        Args:
+            task: 扫描任务.
+        """
+        start_time = time.monotonic()
+        task.lateness.record(start_time - task.next_deadline)
+        try:
+            task.func()
+        except Exception as e:
+            task.error_count += 1
+            self.logger.warning("扫描任务 %s.%s 出现异常: %s", task.owner, task.name, str(e))
+        task.run_count += 1
+        task.duration.record(time.monotonic() - start_time)
@@ -1,94 +1,121 @@
 # pylint: skip-file
 from typing import Any, Optional
 
+from mysql_api.mysql_database import MySQLDatabase
 from secsgem import gem
 
 from passive_equipment import models_class, common_func
 from passive_equipment.enum_sece_data_type import EnumSecsDataType
 from passive_equipment.factory import get_mysql_secs
+from passive_equipment.variable_store import DataValueView, EquipmentConstantView, StatusVariableView, VariableStore
 
 
-def get_sv_list() -> list[dict[int, gem.StatusVariable]]:
+def get_sv_list(store: VariableStore, mysql: Optional[MySQLDatabase] = None) -> list[dict[int, StatusVariableView]]:
     """获取所有的 sv.
 
+    Args:
+        store: 保存 sv 值的变量存储.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
-        list[dict[int, gem.StatusVariable]]: 返回 sv 列表.
+        list[dict[int, StatusVariableView]]: 返回 sv 列表.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     sv_list = mysql.query_data(models_class.SvList)
+    sv_values = common_func.parse_values(
+        [sv["value"] for sv in sv_list], [sv["value_type"] for sv in sv_list], [sv["base_value_type"] for sv in sv_list]
+    )
     sv_list_return = []
-    for sv in sv_list:
+    for sv, sv_value in zip(sv_list, sv_values):
         sv_id = sv["sv_id"]
         sv_dict = {
             "svid": sv_id, "name": sv["sv_name"], "unit": "",
             "value_type": getattr(EnumSecsDataType, sv["value_type"]).value,
-            "value": common_func.parse_value(sv["value"], sv["value_type"])
+            "base_value_type": getattr(EnumSecsDataType, sv["base_value_type"]).value if sv["base_value_type"] else None,
+            "value": sv_value
         }
-        sv_list_return.append({sv_id: gem.StatusVariable(**sv_dict)})
+        sv_list_return.append({sv_id: StatusVariableView(store, **sv_dict)})
     return sv_list_return
 
 
-def get_dv_info(filter_dict: dict) -> Optional[dict[str, Any]]:
+def get_dv_info(filter_dict: dict, mysql: Optional[MySQLDatabase] = None) -> Optional[dict[str, Any]]:
     """根据条件获取 dv 信息.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         Optional[dict[str, Any]]: 返回 dv 信息, 查询不到返回 None.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     dv_list = mysql.query_data(models_class.DvList, filter_dict)
     if dv_list:
         return dv_list[0]
     return None
 
-def get_dv_list() -> list[dict[int, gem.DataValue]]:
+def get_dv_list(store: VariableStore, mysql: Optional[MySQLDatabase] = None) -> list[dict[int, DataValueView]]:
     """获取所有的 dv.
 
+    Args:
+        store: 保存 dv 值的变量存储.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
-        list[dict[int, gem.DataValue]]: 返回 dv 列表.
+        list[dict[int, DataValueView]]: 返回 dv 列表.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     dv_list = mysql.query_data(models_class.DvList)
+    dv_values = common_func.parse_values(
+        [dv["value"] for dv in dv_list], [dv["value_type"] for dv in dv_list], [dv["base_value_type"] for dv in dv_list]
+    )
     dv_list_return = []
-    for dv in dv_list:
+    for dv, dv_value in zip(dv_list, dv_values):
         dv_id = dv["dv_id"]
         dv_dict = {
             "dvid": dv_id, "name": dv["dv_name"],
             "value_type": getattr(EnumSecsDataType, dv["value_type"]).value,
             "base_value_type": getattr(EnumSecsDataType, dv["base_value_type"]).value,
-            "value": common_func.parse_value(dv["value"], dv["value_type"])
+            "value": dv_value
         }
-        dv_list_return.append({dv_id: gem.DataValue(**dv_dict)})
+        dv_list_return.append({dv_id: DataValueView(store, **dv_dict)})
     return dv_list_return
 
 
-def get_ec_list() -> list[dict[int, gem.EquipmentConstant]]:
+def get_ec_list(store: VariableStore, mysql: Optional[MySQLDatabase] = None) -> list[dict[int, EquipmentConstantView]]:
     """获取所有的 ec.
 
+    Args:
+        store: 保存 ec 值的变量存储.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
-        list[dict[int, gem.EquipmentConstant]]: 返回 ec 列表.
+        list[dict[int, EquipmentConstantView]]: 返回 ec 列表.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     ec_list = mysql.query_data(models_class.EcList)
+    ec_values = common_func.parse_values([ec["value"] for ec in ec_list], [ec["value_type"] for ec in ec_list])
     ec_list_return = []
-    for ec in ec_list:
+    for ec, ec_value in zip(ec_list, ec_values):
         ec_id = ec["ec_id"]
-        ec_value = common_func.parse_value(ec["value"], ec["value_type"])
         ec_dict = {
             "ecid": ec_id, "name": ec["ec_name"], "unit": "",
             "min_value": 0, "max_value": 0, "default_value": ec_value,
             "value_type": getattr(EnumSecsDataType, ec["value_type"]).value
         }
-        ec_list_return.append({ec_id: gem.EquipmentConstant(**ec_dict)})
+        ec_list_return.append({ec_id: EquipmentConstantView(store, **ec_dict)})
     return ec_list_return
 
 
-def get_event_list() -> list[dict[int, gem.CollectionEvent]]:
+def get_event_list(mysql: Optional[MySQLDatabase] = None) -> list[dict[int, gem.CollectionEvent]]:
     """获取所有的事件.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         list[dict[int, gem.CollectionEvent]]: 返回事件列表.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     event_list = mysql.query_data(models_class.EventList)
     event_list_return = []
     for event in event_list:
@@ -104,13 +131,16 @@ def get_event_list() -> list[dict[int, gem.CollectionEvent]]:
     return event_list_return
 
 
-def get_remote_command_list() -> list[dict[str, gem.RemoteCommand]]:
+def get_remote_command_list(mysql: Optional[MySQLDatabase] = None) -> list[dict[str, gem.RemoteCommand]]:
     """获取所有的远程命令.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         list[dict[str, gem.RemoteCommand]]: 返回远程命令列表.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     rc_list = mysql.query_data(models_class.RemoteCommandList)
     rc_list_return = []
     for rc in rc_list:
@@ -123,13 +153,16 @@ def get_remote_command_list() -> list[dict[str, gem.RemoteCommand]]:
     return rc_list_return
 
 
-def get_alarm_list() -> list[dict[str, gem.Alarm]]:
+def get_alarm_list(mysql: Optional[MySQLDatabase] = None) -> list[dict[str, gem.Alarm]]:
     """获取所有的报警.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         list[dict[str, gem.Alarm]]: 返回报警列表.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     alarm_list = mysql.query_data(models_class.AlarmList)
     alarm_list_return = []
     for alarm in alarm_list:
@@ -142,13 +175,16 @@ def get_alarm_list() -> list[dict[str, gem.Alarm]]:
     return alarm_list_return
 
 
-def get_recipe_list() -> list[str]:
+def get_recipe_list(mysql: Optional[MySQLDatabase] = None) -> list[str]:
     """获取所有的配方名称.
 
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
     Returns:
         list[str]: 返回所有的配方名称.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     recipe_list = mysql.query_data(models_class.Recipes)
     recipe_list_return = []
     for recipe in recipe_list:
@@ -156,16 +192,61 @@ def get_recipe_list() -> list[str]:
     return recipe_list_return
 
 
-def get_recipe_name_with_id(recipe_id: int) -> str:
+def get_recipe_body_info(recipe_name: str, mysql: Optional[MySQLDatabase] = None) -> Optional[dict[str, Any]]:
+    """根据配方名称获取配方 body 信息.
+
+    Args:
+        recipe_name: 配方名称.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
+    Returns:
+        Optional[dict[str, Any]]: 返回配方 body 信息, 查询不到返回 None.
+    """
+    mysql = mysql if mysql else get_mysql_secs()
+    recipe_body_list = mysql.query_data(models_class.RecipeBodyList, {"recipe_name": recipe_name})
+    if recipe_body_list:
+        return recipe_body_list[0]
+    return None
+
+
+def get_recipe_body_list(mysql: Optional[MySQLDatabase] = None) -> list[dict[str, Any]]:
+    """获取所有的配方 body 信息.
+
+    Args:
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
+    Returns:
+        list[dict[str, Any]]: 返回配方 body 信息列表.
+    """
+    mysql = mysql if mysql else get_mysql_secs()
+    return mysql.query_data(models_class.RecipeBodyList)
+
+
+def get_recipe_parameter_list(recipe_id: int, mysql: Optional[MySQLDatabase] = None) -> list[dict[str, Any]]:
+    """根据配方 id 获取配方参数.
+
+    Args:
+        recipe_id: 配方id.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
+
+    Returns:
+        list[dict[str, Any]]: 返回配方参数列表.
+    """
+    mysql = mysql if mysql else get_mysql_secs()
+    return mysql.query_data(models_class.RecipeParameterList, {"recipe_id": recipe_id})
+
+
+def get_recipe_name_with_id(recipe_id: int, mysql: Optional[MySQLDatabase] = None) -> str:
     """根据配方 id 获取配方名称.
 
     Args:
         recipe_id: 配方id.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
 
     Returns:
         str: 返回配方名称.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     recipe_list = mysql.query_data(models_class.Recipes)
     for recipe in recipe_list:
         if recipe["recipe_id"] == recipe_id:
@@ -173,16 +254,17 @@ def get_recipe_name_with_id(recipe_id: int) -> str:
     return ""
 
 
-def get_recipe_id_with_name(recipe_name: str) -> int:
+def get_recipe_id_with_name(recipe_name: str, mysql: Optional[MySQLDatabase] = None) -> int:
     """根据配方名称获取配方 id.
 
     Args:
         recipe_name: 配方名称.
+        mysql: 设备的数据库实例, 默认使用 get_mysql_secs 获取的实例.
 
     Returns:
         int: 返回配方 id.
     """
-    mysql = get_mysql_secs()
+    mysql = mysql if mysql else get_mysql_secs()
     recipe_list = mysql.query_data(models_class.Recipes)
     for recipe in recipe_list:
         if recipe["recipe_name"] == recipe_name:
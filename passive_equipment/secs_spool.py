@@ -0,0 +1,250 @@
+# pylint: skip-file
+"""Host 离线时 S6F11/S5F1 等消息的落盘缓存(spool)."""
+import json
+import os
+import pathlib
+import struct
+import threading
+import time
+import zlib
+from typing import Optional
+
+
+class SecsSpool:
+    """追加写的 secs 消息日志, host 离线时写入, 重连后按顺序重发.
+
+    日志文件由连续的记录组成, 每条记录是 ``头 + 消息体``, 头包含消息体长度, stream, function 和 crc32.
+    已重发的位置单独保存在 ``secs_spool.pos`` 里, 全部重发完成后日志文件会被截断.
+    """
+
+    RECORD_HEADER = struct.Struct(">IBBI")
+    DEFAULT_SPOOL_STREAMS = {5: [], 6: []}  # host 未通过 S2F43 设置时, 默认缓存报警和事件
+
+    def __init__(self, spool_dir: str, max_bytes: int = 64 * 1024 * 1024, sync_count: int = 20, sync_interval: float = 1):
+        """SecsSpool 构造函数.
+
+        Args:
+            spool_dir: spool 文件保存目录.
+            max_bytes: spool 文件最大字节数, 超过后新消息会被丢弃.
+            sync_count: 累计多少条未 fsync 的消息后执行一次 fsync.
+            sync_interval: 距离上次 fsync 超过多少秒后执行一次 fsync.
+        """
+        self.max_bytes = max_bytes
+        self.sync_count = sync_count
+        self.sync_interval = sync_interval
+
+        spool_path = pathlib.Path(spool_dir)
+        spool_path.mkdir(parents=True, exist_ok=True)
+        self._journal_path = spool_path / "secs_spool.dat"
+        self._position_path = spool_path / "secs_spool.pos"
+        self._config_path = spool_path / "secs_spool.json"
+
+        self._lock = threading.Lock()
+        self._pending_event = threading.Event()
+        self._unsynced_count = 0
+        self._last_sync_time = time.monotonic()
+
+        self.appended_count = 0  # 累计写入 spool 的消息数量
+        self.replayed_count = 0  # 累计重发成功的消息数量
+        self.dropped_count = 0  # spool 满了之后丢弃的消息数量
+        self.purged_count = 0  # 被 host 清除的消息数量
+        self.replay_rate = 0.0  # 最近一次重发的实际速率, 条/秒
+
+        self.spool_streams = self._load_spool_streams()
+        self._read_offset = self._load_read_offset()
+        self.pending_count = self._recover()
+        self._journal = open(self._journal_path, "ab")
+        if self.pending_count:
+            self._pending_event.set()
+
+    @property
+    def pending_bytes(self) -> int:
+        """未重发的消息字节数."""
+        return self._journal_path.stat().st_size - self._read_offset
+
+    def is_spoolable(self, stream: int, function: int) -> bool:
+        """判断 stream function 是否允许缓存.
+
+        Args:
+            stream: stream.
+            function: function.
+
+        Returns:
+            bool: 允许缓存返回 True.
+        """
+        if stream not in self.spool_streams:
+            return False
+        functions = self.spool_streams[stream]
+        return not functions or function in functions
+
+    def set_spool_streams(self, spool_streams: dict[int, list[int]]):
+        """设置允许缓存的 stream function, 对应 S2F43.
+
+        Args:
+            spool_streams: key 是 stream, value 是 function 列表, 空列表代表该 stream 下所有 function.
+        """
+        self.spool_streams = {int(stream): [int(_) for _ in functions] for stream, functions in spool_streams.items()}
+        temp_path = self._config_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps(self.spool_streams), encoding="UTF-8")
+        os.replace(temp_path, self._config_path)
+
+    def append(self, stream: int, function: int, body: bytes) -> bool:
+        """追加一条消息.
+
+        Args:
+            stream: stream.
+            function: function.
+            body: 编码后的消息体.
+
+        Returns:
+            bool: 写入成功返回 True, spool 已满返回 False.
+        """
+        record = self.RECORD_HEADER.pack(len(body), stream, function, zlib.crc32(body)) + body
+        with self._lock:
+            if self._journal.tell() + len(record) - self._read_offset > self.max_bytes:
+                self.dropped_count += 1
+                return False
+            self._journal.write(record)
+            self._journal.flush()
+            self._unsynced_count += 1
+            self.pending_count += 1
+            self.appended_count += 1
+            self._sync_if_needed()
+        self._pending_event.set()
+        return True
+
+    def sync(self):
+        """把未落盘的消息 fsync 到磁盘."""
+        with self._lock:
+            if self._unsynced_count:
+                os.fsync(self._journal.fileno())
+                self._unsynced_count = 0
+            self._last_sync_time = time.monotonic()
+
+    def peek(self) -> Optional[tuple[int, int, bytes, int]]:
+        """读取最早的一条未重发消息.
+
+        Returns:
+            Optional[tuple[int, int, bytes, int]]: (stream, function, 消息体, 下一条记录的位置), 没有消息返回 None.
+        """
+        with self._lock:
+            if not self.pending_count:
+                return None
+            with open(self._journal_path, "rb") as journal:
+                journal.seek(self._read_offset)
+                length, stream, function, _ = self.RECORD_HEADER.unpack(journal.read(self.RECORD_HEADER.size))
+                body = journal.read(length)
+                return stream, function, body, journal.tell()
+
+    def commit(self, next_offset: int):
+        """标记一条消息已重发成功.
+
+        Args:
+            next_offset: peek 返回的下一条记录的位置.
+        """
+        with self._lock:
+            self._read_offset = next_offset
+            self.pending_count -= 1
+            self.replayed_count += 1
+            if self.pending_count:
+                self._save_read_offset()
+            else:
+                self._truncate()
+
+    def purge(self) -> int:
+        """清除所有未重发的消息, 对应 S6F23 RSDC=1.
+
+        Returns:
+            int: 清除的消息数量.
+        """
+        with self._lock:
+            purged_count = self.pending_count
+            self.purged_count += purged_count
+            self.pending_count = 0
+            self._truncate()
+            return purged_count
+
+    def wait_pending(self, timeout: Optional[float] = None) -> bool:
+        """等待 spool 里有消息.
+
+        Args:
+            timeout: 超时时间, 默认一直等待.
+
+        Returns:
+            bool: 有消息返回 True.
+        """
+        return self._pending_event.wait(timeout)
+
+    def get_state(self) -> dict:
+        """获取 spool 的统计信息.
+
+        Returns:
+            dict: spool 统计信息.
+        """
+        return {
+            "pending_count": self.pending_count, "pending_bytes": self.pending_bytes, "max_bytes": self.max_bytes,
+            "appended_count": self.appended_count, "replayed_count": self.replayed_count,
+            "dropped_count": self.dropped_count, "purged_count": self.purged_count,
+            "replay_rate": round(self.replay_rate, 2), "spool_streams": self.spool_streams
+        }
+
+    def _sync_if_needed(self):
+        """达到数量或时间阈值后 fsync, 调用前需持有锁."""
+        if self._unsynced_count >= self.sync_count or time.monotonic() - self._last_sync_time >= self.sync_interval:
+            os.fsync(self._journal.fileno())
+            self._unsynced_count = 0
+            self._last_sync_time = time.monotonic()
+
+    def _truncate(self):
+        """所有消息都已处理, 截断日志文件, 调用前需持有锁."""
+        self._journal.truncate(0)
+        self._journal.seek(0)
+        self._read_offset = 0
+        self._save_read_offset()
+        self._pending_event.clear()
+
+    def _recover(self) -> int:
+        """启动时校验日志文件, 截掉写了一半的记录.
+
+        Returns:
+            int: 未重发的消息数量.
+        """
+        if not self._journal_path.exists():
+            self._journal_path.touch()
+            return 0
+        pending_count = 0
+        valid_offset = self._read_offset
+        with open(self._journal_path, "r+b") as journal:
+            journal.seek(self._read_offset)
+            while header := journal.read(self.RECORD_HEADER.size):
+                if len(header) < self.RECORD_HEADER.size:
+                    break
+                length, _, __, crc = self.RECORD_HEADER.unpack(header)
+                body = journal.read(length)
+                if len(body) < length or zlib.crc32(body) != crc:
+                    break
+                pending_count += 1
+                valid_offset = journal.tell()
+            journal.truncate(valid_offset)
+        return pending_count
+
+    def _load_read_offset(self) -> int:
+        """读取已重发的位置."""
+        if self._position_path.exists():
+            offset = int(self._position_path.read_text(encoding="UTF-8") or 0)
+            if self._journal_path.exists() and offset <= self._journal_path.stat().st_size:
+                return offset
+        return 0
+
+    def _save_read_offset(self):
+        """保存已重发的位置, 先写临时文件再替换, 保证断电时文件完整."""
+        temp_path = self._position_path.with_suffix(".tmp")
+        temp_path.write_text(str(self._read_offset), encoding="UTF-8")
+        os.replace(temp_path, self._position_path)
+
+    def _load_spool_streams(self) -> dict[int, list[int]]:
+        """读取 host 设置的允许缓存的 stream function."""
+        if self._config_path.exists():
+            spool_streams = json.loads(self._config_path.read_text(encoding="UTF-8"))
+            return {int(stream): functions for stream, functions in spool_streams.items()}
+        return dict(self.DEFAULT_SPOOL_STREAMS)
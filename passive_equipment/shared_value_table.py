@@ -0,0 +1,144 @@
+# pylint: skip-file
+"""进程间共享的变量值表."""
+import numbers
+import struct
+import time
+from multiprocessing import shared_memory
+from typing import Any, Optional
+
+RECORD = struct.Struct("<IBBHd64s")  # 版本号, 值类型, 状态, 值的字节长度, 采样时间戳, 值
+SEQUENCE = struct.Struct("<I")
+INT_VALUE = struct.Struct("<q")
+FLOAT_VALUE = struct.Struct("<d")
+VALUE_SIZE = 64  # 值的最大字节数, 超过的字符串不写入表
+MAX_READ_RETRY = 1000  # 写入方在写入中途退出时, 读取方最多重试的次数
+
+TYPE_NONE, TYPE_BOOL, TYPE_INT, TYPE_FLOAT, TYPE_STR = range(5)
+STATUS_EMPTY, STATUS_OK, STATUS_ERROR, STATUS_UNSUPPORTED = range(4)  # STATUS_UNSUPPORTED: 值放不进记录, 需要直接读取
+
+
+class SharedValueTable:
+    """固定布局的共享内存变量表, 扫描进程写入, 主进程读取.
+
+    每个槽位是一条固定长度的记录, 每个槽位只有一个写入方.
+    写入前把版本号加 1 变成奇数, 写完再加 1 变成偶数; 读取时版本号是奇数或者读完后版本号变了, 说明读到了写入一半的记录,
+    重新读取. 读取方不需要加锁, 也不会阻塞写入方.
+    """
+
+    def __init__(self, slot_count: int, name: Optional[str] = None):
+        """SharedValueTable 构造函数.
+
+        Args:
+            slot_count: 槽位数量.
+            name: 共享内存名称, 传入时连接已经存在的表, 默认创建新的表.
+        """
+        self.slot_count = slot_count
+        self.retry_count = 0  # 读到写入一半的记录后重新读取的次数
+        self._owner = name is None  # 创建方负责删除共享内存
+        self._memory = shared_memory.SharedMemory(name=name, create=self._owner, size=slot_count * RECORD.size)
+        self._buffer = self._memory.buf
+
+    @property
+    def name(self) -> str:
+        """共享内存名称, 其他进程用它连接这张表."""
+        return self._memory.name
+
+    def write(self, slot: int, value: Any, status: int = STATUS_OK, sample_time: Optional[float] = None) -> int:
+        """写入槽位的值, 不能编码的值只写入 STATUS_UNSUPPORTED 状态, 读取方看到后直接读取.
+
+        Args:
+            slot: 槽位.
+            value: 值, 支持 None, bool, 64 位以内的整数, float 和编码后不超过 VALUE_SIZE 字节的 str.
+            status: 状态, 读取失败时写入 STATUS_ERROR.
+            sample_time: 采样时间戳, 默认使用当前时间.
+
+        Returns:
+            int: 实际写入的状态.
+        """
+        offset = slot * RECORD.size
+        sequence = SEQUENCE.unpack_from(self._buffer, offset)[0]
+        try:
+            value_type, payload = self.encode(value)
+        except ValueError:
+            value_type, payload, status = TYPE_NONE, b"", STATUS_UNSUPPORTED
+        SEQUENCE.pack_into(self._buffer, offset, sequence + 1)
+        RECORD.pack_into(
+            self._buffer, offset, sequence + 1, value_type, status, len(payload),
+            time.time() if sample_time is None else sample_time, payload
+        )
+        SEQUENCE.pack_into(self._buffer, offset, (sequence + 2) % 0x100000000)
+        return status
+
+    def read(self, slot: int) -> tuple[Any, int, float]:
+        """读取槽位的值.
+
+        Args:
+            slot: 槽位.
+
+        Returns:
+            tuple[Any, int, float]: 值, 状态和采样时间戳, 一直读不到完整的记录时状态是 STATUS_ERROR.
+        """
+        offset = slot * RECORD.size
+        for _ in range(MAX_READ_RETRY):
+            sequence, value_type, status, size, sample_time, payload = RECORD.unpack_from(self._buffer, offset)
+            if not sequence & 1 and SEQUENCE.unpack_from(self._buffer, offset)[0] == sequence:
+                return self.decode(value_type, payload[:size]), status, sample_time
+            self.retry_count += 1
+            time.sleep(0)
+        return None, STATUS_ERROR, 0.0
+
+    def close(self):
+        """断开共享内存, 创建方同时删除共享内存."""
+        self._buffer = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+    @staticmethod
+    def encode(value: Any) -> tuple[int, bytes]:
+        """把值编码成记录里的类型和字节.
+
+        Args:
+            value: 值.
+
+        Returns:
+            tuple[int, bytes]: 值类型和字节.
+
+        Raises:
+            ValueError: 不支持的类型, 超出 64 位范围的整数或者超过 VALUE_SIZE 字节的字符串.
+        """
+        if value is None:
+            return TYPE_NONE, b""
+        if isinstance(value, bool):
+            return TYPE_BOOL, b"\x01" if value else b"\x00"
+        if isinstance(value, numbers.Integral):
+            try:
+                return TYPE_INT, INT_VALUE.pack(int(value))
+            except struct.error as e:
+                raise ValueError(f"整数 {value} 超出 64 位范围") from e
+        if isinstance(value, numbers.Real):
+            return TYPE_FLOAT, FLOAT_VALUE.pack(float(value))
+        if isinstance(value, str) and len(payload := value.encode("UTF-8")) <= VALUE_SIZE:
+            return TYPE_STR, payload
+        raise ValueError(f"{type(value).__name__} 类型的值不能写入共享变量表")
+
+    @staticmethod
+    def decode(value_type: int, payload: bytes) -> Any:
+        """把记录里的字节解码成值.
+
+        Args:
+            value_type: 值类型.
+            payload: 字节.
+
+        Returns:
+            Any: 值.
+        """
+        if value_type == TYPE_BOOL:
+            return payload == b"\x01"
+        if value_type == TYPE_INT:
+            return INT_VALUE.unpack(payload)[0]
+        if value_type == TYPE_FLOAT:
+            return FLOAT_VALUE.unpack(payload)[0]
+        if value_type == TYPE_STR:
+            return payload.decode("UTF-8", errors="ignore")
+        return None
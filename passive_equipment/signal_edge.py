@@ -0,0 +1,217 @@
+# pylint: skip-file
+"""信号的边沿检测和握手状态机."""
+import threading
+import time
+from typing import Any, Optional
+
+HANDSHAKE_LEVEL, HANDSHAKE_TOGGLE, HANDSHAKE_COUNTER = "level", "toggle", "counter"
+
+# 计数器握手时计数器的取值范围, 计数器溢出后从 0 开始
+COUNTER_MODULO = {
+    "sint": 1 << 8, "byte": 1 << 8, "int": 1 << 16, "word": 1 << 16,
+    "dint": 1 << 32, "dword": 1 << 32, "lint": 1 << 64, "lword": 1 << 64,
+}
+
+
+class SignalEdge:
+    """检测到的一次触发."""
+
+    def __init__(self, value: Any, edge_time: float, sequence: Optional[int] = None, missed_count: int = 0):
+        """SignalEdge 构造函数.
+
+        Args:
+            value: 触发时的信号值.
+            edge_time: 第一次扫描到新值的时间戳.
+            sequence: 计数器握手时的计数器值.
+            missed_count: 这次触发之前漏掉的触发次数.
+        """
+        self.value = value
+        self.edge_time = edge_time
+        self.sequence = sequence
+        self.missed_count = missed_count
+
+    def to_dict(self) -> dict:
+        """转换成字典.
+
+        Returns:
+            dict: 触发信息.
+        """
+        return {
+            "value": self.value, "edge_time": self.edge_time, "sequence": self.sequence,
+            "missed_count": self.missed_count
+        }
+
+
+class SignalEdgeDetector:
+    """一个信号的边沿检测和握手状态机, 每次扫描传入读到的值, 确认触发时返回 SignalEdge.
+
+    三种握手方式:
+        level: 信号值等于 signal_value 时触发, 流程结束后写入清除值, 和原来的电平检测相同.
+            只在从其他值变成 signal_value 时触发, 流程结束后重新等待触发;
+            流程结束后第一次扫描信号仍然是 signal_value, 说明 plc 没有收到清除值或者马上又触发了, 记为重复触发.
+        toggle: plc 每次触发翻转信号值, 每次变化都是一次触发, 不写入清除值.
+        counter: plc 每次触发把计数器加 1, 每次变化都是一次触发, 不写入清除值.
+            计数器一次增加超过 1 说明两次扫描之间或者流程执行期间有触发没有处理, 记为漏掉的触发;
+            计数器变小说明 plc 重发了处理过的计数, 记为重复触发, 不执行流程.
+
+    debounce 为 0 时第一次扫描到新值就确认; 大于 0 时新值需要保持 debounce 秒并且至少连续扫描到两次才确认,
+    没保持住的变化记为毛刺. 触发时间是第一次扫描到新值的时间.
+    toggle 和 counter 握手在流程执行期间继续检测, 期间确认的第一个触发保存为等待的触发, 流程结束后执行,
+    再有触发记为漏掉的触发.
+    """
+
+    def __init__(
+            self, handshake: str = HANDSHAKE_LEVEL, signal_value: Any = 1, debounce: float = 0.0,
+            modulo: int = 1 << 32
+    ):
+        """SignalEdgeDetector 构造函数.
+
+        Args:
+            handshake: 握手方式, level, toggle 或者 counter.
+            signal_value: level 握手的触发值.
+            debounce: 新值需要保持的时间, 单位秒, 0 表示扫描到就确认.
+            modulo: counter 握手时计数器的取值范围.
+        """
+        self.handshake = handshake
+        self.signal_value = signal_value
+        self.debounce = debounce
+        self.modulo = modulo
+        self.trigger_count = 0  # 触发次数
+        self.missed_count = 0  # 漏掉的触发次数
+        self.duplicate_count = 0  # 重复触发次数
+        self.glitch_count = 0  # 没有保持住的变化次数
+        self.last_edge: Optional[SignalEdge] = None  # 最后一次触发
+        self.pending_edge: Optional[SignalEdge] = None  # 流程执行期间确认的, 等待流程结束后执行的触发
+
+        self._value: Any = None  # 最后确认的值
+        self._initialized = False
+        self._armed = True  # level 握手时是否等待新的触发
+        self._flow_done = False  # level 握手时流程刚结束, 下一次扫描检查重复触发
+        self._candidate: Optional[tuple[Any, float, bool]] = None  # 正在消抖的新值, 第一次扫描到的时间和是否是重复触发
+        self._lock = threading.Lock()
+
+    def update(self, value: Any, scan_time: Optional[float] = None) -> Optional[SignalEdge]:
+        """传入一次扫描读到的值.
+
+        Args:
+            value: 读到的信号值.
+            scan_time: 扫描时间戳, 默认使用当前时间.
+
+        Returns:
+            Optional[SignalEdge]: 确认触发时返回触发信息, 否则返回 None.
+        """
+        scan_time = time.time() if scan_time is None else scan_time
+        with self._lock:
+            if not self._initialized:
+                self._initialized = True
+                if self.handshake != HANDSHAKE_LEVEL:  # 启动时的值作为基准, 之后的变化才是触发
+                    self._value = value
+                    return None
+            flow_done, self._flow_done = self._flow_done, False
+            if not self._is_change(value):
+                if self._candidate is not None:
+                    self.glitch_count += 1
+                    self._candidate = None
+                return None
+            if self._candidate is None or self._candidate[0] != value:
+                if self._candidate is not None:
+                    self.glitch_count += 1
+                self._candidate = (value, scan_time, flow_done)
+                if self.debounce > 0:
+                    return None
+            _, edge_time, duplicate = self._candidate
+            if scan_time - edge_time < self.debounce:
+                return None
+            self._candidate = None
+            if duplicate:
+                self.duplicate_count += 1
+            return self._confirm(value, edge_time)
+
+    def on_flow_done(self):
+        """信号的流程结束时调用, level 握手已经写入清除值, 重新等待触发."""
+        with self._lock:
+            if self.handshake == HANDSHAKE_LEVEL:
+                self._armed = True
+                self._flow_done = True
+
+    def defer(self, edge: SignalEdge) -> bool:
+        """流程执行期间确认了触发, 没有等待的触发时保存下来, 否则记为漏掉的触发.
+
+        Args:
+            edge: 触发信息.
+
+        Returns:
+            bool: 保存成功返回 True, 已经有等待的触发返回 False.
+        """
+        with self._lock:
+            if self.pending_edge is None:
+                self.pending_edge = edge
+                return True
+            self.missed_count += 1
+            return False
+
+    def take_pending(self) -> Optional[SignalEdge]:
+        """取出等待的触发.
+
+        Returns:
+            Optional[SignalEdge]: 等待的触发, 没有时返回 None.
+        """
+        with self._lock:
+            edge, self.pending_edge = self.pending_edge, None
+            return edge
+
+    def get_state(self) -> dict:
+        """获取状态机的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "handshake": self.handshake, "value": self._value, "trigger_count": self.trigger_count,
+            "missed_count": self.missed_count, "duplicate_count": self.duplicate_count,
+            "glitch_count": self.glitch_count, "last_edge": self.last_edge.to_dict() if self.last_edge else None,
+            "pending_edge": self.pending_edge.to_dict() if self.pending_edge else None
+        }
+
+    def _is_change(self, value: Any) -> bool:
+        """判断读到的值是否是需要确认的变化, 调用方需要持有 _lock.
+
+        Args:
+            value: 读到的信号值.
+
+        Returns:
+            bool: 是变化返回 True.
+        """
+        if self.handshake == HANDSHAKE_LEVEL:
+            if value != self.signal_value:
+                self._armed = True
+                return False
+            return self._armed
+        return value != self._value
+
+    def _confirm(self, value: Any, edge_time: float) -> Optional[SignalEdge]:
+        """确认一次变化, 调用方需要持有 _lock.
+
+        Args:
+            value: 确认的值.
+            edge_time: 第一次扫描到这个值的时间戳.
+
+        Returns:
+            Optional[SignalEdge]: 触发信息, 计数器变小时返回 None.
+        """
+        sequence, missed_count = None, 0
+        if self.handshake == HANDSHAKE_COUNTER:
+            sequence = int(value)
+            if self._value is not None:
+                delta = (sequence - int(self._value)) % self.modulo
+                if delta > self.modulo // 2:
+                    self.duplicate_count += 1
+                    self._value = value
+                    return None
+                missed_count = delta - 1
+        self._value = value
+        self._armed = False
+        self.trigger_count += 1
+        self.missed_count += missed_count
+        self.last_edge = SignalEdge(value, edge_time, sequence, missed_count)
+        return self.last_edge
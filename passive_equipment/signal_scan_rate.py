@@ -0,0 +1,131 @@
+# pylint: skip-file
+"""信号扫描的自适应周期."""
+import threading
+import time
+from typing import Optional, Union
+
+from passive_equipment.async_runtime import AsyncRuntime
+from passive_equipment.scan_scheduler import ScanScheduler, ScanTask
+
+FAST_PERIOD_RATIO = 0.8  # 快速扫描周期占目标检测延迟的比例, 剩下的留给读取耗时和调度延迟
+
+
+class SignalScanRate:
+    """一台设备所有信号扫描任务的周期.
+
+    信号的检测延迟最多是一个扫描周期加上读取耗时, 每个信号按自己的目标检测延迟计算快速扫描周期.
+    有信号触发或者流程结束后的 active_hold 秒内设备处于活跃状态, 所有信号快速扫描, 下一个握手信号能及时检测到;
+    空闲后每次扫描把周期乘以 backoff, 最长到 idle_period.
+    所有信号快速扫描时每秒读取次数不超过 max_scan_rate, 信号多时快速扫描周期相应变长.
+    """
+
+    def __init__(
+            self, scan_scheduler: Union[ScanScheduler, AsyncRuntime], idle_period: float = 1.0,
+            active_hold: float = 10.0, max_scan_rate: float = 200.0, backoff: float = 1.5
+    ):
+        """SignalScanRate 构造函数.
+
+        Args:
+            scan_scheduler: 扫描调度器或者 asyncio 运行时.
+            idle_period: 空闲时的最长扫描周期, 单位秒.
+            active_hold: 信号触发或者流程结束后保持快速扫描的时间, 单位秒.
+            max_scan_rate: 所有信号快速扫描时每秒最多读取的次数.
+            backoff: 空闲时每次扫描周期变长的倍数.
+        """
+        self.scan_scheduler = scan_scheduler
+        self.idle_period = idle_period
+        self.active_hold = active_hold
+        self.max_scan_rate = max_scan_rate
+        self.backoff = backoff
+        self.active_count = 0  # 进入活跃状态的次数
+        self.last_active_time = float("-inf")  # 最后一次信号触发或者流程结束的时间
+
+        self._signals: dict[str, tuple[ScanTask, float]] = {}  # 信号地址对应的扫描任务和目标检测延迟
+        self._lock = threading.Lock()
+
+    def add_signal(self, address: str, task: ScanTask, target_latency: float):
+        """添加信号的扫描任务.
+
+        Args:
+            address: 信号地址.
+            task: 扫描任务.
+            target_latency: 目标检测延迟, 单位秒.
+        """
+        with self._lock:
+            self._signals[address] = (task, target_latency)
+
+    def is_active(self) -> bool:
+        """判断设备是否处于活跃状态.
+
+        Returns:
+            bool: 活跃返回 True.
+        """
+        return time.monotonic() - self.last_active_time < self.active_hold
+
+    def touch(self):
+        """信号触发或者流程结束时调用, 所有信号立刻切换到快速扫描, 不用等到原来的下一次扫描."""
+        with self._lock:
+            if not self.is_active():
+                self.active_count += 1
+            self.last_active_time = time.monotonic()
+            signals = list(self._signals.values())
+        for task, target_latency in signals:
+            if task.period > (fast_period := self.get_fast_period(target_latency)):
+                self.scan_scheduler.set_period(task, fast_period)
+
+    def update(self, address: str):
+        """每次扫描信号时调用, 活跃时保持快速扫描, 空闲时逐渐放慢.
+
+        Args:
+            address: 信号地址.
+        """
+        if (signal := self._signals.get(address)) is None:
+            return
+        task, target_latency = signal
+        fast_period = self.get_fast_period(target_latency)
+        if self.is_active():
+            period = fast_period
+        else:
+            period = min(max(task.period * self.backoff, fast_period), max(self.idle_period, fast_period))
+        if period != task.period:
+            self.scan_scheduler.set_period(task, period)
+
+    def get_period(self, address: str) -> Optional[float]:
+        """获取信号当前的扫描周期.
+
+        Args:
+            address: 信号地址.
+
+        Returns:
+            Optional[float]: 扫描周期, 单位秒, 信号不存在时返回 None.
+        """
+        signal = self._signals.get(address)
+        return signal[0].period if signal else None
+
+    def get_fast_period(self, target_latency: float) -> float:
+        """计算信号的快速扫描周期.
+
+        Args:
+            target_latency: 目标检测延迟, 单位秒.
+
+        Returns:
+            float: 快速扫描周期, 单位秒.
+        """
+        return max(target_latency * FAST_PERIOD_RATIO, len(self._signals) / self.max_scan_rate)
+
+    def get_state(self) -> dict:
+        """获取信号扫描周期的统计信息.
+
+        Returns:
+            dict: 统计信息, 时间单位是秒.
+        """
+        with self._lock:
+            signals = dict(self._signals)
+        return {
+            "active": self.is_active(), "active_count": self.active_count,
+            "scan_rate": round(sum(1 / task.period for task, _ in signals.values()), 2),
+            "signals": {
+                address: {"target_latency": target_latency, "period": round(task.period, 4)}
+                for address, (task, target_latency) in signals.items()
+            }
+        }
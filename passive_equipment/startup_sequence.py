@@ -0,0 +1,194 @@
+# pylint: skip-file
+"""设备启动阶段."""
+import json
+import logging
+import threading
+import time
+from typing import Callable, Iterable, Optional, Union
+
+from passive_equipment.exception import EquipmentRuntimeError
+
+PHASE_PENDING, PHASE_RUNNING, PHASE_DONE, PHASE_FAILED = "pending", "running", "done", "failed"
+
+
+class StartupPhase:
+    """一个启动阶段."""
+
+    def __init__(self, name: str, func: Callable[[], None], depends: tuple[str, ...]):
+        """StartupPhase 构造函数.
+
+        Args:
+            name: 阶段名称.
+            func: 阶段要执行的函数.
+            depends: 依赖的阶段名称.
+        """
+        self.name = name
+        self.func = func
+        self.depends = depends
+        self.state = PHASE_PENDING
+        self.start_time: Optional[float] = None  # 开始执行的时间, 单位秒, 相对于启动开始
+        self.end_time: Optional[float] = None  # 结束的时间, 单位秒, 相对于启动开始
+        self.error: Optional[Exception] = None
+        self.finished = threading.Event()
+
+    def get_state(self) -> dict:
+        """获取阶段的统计信息.
+
+        Returns:
+            dict: 统计信息, 时间单位是秒.
+        """
+        duration = None if self.start_time is None or self.end_time is None else self.end_time - self.start_time
+        return {
+            "state": self.state, "depends": list(self.depends),
+            "start": None if self.start_time is None else round(self.start_time, 4),
+            "duration": None if duration is None else round(duration, 4),
+            "error": None if self.error is None else str(self.error)
+        }
+
+
+class StartupSequence:
+    """设备启动的阶段, 每个阶段在自己的线程里等依赖的阶段结束后执行, 没有依赖关系的阶段并行执行.
+
+    依赖的阶段失败时仍然执行, 失败在 check 时抛出. 所有阶段结束后把每个阶段的耗时写入日志.
+    """
+
+    def __init__(self, logger: logging.Logger = None):
+        """StartupSequence 构造函数.
+
+        Args:
+            logger: 日志器, 默认使用本模块的日志器.
+        """
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.phases: dict[str, StartupPhase] = {}
+        self.total_time: Optional[float] = None  # 所有阶段结束的时间, 单位秒
+
+        self._start_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_phase(self, name: str, func: Callable[[], None], depends: Iterable[str] = ()):
+        """添加阶段, 依赖的阶段必须已经添加.
+
+        Args:
+            name: 阶段名称.
+            func: 阶段要执行的函数.
+            depends: 依赖的阶段名称.
+
+        Raises:
+            EquipmentRuntimeError: 阶段名称重复或者依赖的阶段不存在.
+        """
+        depends = tuple(depends)
+        if name in self.phases:
+            raise EquipmentRuntimeError(f"启动阶段 {name} 已经存在")
+        if missing := [depend for depend in depends if depend not in self.phases]:
+            raise EquipmentRuntimeError(f"启动阶段 {name} 依赖的阶段 {missing} 不存在")
+        self.phases[name] = StartupPhase(name, func, depends)
+
+    def start(self):
+        """启动所有阶段."""
+        self._start_time = time.monotonic()
+        for phase in self.phases.values():
+            threading.Thread(target=self._run_phase, args=(phase,), name=f"startup-{phase.name}", daemon=True).start()
+
+    def wait(self, names: Union[str, Iterable[str]], timeout: Optional[float] = None) -> bool:
+        """等待阶段结束.
+
+        Args:
+            names: 阶段名称或者名称列表, 不存在的阶段视为已经结束.
+            timeout: 超时时间, 默认一直等待.
+
+        Returns:
+            bool: 所有阶段都结束返回 True, 超时返回 False.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in [names] if isinstance(names, str) else names:
+            if (phase := self.phases.get(name)) is None:
+                continue
+            if not phase.finished.wait(None if deadline is None else max(0.0, deadline - time.monotonic())):
+                return False
+        return True
+
+    def wait_ready(self, name: str, timeout: float, poll_interval: float = 0.1) -> bool:
+        """等待阶段结束, 有阶段失败时立刻返回, 不用等到超时.
+
+        Args:
+            name: 阶段名称.
+            timeout: 超时时间, 单位秒.
+            poll_interval: 检查是否有阶段失败的间隔, 单位秒.
+
+        Returns:
+            bool: 阶段结束并且没有阶段失败返回 True, 超时或者有阶段失败返回 False.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.failed:
+            if self.wait(name, min(poll_interval, max(0.0, deadline - time.monotonic()))):
+                return not self.failed
+            if time.monotonic() >= deadline:
+                return False
+        return False
+
+    @property
+    def failed(self) -> bool:
+        """是否有阶段失败."""
+        return any(phase.error is not None for phase in self.phases.values())
+
+    def is_finished(self, name: str) -> bool:
+        """判断阶段是否已经结束.
+
+        Args:
+            name: 阶段名称.
+
+        Returns:
+            bool: 阶段已经结束或者不存在返回 True.
+        """
+        return name not in self.phases or self.phases[name].finished.is_set()
+
+    def check(self, names: Iterable[str]):
+        """检查阶段是否执行成功.
+
+        Args:
+            names: 阶段名称列表.
+
+        Raises:
+            EquipmentRuntimeError: 有阶段失败.
+        """
+        for name in names:
+            if (phase := self.phases.get(name)) and phase.error is not None:
+                raise EquipmentRuntimeError(f"启动阶段 {name} 失败: {phase.error}") from phase.error
+
+    def get_report(self) -> dict:
+        """获取每个阶段的耗时报告.
+
+        Returns:
+            dict: 总耗时和每个阶段的统计信息, 阶段按开始时间排序.
+        """
+        phases = sorted(self.phases.values(), key=lambda _: float("inf") if _.start_time is None else _.start_time)
+        return {
+            "total": None if self.total_time is None else round(self.total_time, 4),
+            "phases": {phase.name: phase.get_state() for phase in phases}
+        }
+
+    def _run_phase(self, phase: StartupPhase):
+        """等依赖的阶段结束后执行阶段.
+
+        Args:
+            phase: 启动阶段.
+        """
+        self.wait(phase.depends)
+        phase.start_time = time.monotonic() - self._start_time
+        phase.state = PHASE_RUNNING
+        try:
+            phase.func()
+            phase.state = PHASE_DONE
+        except Exception as e:
+            phase.error = e
+            phase.state = PHASE_FAILED
+            self.logger.warning("启动阶段 %s 失败: %s", phase.name, str(e))
+        phase.end_time = time.monotonic() - self._start_time
+        self.logger.info("启动阶段 %s 结束, 耗时: %.3f 秒", phase.name, phase.end_time - phase.start_time)
+        with self._lock:
+            phase.finished.set()
+            if self.total_time is not None or not all(_.finished.is_set() for _ in self.phases.values()):
+                return
+            self.total_time = time.monotonic() - self._start_time
+        report = json.dumps(self.get_report()["phases"], ensure_ascii=False)
+        self.logger.info("启动完成, 总耗时: %.3f 秒, 各阶段: %s", self.total_time, report)
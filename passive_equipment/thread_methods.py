@@ -1,13 +1,22 @@
 # pylint: skip-file
 """线程方法类."""
 import asyncio
+import datetime
+import functools
+import itertools
 import time
-from typing import Any
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Union
 
-from secsgem.secs.variables import Array, U4
+from secsgem.secs.variables import Array, Base, U4
 from socket_cyg.socket_server_asyncio import CygSocketServerAsyncio
 
-from passive_equipment import plc_address_operation, secs_config
+from passive_equipment import plc_address_operation, secs_config, array_value, metrics
+from passive_equipment.async_runtime import AsyncRuntime
+from passive_equipment.plc_io_lane import PRIORITY_HANDSHAKE, PRIORITY_POLL
+from passive_equipment.scan_scheduler import ScanScheduler, ScanTask
+from passive_equipment.signal_edge import COUNTER_MODULO, HANDSHAKE_LEVEL, SignalEdge, SignalEdgeDetector
+from passive_equipment.signal_scan_rate import SignalScanRate
 
 
 class ThreadMethods:
@@ -19,75 +28,184 @@ class ThreadMethods:
             handler_passive: HandlerPassive 实例.
         """
         self.handler_passive = handler_passive
+        self.scan_tasks: list[ScanTask] = []  # 加入扫描调度器的任务
+        self.signal_scan_rate: Optional[SignalScanRate] = None  # 信号扫描的自适应周期, 加入扫描任务时创建
+        self.signal_edges: dict[str, SignalEdgeDetector] = {}  # 信号地址和边沿检测状态机
+        self.control_state_address_info: Optional[dict[str, Any]] = None  # 控制状态地址信息, 加入扫描任务时查询
+        self.mes_heart_period_error = metrics.RollingStats()  # 心跳实际翻转间隔与 mes_heart_gap 的误差, 单位秒
 
-    def mes_heart(self):
-        """Mes 心跳."""
-        address_info = plc_address_operation.get_mes_herat(self.handler_passive.plc_type)
-        if "snap7" in self.handler_passive.plc_type:
-            address_info.update({"db_num": self.handler_passive.get_ec_value_with_name("db_num")})
-        mes_heart_gap = self.handler_passive.get_ec_value_with_name("mes_heart_gap")
-        while True:
-            try:
-                self.handler_passive.plc.execute_write(**address_info, value=True, save_log=False)
-                time.sleep(mes_heart_gap)
-                self.handler_passive.plc.execute_write(**address_info, value=False, save_log=False)
-                time.sleep(mes_heart_gap)
-            except Exception as e:
-                self.handler_passive.set_sv_value_with_name("control_state", 0)
+        self._heart_value = True  # 下一次写入的心跳值
+        self._mes_heart_gap = 0.0  # 心跳翻转间隔, 单位秒
+        self._heart_toggle_time: Optional[float] = None  # 上一次成功翻转心跳的时间
+        self._signal_flows: dict[str, Future] = {}  # 信号地址和正在执行的流程
+
+    def add_scan_tasks(self, scan_scheduler: Union[ScanScheduler, AsyncRuntime]):
+        """把监控 plc 的扫描任务加入扫描调度器, 地址信息只在这里查询一次, 没有配置地址的任务不加入.
+
+        Args:
+            scan_scheduler: 扫描调度器或者 asyncio 运行时, 一个进程运行多台设备时所有设备共用.
+        """
+        handler_passive = self.handler_passive
+        plc_type, mysql, owner = handler_passive.plc_type, handler_passive.mysql_secs, handler_passive.equipment_name
+        address_info = plc_address_operation.get_mes_herat(plc_type, mysql)
+        if address_info is not None and "snap7" in plc_type:
+            address_info.update({"db_num": handler_passive.get_ec_value_with_name("db_num")})
+        self._mes_heart_gap = mes_heart_gap = float(handler_passive.get_ec_value_with_name("mes_heart_gap"))
+        self.control_state_address_info = plc_address_operation.get_control_state(plc_type, mysql)
+        scan_tasks = [
+            ("mes_heart", self.mes_heart, address_info, mes_heart_gap),
+            ("control_state", self.control_state, self.control_state_address_info, 2),
+            ("machine_state", self.machine_state, plc_address_operation.get_machine_state(plc_type, mysql), 2),
+            ("recipe_id", self.current_recipe_id, plc_address_operation.get_recipe_address_info(plc_type, mysql), 10),
+        ]
+        if address_info := plc_address_operation.get_do_quantity_address_info(plc_type, mysql):
+            sample_gap = float(handler_passive.get_ec_value_with_name("lot_sample_gap", False, 1))
+            scan_tasks.append(("lot_progress", self.lot_progress, address_info, sample_gap))
+        for name, func, address_info, period in scan_tasks:
+            if address_info is None:
+                handler_passive.logger.warning("没有配置 %s 地址, 不扫描", name)
+                continue
+            scan_func = functools.partial(self._scan_when_connected, func, address_info)
+            self.scan_tasks.append(scan_scheduler.add_task(name, scan_func, period, owner))
+        self.signal_scan_rate = SignalScanRate(
+            scan_scheduler, idle_period=float(handler_passive.get_ec_value_with_name("signal_idle_period", False, 1)),
+            active_hold=float(handler_passive.get_ec_value_with_name("signal_active_hold", False, 10)),
+            max_scan_rate=float(handler_passive.get_ec_value_with_name("signal_max_scan_rate", False, 200))
+        )
+        default_target_latency = int(handler_passive.get_ec_value_with_name("signal_target_latency", False, 50))
+        default_debounce = int(handler_passive.get_ec_value_with_name("signal_debounce", False, 0))
+        for signal_address_info in plc_address_operation.get_signal_address_list(mysql):
+            if signal_address_info.get("state", False):  # 实时监控的信号才会创建扫描任务
+                address = signal_address_info["address"]
+                address_info_read = plc_address_operation.get_signal_address_info(plc_type, address, mysql)
+                callbacks = plc_address_operation.get_signal_callbacks(address, mysql)
+                scan_func = functools.partial(
+                    self._scan_when_connected, self.monitor_plc_address, signal_address_info, address_info_read, callbacks
+                )
+                idle_period = self.signal_scan_rate.idle_period
+                scan_task = scan_scheduler.add_task(f"signal_{address}", scan_func, idle_period, owner)
+                target_latency = signal_address_info.get("target_latency") or default_target_latency
+                self.signal_scan_rate.add_signal(address, scan_task, target_latency / 1000)
+                debounce = signal_address_info.get("debounce")
+                self.signal_edges[address] = SignalEdgeDetector(
+                    signal_address_info.get("handshake") or HANDSHAKE_LEVEL, signal_address_info["signal_value"],
+                    (default_debounce if debounce is None else debounce) / 1000,
+                    COUNTER_MODULO.get(signal_address_info.get("data_type"), 1 << 32)
+                )
+                self.scan_tasks.append(scan_task)
+
+    def mes_heart(self, address_info: dict[str, Any]):
+        """翻转一次 Mes 心跳, 记录两次成功翻转的间隔与 mes_heart_gap 的误差.
+
+        Args:
+            address_info: 心跳地址信息.
+        """
+        try:
+            self.handler_passive.plc.execute_write(
+                **address_info, value=self._heart_value, save_log=False, priority=PRIORITY_HANDSHAKE
+            )
+        except Exception as e:
+            self.handler_passive.logger.warning("写入心跳失败, 错误信息: %s", str(e))
+            self.handler_passive.plc_supervisor.report_failure(e)
+            self._heart_toggle_time = None  # 断线期间不是心跳周期误差, 恢复后重新开始计算
+            return
+        toggle_time = time.monotonic()
+        if self._heart_toggle_time is not None:
+            self.mes_heart_period_error.record(toggle_time - self._heart_toggle_time - self._mes_heart_gap)
+        self._heart_toggle_time = toggle_time
+        self._heart_value = not self._heart_value
+
+    def control_state(self, address_info: dict[str, Any], max_age: Optional[float] = None):
+        """检查一次控制状态变化.
+
+        Args:
+            address_info: 控制状态地址信息.
+            max_age: 值最多允许旧多少秒, 默认不限制.
+        """
+        try:
+            current_control_state = self._read_plc_value(address_info, max_age)
+            current_control_state = 1 if current_control_state else 2
+            if current_control_state != self.handler_passive.get_sv_value_with_name("control_state", save_log=False):
+                self.handler_passive.set_sv_value_with_name("control_state", current_control_state, True)
                 self.handler_passive.send_s6f11(1001)
-                self.handler_passive.logger.warning("写入心跳失败, 错误信息: %s", str(e))
-                if self.handler_passive.plc.communication_open():
-                    self.handler_passive.logger.info("Plc重新连接成功.")
-                else:
-                    self.handler_passive.logger.warning("Plc重新连接失败, 等待 2 秒后尝试重新连接.")
+        except Exception as e:
+            self.handler_passive.logger.warning("control_state 扫描出现异常: %s.", str(e))
 
-    def control_state(self):
-        """监控控制状态变化."""
-        address_info = plc_address_operation.get_control_state(self.handler_passive.plc_type)
-        while True:
-            try:
-                current_control_state = self.handler_passive.plc.execute_read(**address_info, save_log=False)
-                current_control_state = 1 if current_control_state else 2
-                if current_control_state != self.handler_passive.get_sv_value_with_name("control_state", save_log=False):
-                    self.handler_passive.set_sv_value_with_name("control_state", current_control_state, True)
-                    self.handler_passive.send_s6f11(1001)
-            except Exception as e:
-                self.handler_passive.logger.warning("control_state 线程出现异常: %s.", str(e))
-            time.sleep(2)
-
-    def machine_state(self):
-        """监控运行状态变化."""
-        address_info = plc_address_operation.get_machine_state(self.handler_passive.plc_type)
-        occur_alarm_code = self.handler_passive.get_ec_value_with_name("occur_alarm_code")
-        clear_alarm_code = self.handler_passive.get_ec_value_with_name("clean_alarm_code")
-        alarm_state = self.handler_passive.get_ec_value_with_name("alarm_state")
-        while True:
-            try:
-                machine_state = self.handler_passive.plc.execute_read(**address_info, save_log=False)
-                if machine_state != self.handler_passive.get_sv_value_with_name("machine_state", save_log=False):
-                    if machine_state == alarm_state:
-                        self.handler_passive.set_clear_alarm(occur_alarm_code)
-                    elif self.handler_passive.get_sv_value_with_name("machine_state") == alarm_state:
-                        self.handler_passive.set_clear_alarm(clear_alarm_code)
-                    self.handler_passive.set_sv_value_with_name("machine_state", machine_state, True)
-                    self.handler_passive.send_s6f11(1002)
-            except Exception as e:
-                self.handler_passive.logger.warning("machine_state 线程出现异常: %s.", str(e))
-            time.sleep(2)
+    def machine_state(self, address_info: dict[str, Any]):
+        """检查一次运行状态变化.
 
-    def current_recipe_id(self):
-        """监控设备的当前配方 id."""
-        address_info = plc_address_operation.get_recipe_address_info(self.handler_passive.plc_type)
-        while True:
-            try:
-                current_recipe_id = self.handler_passive.plc.execute_read(**address_info, save_log=False)
-                if current_recipe_id != self.handler_passive.get_sv_value_with_name("recipe_id", save_log=False):
-                    current_recipe_name = secs_config.get_recipe_name_with_id(current_recipe_id)
-                    self.handler_passive.set_sv_value_with_name("recipe_id", current_recipe_id, True)
-                    self.handler_passive.set_sv_value_with_name("recipe_name", current_recipe_name, True)
-            except Exception as e:
-                self.handler_passive.logger.warning("recipe_id 线程出现异常: %s.", str(e))
-            time.sleep(10)
+        Args:
+            address_info: 运行状态地址信息.
+        """
+        alarm_state = self.handler_passive.get_ec_value_with_name("alarm_state", False)
+        try:
+            machine_state = self._read_plc_value(address_info)
+            if machine_state != self.handler_passive.get_sv_value_with_name("machine_state", save_log=False):
+                if machine_state == alarm_state:
+                    self.handler_passive.set_clear_alarm(self.handler_passive.get_ec_value_with_name("occur_alarm_code"))
+                elif self.handler_passive.get_sv_value_with_name("machine_state") == alarm_state:
+                    self.handler_passive.set_clear_alarm(self.handler_passive.get_ec_value_with_name("clean_alarm_code"))
+                self.handler_passive.set_sv_value_with_name("machine_state", machine_state, True)
+                self.handler_passive.send_s6f11(1002)
+        except Exception as e:
+            self.handler_passive.logger.warning("machine_state 扫描出现异常: %s.", str(e))
+
+    def current_recipe_id(self, address_info: dict[str, Any]):
+        """检查一次设备的当前配方 id.
+
+        Args:
+            address_info: 配方 id 地址信息.
+        """
+        try:
+            current_recipe_id = self._read_plc_value(address_info)
+            if current_recipe_id != self.handler_passive.get_sv_value_with_name("recipe_id", save_log=False):
+                current_recipe_name = secs_config.get_recipe_name_with_id(
+                    current_recipe_id, self.handler_passive.mysql_secs
+                )
+                self.handler_passive.set_sv_value_with_name("recipe_id", current_recipe_id, True)
+                self.handler_passive.set_sv_value_with_name("recipe_name", current_recipe_name, True)
+        except Exception as e:
+            self.handler_passive.logger.warning("recipe_id 扫描出现异常: %s.", str(e))
+
+    def lot_progress(self, address_info: dict[str, Any]):
+        """采样一次已生产数量, 数量变化时更新工单进度, 数据库按间隔合并写入.
+
+        Args:
+            address_info: 已生产数量地址信息.
+        """
+        lot_tracker = self.handler_passive.lot_tracker
+        try:
+            if progress := lot_tracker.update(self._read_plc_value(address_info)):
+                self.handler_passive.on_lot_progress(progress)
+        except Exception as e:
+            self.handler_passive.logger.warning("lot_progress 扫描出现异常: %s.", str(e))
+        lot_tracker.flush()
+
+    def _scan_when_connected(self, func: Callable, *args):
+        """Plc 已连接时执行一次扫描, 断线期间跳过, 重连由 plc_supervisor 负责, 不占用扫描线程等待.
+
+        Args:
+            func: 扫描函数.
+            *args: 扫描函数的参数.
+        """
+        if self.handler_passive.plc_supervisor.connected:
+            func(*args)
+
+    def _read_plc_value(self, address_info: dict[str, Any], max_age: Optional[float] = None) -> Any:
+        """读取地址值, 开启状态映像时从映像读取, 读取失败时通知 plc_supervisor 并抛出异常.
+
+        Args:
+            address_info: 地址信息.
+            max_age: 值最多允许旧多少秒, 状态映像的刷新周期比它长时直接读取 plc, 默认不限制.
+
+        Returns:
+            Any: 读取的值.
+        """
+        try:
+            return self.handler_passive.read_plc_value(address_info, PRIORITY_POLL, max_age)
+        except Exception as e:
+            self.handler_passive.plc_supervisor.report_failure(e)
+            raise
 
     def alarm_sender(self, alarm_code: int, alarm_id: U4, alarm_text: str):
         """发送报警和解除报警.
@@ -97,33 +215,86 @@ class ThreadMethods:
             alarm_id: 报警 id.
             alarm_text: 报警内容.
         """
-        self.handler_passive.send_and_waitfor_response(
+        self.handler_passive.send_or_spool(
             self.handler_passive.stream_function(5, 1)({"ALCD": alarm_code, "ALID": alarm_id, "ALTX": alarm_text})
         )
 
-    def monitor_plc_address(self, address_info: dict[str, Any]):
-        """监控 plc 信号.
+    def monitor_plc_address(
+            self, address_info: dict[str, Any], address_info_read: dict[str, Any], callbacks: list[dict[str, Any]]
+    ):
+        """检查一次 plc 信号, 边沿检测状态机确认触发后在后台执行流程.
+
+        扫描周期由 signal_scan_rate 调整, 快速扫描的周期比状态映像的刷新周期短时直接读取 plc.
+        触发时间是读取前的时间戳, 计数器握手检测到漏掉的触发时通知 handler_passive.
+        level 握手在流程结束前不再检查信号; toggle 和 counter 握手继续检查, 流程执行期间的第一个触发等流程结束后执行,
+        之后的触发作为漏掉的触发通知 handler_passive.
 
         Args:
-            address_info: 地址.
+            address_info: 信号地址.
+            address_info_read: 读取信号用的地址信息.
+            callbacks: 信号的流程.
+        """
+        address = address_info["address"]
+        signal_edge = self.signal_edges[address]
+        self.signal_scan_rate.update(address)
+        flow_running = (flow := self._signal_flows.get(address)) is not None and not flow.done()
+        if flow_running and signal_edge.handshake == HANDSHAKE_LEVEL:
+            return
+        try:
+            if not flow_running and (edge := signal_edge.take_pending()):
+                self._signal_flows[address] = self.handler_passive.start_background(
+                    self.execute_signal_flow, address_info, callbacks, edge
+                )
+                return
+            scan_time = time.time()
+            current_value = self._read_plc_value(address_info_read, self.signal_scan_rate.get_period(address))
+            if edge := signal_edge.update(current_value, scan_time):
+                self.signal_scan_rate.touch()
+                if edge.missed_count:
+                    self.handler_passive.on_signal_missed(address_info, edge)
+                if not flow_running:
+                    self._signal_flows[address] = self.handler_passive.start_background(
+                        self.execute_signal_flow, address_info, callbacks, edge
+                    )
+                elif not signal_edge.defer(edge):
+                    self.handler_passive.on_signal_missed(
+                        address_info, SignalEdge(edge.value, edge.edge_time, edge.sequence, 1)
+                    )
+        except Exception as e:
+            self.handler_passive.logger.warning("%s 扫描出现异常: %s.", address_info["description"], str(e))
+
+    def execute_signal_flow(
+            self, address_info: dict[str, Any], callbacks: list[dict[str, Any]], edge: Optional[SignalEdge] = None
+    ):
+        """执行信号的流程, level 握手最后清除信号, toggle 和 counter 握手由 plc 改变信号, 不需要清除.
+
+        Args:
+            address_info: 信号地址.
+            callbacks: 信号的流程.
+            edge: 触发信息.
         """
-        address_info_read = plc_address_operation.get_signal_address_info(self.handler_passive.plc_type, address_info["address"])
-        callbacks = plc_address_operation.get_signal_callbacks(address_info["address"])
-        signal_value = address_info["signal_value"]
-        clean_signal_value = address_info["clean_signal_value"]
         description = address_info["description"]
+        signal_edge = self.signal_edges.get(address_info["address"])
         _ = "=" * 40
-        while True:
-            current_value = self.handler_passive.plc.execute_read(**address_info_read, save_log=False)
-            if current_value == signal_value:
-                self.handler_passive.logger.info("%s 监控到 %s 信号 %s", _, description, _)
-                self.handler_passive.get_signal_to_execute_callbacks(callbacks)
+        try:
+            self.handler_passive.logger.info(
+                "%s 监控到 %s 信号 %s, 触发信息: %s", _, description, _, edge.to_dict() if edge else None
+            )
+            self.handler_passive.get_signal_to_execute_callbacks(callbacks)
+            if signal_edge is None or signal_edge.handshake == HANDSHAKE_LEVEL:
                 final_step_num = len(callbacks) + 1
-                self.handler_passive.logger.info("%s 第 %s 步: 清除%s %s", "-" * 30, final_step_num, description, "-" * 30)
-                self.handler_passive.write_clean_signal_value(address_info, clean_signal_value)
+                self.handler_passive.logger.info(
+                    "%s 第 %s 步: 清除%s %s", "-" * 30, final_step_num, description, "-" * 30
+                )
+                self.handler_passive.write_clean_signal_value(address_info, address_info["clean_signal_value"])
                 self.handler_passive.logger.info("%s 清除%s 结束 %s", "-" * 30, description, "-" * 30)
-                self.handler_passive.logger.info("%s 执行 %s 结束 %s", _, description, _)
-            time.sleep(1)
+            self.handler_passive.logger.info("%s 执行 %s 结束 %s", _, description, _)
+        except Exception as e:
+            self.handler_passive.logger.warning("%s 流程出现异常: %s.", description, str(e))
+        finally:
+            if signal_edge is not None:
+                signal_edge.on_flow_done()
+            self.signal_scan_rate.touch()  # 流程结束后下一个握手信号很快会到
 
     def collection_event_sender(self, event_id: int):
         """设备发送事件给 Host.
@@ -134,6 +305,8 @@ class ThreadMethods:
         reports = []
         event = self.handler_passive.collection_events.get(event_id)
         link_reports = event.link_reports
+        all_ids = [sv_or_dv_id for sv_or_dv_ids in link_reports.values() for sv_or_dv_id in sv_or_dv_ids]
+        snapshot_values = iter(self.handler_passive.get_sv_or_dv_values_with_ids(all_ids))  # 所有报告的值来自同一个版本
         for report_id, sv_or_dv_ids in link_reports.items():
             variables = []
             for sv_or_dv_id in sv_or_dv_ids:
@@ -141,17 +314,96 @@ class ThreadMethods:
                     sv_or_dv_instance = self.handler_passive.status_variables.get(sv_or_dv_id)
                 else:
                     sv_or_dv_instance = self.handler_passive.data_values.get(sv_or_dv_id)
-                if issubclass(sv_or_dv_instance.value_type, Array):
-                    value = Array(sv_or_dv_instance.base_value_type, sv_or_dv_instance.value)
-                else:
-                    value = sv_or_dv_instance.value_type(sv_or_dv_instance.value)
-                variables.append(value)
+                variables.append(self._to_secs_value(sv_or_dv_instance, next(snapshot_values)))
             reports.append({"RPTID": U4(report_id), "V": variables})
 
-        self.handler_passive.send_and_waitfor_response(
+        self.handler_passive.send_or_spool(
             self.handler_passive.stream_function(6, 11)({"DATAID": 1, "CEID": event.ceid, "RPT": reports})
         )
 
+    def spool_replay(self):
+        """Host 恢复通讯后按顺序重发 spool 里的消息."""
+        secs_spool = self.handler_passive.secs_spool
+        while True:
+            secs_spool.wait_pending()
+            secs_spool.sync()
+            if not self.handler_passive.waitfor_communicating(timeout=5):
+                continue
+            auto_replay = self.handler_passive.get_ec_value_with_name("spool_auto_replay", False, True)
+            if not auto_replay and not self.handler_passive.spool_transmit_event.wait(5):
+                continue
+            replay_rate = self.handler_passive.get_ec_value_with_name("spool_replay_rate", False, 10)
+            replay_gap = 1 / max(float(replay_rate), 0.1)
+            self.handler_passive.logger.info("开始重发 spool 消息, 数量: %s", secs_spool.pending_count)
+            start_time, replay_count = time.monotonic(), 0
+            while spool_record := secs_spool.peek():
+                stream, function, body, next_offset = spool_record
+                message = self.handler_passive.stream_function(stream, function)()
+                message.decode(body)
+                if self.handler_passive.send_and_waitfor_response(message) is None:
+                    self.handler_passive.logger.warning("重发 spool 消息失败, 剩余数量: %s", secs_spool.pending_count)
+                    break
+                secs_spool.commit(next_offset)
+                replay_count += 1
+                secs_spool.replay_rate = replay_count / (time.monotonic() - start_time)
+                time.sleep(replay_gap)
+            self.handler_passive.spool_transmit_event.clear()
+            self.handler_passive.logger.info("重发 spool 消息结束, 共重发 %s 条", replay_count)
+
+    def trace_sender(self):
+        """按顺序发送 trace 报告, 等待 host 回复时不影响采样."""
+        status_variables = self.handler_passive.status_variables
+        reports = self.handler_passive.trace_collector.reports
+        while True:
+            report = reports.get()
+            try:
+                sv_instances = itertools.cycle([status_variables[sv_id] for sv_id in report.sv_ids])
+                self.handler_passive.send_or_spool(self.handler_passive.stream_function(6, 1)({
+                    "TRID": report.trid, "SMPLN": report.sample_number, "STIME": report.stime,
+                    "SV": [self._to_secs_value(sv_instance, value) for sv_instance, value in zip(sv_instances, report.values)]
+                }))
+            except Exception as e:
+                self.handler_passive.logger.warning("发送 trace %s 出现异常: %s", report.trid, str(e))
+
+    def alarm_retention(self):
+        """按间隔归档或删除超过保留天数的报警记录, ec alarm_retention_days 是 0 时不清理."""
+        while True:
+            retention_days = int(self.handler_passive.get_ec_value_with_name("alarm_retention_days", False, 180))
+            if retention_days > 0:
+                before = datetime.datetime.now() - datetime.timedelta(days=retention_days)
+                try:
+                    self.handler_passive.alarm_history.purge(
+                        before, int(self.handler_passive.get_ec_value_with_name("alarm_retention_batch", False, 500)),
+                        bool(self.handler_passive.get_ec_value_with_name("alarm_archive", False, True))
+                    )
+                except Exception as e:
+                    self.handler_passive.logger.warning("清理报警记录出现异常: %s", str(e))
+            time.sleep(float(self.handler_passive.get_ec_value_with_name("alarm_retention_gap", False, 3600)))
+
+    def recipe_worker(self):
+        """在 hsms 线程之外按顺序执行配方的上传, 下载和删除, 大配方不会阻塞其他消息."""
+        while True:
+            func, args = self.handler_passive.recipe_tasks.get()
+            try:
+                func(*args)
+            except Exception as e:
+                self.handler_passive.logger.warning("配方任务 %s 出现异常: %s", func.__name__, str(e))
+
+    @staticmethod
+    def _to_secs_value(sv_or_dv_instance, value: Any) -> Base:
+        """把 sv 或 dv 的值转换成对应类型的 secs 变量.
+
+        Args:
+            sv_or_dv_instance: sv 或 dv 实例.
+            value: 值.
+
+        Returns:
+            Base: secs 变量.
+        """
+        if issubclass(sv_or_dv_instance.value_type, Array):
+            return array_value.to_secs_array(sv_or_dv_instance.base_value_type, value)
+        return sv_or_dv_instance.value_type(value)
+
     @staticmethod
     def run_socket_server(server_instance: CygSocketServerAsyncio):
         """运行 socket 服务端.
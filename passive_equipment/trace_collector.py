@@ -0,0 +1,299 @@
+# pylint: skip-file
+"""Trace 数据采集."""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Optional, Union
+
+from siemens_plc.s7_plc import S7PLC
+
+from passive_equipment import metrics
+from passive_equipment.plc_io_lane import PlcIoLane, PRIORITY_POLL
+from passive_equipment.plc_status_image import S7StatusImage
+from passive_equipment.variable_store import VariableStore
+
+DUE_TOLERANCE = 0.001  # 截止时间相差不到 1ms 的 trace 合并成一次采样
+
+
+class TraceJob:
+    """一个 S2F23 定义的 trace.
+
+    采样值保存在预先分配好的 group_size 行环形数组里, 每采满一组生成一个 TraceReport, 数组从头开始复用.
+    """
+
+    def __init__(
+            self, trid: Union[int, str], period: float, total_samples: int, group_size: int,
+            sv_ids: list[Union[int, str]], address_infos: list[Optional[dict[str, Any]]], slots: list[Optional[int]]
+    ):
+        """TraceJob 构造函数.
+
+        Args:
+            trid: trace id.
+            period: 采样周期, 单位秒.
+            total_samples: 总采样次数.
+            group_size: 几次采样合并成一个 S6F1.
+            sv_ids: sv id 列表.
+            address_infos: 每个 sv 的 plc 地址信息, 没有关联 plc 地址的 sv 是 None.
+            slots: 没有关联 plc 地址的 sv 在 VariableStore 里的槽位, 有关联地址的是 None.
+        """
+        self.trid = trid
+        self.period = period
+        self.total_samples = total_samples
+        self.group_size = group_size
+        self.sv_ids = sv_ids
+        self.address_infos = address_infos
+        self.slots = slots
+        self.sample_count = 0  # 已经采样的次数, 即 SMPLN
+        self.missed_count = 0  # 错过的采样周期数
+        self.next_deadline = 0.0
+
+        self._rows: list[list[Any]] = [[None] * len(sv_ids) for _ in range(group_size)]
+        self._times: list[float] = [0.0] * group_size
+        self._position = 0  # 环形数组里下一次采样的位置
+
+    @property
+    def is_finished(self) -> bool:
+        """是否已经完成所有采样."""
+        return self.sample_count >= self.total_samples
+
+    def add_sample(self, sample_time: float, values: list[Any]) -> Optional["TraceReport"]:
+        """保存一次采样.
+
+        Args:
+            sample_time: 采样的时间戳.
+            values: 采样值, 顺序和 sv_ids 一致.
+
+        Returns:
+            Optional[TraceReport]: 采满一组或者完成所有采样时返回要发送的报告.
+        """
+        self._rows[self._position][:] = values
+        self._times[self._position] = sample_time
+        self._position += 1
+        self.sample_count += 1
+        if self._position == self.group_size or self.is_finished:
+            return self._pop_report()
+        return None
+
+    def _pop_report(self) -> "TraceReport":
+        """把环形数组里的采样取出生成报告.
+
+        Returns:
+            TraceReport: trace 报告, SMPLN 和 STIME 是这一组最后一次采样的.
+        """
+        values = [value for row in self._rows[:self._position] for value in row]
+        report = TraceReport(self.trid, self.sample_count, self._times[self._position - 1], self.sv_ids, values)
+        self._position = 0
+        return report
+
+
+class TraceReport:
+    """一组采样, 对应一个 S6F1."""
+
+    def __init__(
+            self, trid: Union[int, str], sample_number: int, sample_time: float, sv_ids: list[Union[int, str]],
+            values: list[Any]
+    ):
+        """TraceReport 构造函数.
+
+        Args:
+            trid: trace id.
+            sample_number: 这一组最后一次采样的序号.
+            sample_time: 这一组最后一次采样的时间戳.
+            sv_ids: sv id 列表.
+            values: 按采样顺序排列的所有 sv 值, 个数是 sv_ids 的整数倍.
+        """
+        self.trid = trid
+        self.sample_number = sample_number
+        self.sample_time = sample_time
+        self.sv_ids = sv_ids
+        self.values = values
+
+    @property
+    def stime(self) -> str:
+        """STIME, 格式是 YYYYMMDDhhmmsscc."""
+        centisecond = int(self.sample_time * 100) % 100
+        return f"{time.strftime('%Y%m%d%H%M%S', time.localtime(self.sample_time))}{centisecond:02d}"
+
+
+class TraceCollector:
+    """按截止时间调度所有 trace 的采样线程.
+
+    截止时间按周期累加, 采样耗时不会累积成漂移, 落后超过一个周期时跳过错过的周期.
+    同时到期的 trace 合并成一次读取, 西门子 plc 的地址通过 trace 专用的状态映像按块读取, 其他 sv 从 VariableStore 读取同一个版本.
+    采满一组的报告放进 reports 队列, 由发送线程发送, 发送等待 host 回复不会影响采样.
+    """
+
+    def __init__(
+            self, lane: PlcIoLane, variable_store: VariableStore, logger: logging.Logger = None,
+            max_block_bytes: int = 200
+    ):
+        """TraceCollector 构造函数.
+
+        Args:
+            lane: plc 读写通道.
+            variable_store: 变量存储.
+            logger: 日志器, 默认使用本模块的日志器.
+            max_block_bytes: 一个读取块的最大字节数.
+        """
+        self.lane = lane
+        self.variable_store = variable_store
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.max_block_bytes = max_block_bytes
+        self.reports: queue.Queue[TraceReport] = queue.Queue()  # 等待发送的报告
+        self.sample_count = 0  # 采样次数, 多个 trace 合并的采样算一次
+        self.error_count = 0  # 读取失败的次数
+        self.lateness = metrics.RollingStats()  # 实际采样时间晚于截止时间多少, 单位秒
+        self.sample_time = metrics.RollingStats()  # 一次采样的读取耗时, 单位秒
+
+        self._jobs: dict[Union[int, str], TraceJob] = {}
+        self._image: Optional[S7StatusImage] = None
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def trace_count(self) -> int:
+        """正在采样的 trace 数量."""
+        return len(self._jobs)
+
+    def has_trace(self, trid: Union[int, str]) -> bool:
+        """判断 trace 是否正在采样.
+
+        Args:
+            trid: trace id.
+
+        Returns:
+            bool: 正在采样返回 True.
+        """
+        return trid in self._jobs
+
+    def start_trace(self, job: TraceJob):
+        """开始采样, 相同 trid 的 trace 会被替换.
+
+        Args:
+            job: trace.
+        """
+        with self._condition:
+            job.next_deadline = time.monotonic()
+            self._jobs[job.trid] = job
+            self._rebuild_image()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        self.logger.info(
+            "开始 trace %s, 周期: %s 秒, 总采样次数: %s, 每组: %s, sv: %s",
+            job.trid, job.period, job.total_samples, job.group_size, job.sv_ids
+        )
+
+    def stop_trace(self, trid: Union[int, str]) -> bool:
+        """停止采样, 没有发送的采样丢弃.
+
+        Args:
+            trid: trace id.
+
+        Returns:
+            bool: trace 存在返回 True.
+        """
+        with self._condition:
+            if (job := self._jobs.pop(trid, None)) is None:
+                return False
+            self._rebuild_image()
+            self._condition.notify()
+        self.logger.info("停止 trace %s, 已采样: %s, 错过周期: %s", trid, job.sample_count, job.missed_count)
+        return True
+
+    def get_state(self) -> dict:
+        """获取采样的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "trace_count": self.trace_count, "sample_count": self.sample_count, "error_count": self.error_count,
+            "pending_report_count": self.reports.qsize(), "lateness": self.lateness.get_state(),
+            "sample_time": self.sample_time.get_state(),
+            "traces": {
+                str(job.trid): {"sample_count": job.sample_count, "missed_count": job.missed_count}
+                for job in list(self._jobs.values())
+            }
+        }
+
+    def _run(self):
+        """采样线程, 等到最早的截止时间后采样所有到期的 trace."""
+        while True:
+            with self._condition:
+                while not self._jobs:
+                    self._condition.wait()
+                now = time.monotonic()
+                next_deadline = min(job.next_deadline for job in self._jobs.values())
+                if next_deadline - now > DUE_TOLERANCE:
+                    self._condition.wait(next_deadline - now)
+                    continue
+                due_jobs = [job for job in self._jobs.values() if job.next_deadline - now <= DUE_TOLERANCE]
+                image = self._image
+            self.lateness.record(now - next_deadline)
+            self._sample(due_jobs, image)
+            with self._condition:
+                for job in due_jobs:
+                    self._schedule_next(job)
+                    if job.is_finished and self._jobs.get(job.trid) is job:
+                        del self._jobs[job.trid]
+                        self._rebuild_image()
+                        self.logger.info("trace %s 采样结束, 错过周期: %s", job.trid, job.missed_count)
+
+    def _sample(self, jobs: list[TraceJob], image: Optional[S7StatusImage]):
+        """读取所有到期 trace 的 sv 并保存采样.
+
+        Args:
+            jobs: 到期的 trace.
+            image: trace 专用的状态映像, 不是西门子 plc 时是 None.
+        """
+        start_time = time.monotonic()
+        sample_time = time.time()
+        address_infos = [address_info for job in jobs for address_info in job.address_infos if address_info]
+        slots = [slot for job in jobs for slot in job.slots if slot is not None]
+        try:
+            if image and address_infos:
+                plc_values = image.read_many(address_infos, PRIORITY_POLL)
+            else:
+                plc_values = [
+                    self.lane.execute_read(**address_info, save_log=False, priority=PRIORITY_POLL)
+                    for address_info in address_infos
+                ]
+        except Exception as e:
+            self.error_count += 1
+            for job in jobs:  # 读取失败的这次采样也算错过的周期
+                job.missed_count += 1
+            self.logger.warning("trace 读取 plc 失败, 跳过本次采样: %s", str(e))
+            return
+        _, store_values = self.variable_store.snapshot(slots)
+        plc_iter, store_iter = iter(plc_values), iter(store_values)
+        for job in jobs:
+            values = [next(plc_iter) if address_info else next(store_iter) for address_info in job.address_infos]
+            if report := job.add_sample(sample_time, values):
+                self.reports.put(report)
+        self.sample_count += 1
+        self.sample_time.record(time.monotonic() - start_time)
+
+    def _rebuild_image(self):
+        """Trace 变化后重新创建状态映像, 只读取正在采样的地址, 调用方需要持有 _condition."""
+        if not isinstance(self.lane.driver, S7PLC):
+            return
+        if not any(address_info for job in self._jobs.values() for address_info in job.address_infos):
+            self._image = None
+            return
+        self._image = S7StatusImage(self.lane, cycle_time=0, max_block_bytes=self.max_block_bytes)
+
+    @staticmethod
+    def _schedule_next(job: TraceJob):
+        """按周期计算下一次截止时间, 落后超过一个周期时跳过错过的周期.
+
+        Args:
+            job: trace.
+        """
+        job.next_deadline += job.period
+        if (behind := time.monotonic() - job.next_deadline) > job.period:
+            missed = int(behind / job.period)
+            job.missed_count += missed
+            job.next_deadline += missed * job.period
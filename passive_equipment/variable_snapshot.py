@@ -0,0 +1,168 @@
+# pylint: skip-file
+"""Sv 和 ec 的编码快照."""
+import struct
+import threading
+from typing import Optional, Union
+
+ID_STRUCTS = {
+    format_code: struct.Struct(format_string) for format_code, format_string in {
+        0o50: ">Q", 0o51: ">B", 0o52: ">H", 0o54: ">I", 0o30: ">q", 0o31: ">b", 0o32: ">h", 0o34: ">i"
+    }.items()
+}  # secs 整数格式码对应的 struct
+ASCII_FORMAT = 0o20
+BINARY_FORMAT = 0o10
+EMPTY_LIST = b"\x01\x00"  # 未定义的 id 回复 L[0]
+
+
+class VariableSnapshot:
+    """变量 id 到编码后 secs item 的只读快照.
+
+    写入时复制一份新的字典并整体替换, 读取方拿到的字典发布后不再修改, 不需要加锁, 一次回复里的所有值来自同一个版本.
+    """
+
+    def __init__(self):
+        """VariableSnapshot 构造函数."""
+        self.version = 0  # 发布的次数
+        self._items: dict[Union[int, str], bytes] = {}
+        self._lock = threading.Lock()  # 只用于多个写入方之间互斥
+
+    @property
+    def items(self) -> dict[Union[int, str], bytes]:
+        """当前版本的快照, 调用方不能修改."""
+        return self._items
+
+    def publish(self, updates: dict[Union[int, str], Optional[bytes]]):
+        """发布新的编码值.
+
+        Args:
+            updates: 变量 id 和编码后的值, 值是 None 时从快照里删除该 id.
+        """
+        with self._lock:
+            items = dict(self._items)
+            for variable_id, encoded in updates.items():
+                if encoded is None:
+                    items.pop(variable_id, None)
+                else:
+                    items[variable_id] = encoded
+            self._items = items
+            self.version += 1
+
+
+class EncodedReply:
+    """已经编码好的回复, 代替 SecsStreamFunction 交给 secsgem 发送.
+
+    通讯日志只记录元素个数和字节数, 不逐个打印变量.
+    """
+
+    def __init__(self, stream: int, function: int, count: int, data: bytes):
+        """EncodedReply 构造函数.
+
+        Args:
+            stream: stream.
+            function: function.
+            count: 列表元素个数.
+            data: 编码后的数据.
+        """
+        self.stream = stream
+        self.function = function
+        self.is_reply_required = False
+        self.count = count
+        self._data = data
+
+    def encode(self) -> bytes:
+        """返回编码后的数据."""
+        return self._data
+
+    def __repr__(self):
+        """通讯日志里的文本."""
+        return f"S{self.stream}F{self.function}\n  <L [{self.count}] {len(self._data)} bytes> ."
+
+
+def encode_item_header(format_code: int, length: int) -> bytes:
+    """编码 secs item 头.
+
+    Args:
+        format_code: 格式码.
+        length: 数据字节数, 列表是元素个数.
+
+    Returns:
+        bytes: item 头.
+    """
+    length_bytes = 1 if length <= 0xFF else 2 if length <= 0xFFFF else 3
+    return bytes(((format_code << 2) | length_bytes,)) + length.to_bytes(length_bytes, "big")
+
+
+def encode_list_header(count: int) -> bytes:
+    """编码 secs 列表的 item 头.
+
+    Args:
+        count: 列表元素个数.
+
+    Returns:
+        bytes: item 头.
+    """
+    return encode_item_header(0, count)
+
+
+def encode_reply(stream: int, function: int, items: list[bytes]) -> EncodedReply:
+    """把编码好的元素拼成一个列表回复.
+
+    Args:
+        stream: stream.
+        function: function.
+        items: 编码后的元素.
+
+    Returns:
+        EncodedReply: 编码好的回复.
+    """
+    return EncodedReply(stream, function, len(items), encode_list_header(len(items)) + b"".join(items))
+
+
+def decode_id_list(data: bytes) -> Optional[list[Union[int, str]]]:
+    """直接解析 S1F3, S1F11, S2F13 里的 id 列表, 不创建 secs 变量对象.
+
+    Args:
+        data: 消息数据.
+
+    Returns:
+        Optional[list[Union[int, str]]]: id 列表, 遇到不支持的格式返回 None, 由调用方使用 secsgem 解析.
+    """
+    try:
+        position, count = decode_item_header(data, 0)
+        if data[0] >> 2 != 0:
+            return None
+        ids = []
+        for _ in range(count):
+            format_code = data[position] >> 2
+            position, length = decode_item_header(data, position)
+            if format_code == ASCII_FORMAT:
+                ids.append(data[position:position + length].decode("ascii"))
+            elif (id_struct := ID_STRUCTS.get(format_code)) and length == id_struct.size:
+                ids.append(id_struct.unpack_from(data, position)[0])
+            else:
+                return None
+            position += length
+    except (IndexError, UnicodeDecodeError, struct.error):
+        return None
+    if position != len(data):
+        return None
+    return ids
+
+
+def decode_item_header(data: bytes, position: int) -> tuple[int, int]:
+    """解析 item 头.
+
+    Args:
+        data: 消息数据.
+        position: item 头的位置.
+
+    Returns:
+        tuple[int, int]: 数据开始的位置和长度, 列表的长度是元素个数.
+    """
+    length_bytes = data[position] & 0x03
+    if length_bytes == 0:
+        raise IndexError("Invalid item header")
+    start = position + 1 + length_bytes
+    if start > len(data):
+        raise IndexError("Item header out of range")
+    return start, int.from_bytes(data[position + 1:start], "big")
@@ -0,0 +1,217 @@
+# pylint: skip-file
+"""Sv, dv, ec 的值存储."""
+import threading
+import time
+from typing import Any, Optional, Union
+
+from secsgem import gem
+
+SV = "SV"
+DV = "DV"
+EC = "EC"
+SNAPSHOT_RETRY = 100  # 无锁读取被写入打断的最大重试次数, 超过后加锁读取
+
+
+class VariableStore:
+    """按 (类型, id) 分配槽位, 所有变量的值和版本号分别保存在两列里.
+
+    每次写入把全局版本加 1, 被写入的槽位记录这个版本. 写入方之间用锁互斥, 读取方使用 seqlock:
+    写入开始和结束时各把序号加 1, 读取前后序号相同且是偶数, 说明读取期间没有写入, 读到的是同一个版本的值.
+    """
+
+    def __init__(self):
+        """VariableStore 构造函数."""
+        self.version = 0  # 全局版本, 每次写入加 1
+        self.retry_count = 0  # 无锁读取被写入打断后重试的次数
+
+        self._slots: dict[tuple[str, Union[int, str]], int] = {}
+        self._values: list[Any] = []
+        self._versions: list[int] = []
+        self._sequence = 0  # 写入期间是奇数
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, variable_id: Union[int, str]) -> int:
+        """注册变量, 已经注册的变量返回原来的槽位.
+
+        Args:
+            kind: 变量类型, SV, DV 或 EC.
+            variable_id: 变量 id.
+
+        Returns:
+            int: 槽位.
+        """
+        with self._lock:
+            if (slot := self._slots.get((kind, variable_id))) is None:
+                slot = self._slots[(kind, variable_id)] = len(self._values)
+                self._values.append(None)
+                self._versions.append(0)
+            return slot
+
+    def get_slot(self, kind: str, variable_id: Union[int, str]) -> Optional[int]:
+        """获取变量的槽位.
+
+        Args:
+            kind: 变量类型.
+            variable_id: 变量 id.
+
+        Returns:
+            Optional[int]: 槽位, 未注册返回 None.
+        """
+        return self._slots.get((kind, variable_id))
+
+    def read(self, slot: int) -> Any:
+        """读取一个槽位的值.
+
+        Args:
+            slot: 槽位.
+
+        Returns:
+            Any: 值.
+        """
+        return self._values[slot]
+
+    def get_version(self, slot: int) -> int:
+        """获取槽位最后一次写入时的全局版本.
+
+        Args:
+            slot: 槽位.
+
+        Returns:
+            int: 版本, 从没写入过是 0.
+        """
+        return self._versions[slot]
+
+    def write(self, slot: int, value: Any) -> int:
+        """写入一个槽位.
+
+        Args:
+            slot: 槽位.
+            value: 值.
+
+        Returns:
+            int: 写入后的全局版本.
+        """
+        return self.write_many({slot: value})
+
+    def write_many(self, updates: dict[int, Any]) -> int:
+        """在同一个版本里写入多个槽位, 读取方要么都看到, 要么都看不到.
+
+        Args:
+            updates: 槽位和值.
+
+        Returns:
+            int: 写入后的全局版本.
+        """
+        with self._lock:
+            self._sequence += 1
+            try:
+                self.version += 1
+                for slot, value in updates.items():
+                    self._values[slot] = value
+                    self._versions[slot] = self.version
+            finally:
+                self._sequence += 1
+            return self.version
+
+    def snapshot(self, slots: list[int]) -> tuple[int, list[Any]]:
+        """无锁读取多个槽位, 所有值来自同一个版本.
+
+        Args:
+            slots: 槽位列表.
+
+        Returns:
+            tuple[int, list[Any]]: 全局版本和值, 值的顺序和 slots 一致.
+        """
+        values = self._values
+        for _ in range(SNAPSHOT_RETRY):
+            sequence = self._sequence
+            if sequence & 1:
+                self.retry_count += 1
+                time.sleep(0)  # 让出 GIL, 等写入方写完
+                continue
+            version = self.version
+            snapshot_values = [values[slot] for slot in slots]
+            if self._sequence == sequence:
+                return version, snapshot_values
+            self.retry_count += 1
+        with self._lock:
+            return self.version, [values[slot] for slot in slots]
+
+    def get_state(self) -> dict:
+        """获取存储的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {"variable_count": len(self._values), "version": self.version, "retry_count": self.retry_count}
+
+
+class StoredValue:
+    """把 gem 变量的 value 属性映射到 VariableStore 的槽位."""
+
+    def __get__(self, instance, owner=None) -> Any:
+        """读取槽位的值."""
+        if instance is None:
+            return self
+        return instance.store.read(instance.slot)
+
+    def __set__(self, instance, value: Any):
+        """写入槽位."""
+        instance.store.write(instance.slot, value)
+
+
+class StatusVariableView(gem.StatusVariable):
+    """值保存在 VariableStore 里的 sv."""
+
+    value = StoredValue()
+
+    def __init__(self, store: VariableStore, svid: Union[int, str], *args, **kwargs):
+        """StatusVariableView 构造函数.
+
+        Args:
+            store: 变量存储.
+            svid: sv id.
+            *args: gem.StatusVariable 的其他参数.
+            **kwargs: gem.StatusVariable 的其他参数.
+        """
+        self.store = store
+        self.slot = store.register(SV, svid)
+        super().__init__(svid, *args, **kwargs)
+
+
+class DataValueView(gem.DataValue):
+    """值保存在 VariableStore 里的 dv."""
+
+    value = StoredValue()
+
+    def __init__(self, store: VariableStore, dvid: Union[int, str], *args, **kwargs):
+        """DataValueView 构造函数.
+
+        Args:
+            store: 变量存储.
+            dvid: dv id.
+            *args: gem.DataValue 的其他参数.
+            **kwargs: gem.DataValue 的其他参数.
+        """
+        self.store = store
+        self.slot = store.register(DV, dvid)
+        super().__init__(dvid, *args, **kwargs)
+
+
+class EquipmentConstantView(gem.EquipmentConstant):
+    """值保存在 VariableStore 里的 ec."""
+
+    value = StoredValue()
+
+    def __init__(self, store: VariableStore, ecid: Union[int, str], *args, **kwargs):
+        """EquipmentConstantView 构造函数.
+
+        Args:
+            store: 变量存储.
+            ecid: ec id.
+            *args: gem.EquipmentConstant 的其他参数.
+            **kwargs: gem.EquipmentConstant 的其他参数.
+        """
+        self.store = store
+        self.slot = store.register(EC, ecid)
+        super().__init__(ecid, *args, **kwargs)
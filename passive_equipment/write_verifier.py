@@ -0,0 +1,232 @@
+# pylint: skip-file
+"""Plc 写入校验."""
+import logging
+import math
+import time
+from typing import Any, Optional
+
+from siemens_plc.s7_plc import S7PLC
+
+from passive_equipment import metrics
+from passive_equipment.backoff import ExponentialBackoff
+from passive_equipment.plc_io_lane import PlcIoLane, PRIORITY_FLOW
+from passive_equipment.plc_status_image import S7StatusImage
+
+
+class WriteRequest:
+    """一个要写入并校验的地址."""
+
+    def __init__(
+            self, address_info: dict[str, Any], value: Any, verify: bool = True, retry: int = 5, timeout: float = 3,
+            description: str = ""
+    ):
+        """WriteRequest 构造函数.
+
+        Args:
+            address_info: 地址信息.
+            value: 要写入的值.
+            verify: 写入后是否回读校验.
+            retry: 校验失败后最多重新写入几次.
+            timeout: 从第一次写入开始的校验截止时间, 单位秒.
+            description: 地址描述信息, 用于日志.
+        """
+        self.address_info = address_info
+        self.value = value
+        self.verify = verify
+        self.retry = retry
+        self.timeout = timeout
+        self.description = description
+
+
+class WriteResult:
+    """一个地址的写入结果."""
+
+    def __init__(self, request: WriteRequest):
+        """WriteResult 构造函数.
+
+        Args:
+            request: 写入请求.
+        """
+        self.request = request
+        self.success = False
+        self.attempts = 0  # 写入次数
+        self.elapsed = 0.0  # 从第一次写入到校验结束的时间, 单位秒
+        self.last_value = None  # 最后一次回读的值
+        self.error: Optional[Exception] = None  # 最后一次读写异常
+
+    def to_dict(self) -> dict:
+        """转换成字典, 用于日志和 socket 返回.
+
+        Returns:
+            dict: 写入结果.
+        """
+        return {
+            "address": self.request.address_info.get("address"), "description": self.request.description,
+            "value": self.request.value, "success": self.success, "attempts": self.attempts,
+            "elapsed": round(self.elapsed, 4), "last_value": self.last_value,
+            "error": str(self.error) if self.error else None
+        }
+
+
+class WriteVerifier:
+    """写入后回读校验, 不一致时按指数退避重新写入, 直到成功, 用完重试次数或超过截止时间.
+
+    多个地址一起校验时每一轮只回读一次, 西门子 plc 的地址合并成几个 db 块读取.
+    """
+
+    def __init__(self, lane: PlcIoLane, logger: logging.Logger = None):
+        """WriteVerifier 构造函数.
+
+        Args:
+            lane: plc 读写通道.
+            logger: 日志器, 默认使用本模块的日志器.
+        """
+        self.lane = lane
+        self.logger = logger if logger else logging.getLogger(__name__)
+        self.write_count = 0  # 校验的地址数量
+        self.rewrite_count = 0  # 校验失败后重新写入的次数
+        self.failure_count = 0  # 最终校验失败的地址数量
+        self.elapsed = metrics.RollingStats()  # 每个地址从写入到校验结束的时间, 单位秒
+
+    def write(self, requests: list[WriteRequest], priority: int = PRIORITY_FLOW) -> list[WriteResult]:
+        """依次写入所有地址, 然后一起校验需要校验的地址.
+
+        Args:
+            requests: 写入请求列表.
+            priority: 读写优先级.
+
+        Returns:
+            list[WriteResult]: 写入结果, 顺序和 requests 一致.
+        """
+        start_time = time.monotonic()
+        results = [WriteResult(request) for request in requests]
+        for result in results:
+            self._write_once(result, priority)
+            if not result.request.verify:
+                result.success = result.error is None
+                result.elapsed = time.monotonic() - start_time
+        self._verify([result for result in results if result.request.verify], start_time, priority)
+        return results
+
+    def verify(self, requests: list[WriteRequest], priority: int = PRIORITY_FLOW) -> list[WriteResult]:
+        """先回读校验, 不一致才写入, 用于已经写过的地址.
+
+        Args:
+            requests: 写入请求列表.
+            priority: 读写优先级.
+
+        Returns:
+            list[WriteResult]: 写入结果, 顺序和 requests 一致.
+        """
+        results = [WriteResult(request) for request in requests]
+        self._verify(results, time.monotonic(), priority)
+        return results
+
+    def get_state(self) -> dict:
+        """获取写入校验的统计信息.
+
+        Returns:
+            dict: 统计信息.
+        """
+        return {
+            "write_count": self.write_count, "rewrite_count": self.rewrite_count,
+            "failure_count": self.failure_count, "elapsed": self.elapsed.get_state()
+        }
+
+    @staticmethod
+    def is_equal(plc_value: Any, value: Any) -> bool:
+        """比较回读值和写入值, 浮点数按 real 的精度比较.
+
+        Args:
+            plc_value: 回读值.
+            value: 写入值.
+
+        Returns:
+            bool: 一致返回 True.
+        """
+        if isinstance(plc_value, float) or isinstance(value, float):
+            try:
+                return math.isclose(float(plc_value), float(value), rel_tol=1e-6, abs_tol=1e-6)
+            except (TypeError, ValueError):
+                return False
+        return plc_value == value
+
+    def _verify(self, results: list[WriteResult], start_time: float, priority: int):
+        """批量回读校验, 不一致的地址重新写入.
+
+        Args:
+            results: 要校验的写入结果.
+            start_time: 第一次写入的时间.
+            priority: 读写优先级.
+        """
+        backoff = ExponentialBackoff(base=0.05, cap=0.5, jitter=0.2)
+        pending = list(results)
+        while pending:
+            self._read_back(pending, priority)
+            now = time.monotonic()
+            retry_results = []
+            for result in pending:
+                result.elapsed = now - start_time
+                if result.error is None and self.is_equal(result.last_value, result.request.value):
+                    result.success = True
+                    self.elapsed.record(result.elapsed)
+                elif result.attempts > result.request.retry or result.elapsed >= result.request.timeout:
+                    self.failure_count += 1
+                    self.elapsed.record(result.elapsed)
+                    self.logger.error(
+                        "写入校验失败, 地址 %s 的值是 %s != %s, 写入 %s 次, 耗时 %.3f 秒, %s, 错误: %s",
+                        result.request.address_info.get("address"), result.last_value, result.request.value,
+                        result.attempts, result.elapsed, result.request.description, result.error
+                    )
+                else:
+                    retry_results.append(result)
+            pending = retry_results
+            if pending:
+                deadline = min(start_time + result.request.timeout for result in pending)
+                time.sleep(max(0.0, min(backoff.next_delay(), deadline - time.monotonic())))
+                for result in pending:
+                    self.rewrite_count += 1
+                    self.logger.warning(
+                        "地址 %s 的值是 %s != %s, 第 %s 次重新写入, %s", result.request.address_info.get("address"),
+                        result.last_value, result.request.value, result.attempts, result.request.description
+                    )
+                    self._write_once(result, priority)
+        self.write_count += len(results)
+
+    def _write_once(self, result: WriteResult, priority: int):
+        """写入一次, 异常记录在结果里.
+
+        Args:
+            result: 写入结果.
+            priority: 写入优先级.
+        """
+        result.attempts += 1
+        try:
+            self.lane.execute_write(**result.request.address_info, value=result.request.value, priority=priority)
+            result.error = None
+        except Exception as e:
+            result.error = e
+
+    def _read_back(self, results: list[WriteResult], priority: int):
+        """回读多个地址, 西门子 plc 合并成几个 db 块读取, 其他 plc 逐个读取.
+
+        Args:
+            results: 写入结果.
+            priority: 读取优先级.
+        """
+        address_infos = [result.request.address_info for result in results]
+        try:
+            if isinstance(self.lane.driver, S7PLC) and len(results) > 1:
+                values = S7StatusImage(self.lane).read_many(address_infos, priority)
+            else:
+                values = [
+                    self.lane.execute_read(**address_info, save_log=False, priority=priority)
+                    for address_info in address_infos
+                ]
+        except Exception as e:
+            for result in results:
+                result.error = e
+            return
+        for result, value in zip(results, values):
+            result.last_value = value
+            result.error = None